@@ -8,8 +8,9 @@ import re
 from copy import deepcopy
 from datetime import datetime
 
-from jsonschema import validate, exceptions
+from jsonschema import exceptions
 from wazuh_testing import logger
+from wazuh_testing.tools.schemas import validate, validate_many
 
 _data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
 
@@ -135,7 +136,17 @@ def validate_analysis_alert(alert, schema='linux'):
         _schema = win32_schema
     else:
         _schema = linux_schema
-    validate(schema=_schema, instance=alert)
+    validate(alert, _schema)
+
+
+def validate_analysis_alerts(alerts, schema='linux'):
+    """Check if many Analysis events are properly formatted, compiling the schema only once.
+
+    Args:
+        alerts (iterable): Dictionaries that represent alerts
+        schema (str, optional): String with the platform to validate the alerts from. Default `linux`
+    """
+    validate_many(alerts, win32_schema if schema == 'win32' else linux_schema)
 
 
 def validate_analysis_alert_complex(alert, event, schema='linux'):
@@ -216,7 +227,7 @@ def validate_analysis_integrity_state(event):
     Args:
         event (dict): Candidate event to be validated against the state integrity schema
     """
-    validate(schema=state_integrity_analysis_schema, instance=event)
+    validate(event, state_integrity_analysis_schema)
 
 
 class CallbackWithContext(object):
@@ -1,7 +1,11 @@
+import csv
 import json
 import socket
 import os
 import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import chain
 
 from wazuh_testing.tools.monitoring import wazuh_pack, wazuh_unpack
 import wazuh_testing
@@ -13,6 +17,212 @@ WAZUH_DB_SOCKET_PATH = os.path.join(QUEUE_DB_PATH, 'wdb')
 CVE_DB_PATH = os.path.join(wazuh_testing.WAZUH_PATH, 'queue', 'vulnerabilities', 'cve.db')
 
 
+DEFAULT_WDB_PIPELINE_SIZE = 100
+# wazuh-db reads commands of up to 64 KiB
+WDB_MAX_COMMAND_SIZE = 60000
+SQL_MAX_ROWS_PER_INSERT = 500
+
+
+class WazuhDBClient:
+    """Client that keeps a connection to the wazuh-db socket open and pipelines the commands sent through it.
+
+    The connection is opened with the first command and reopened if wazuh-db closed it (e.g. after a restart) before
+    getting any command of a pipeline, so no command is ever run twice. Responses are read as full frames, no matter
+    their size.
+
+    Args:
+        socket_path (str): Path of the wazuh-db socket.
+        timeout (float): Socket timeout in seconds. None to block.
+        pipeline_size (int): Max commands sent before reading their responses.
+
+    Example:
+        >>> client = WazuhDBClient()
+        >>> client.execute_many([f"agent 000 sql DELETE FROM {table}" for table in ('sys_programs', 'sys_hotfixes')])
+        >>> with client.transaction('000') as batch:
+        ...     batch.append("agent 000 sql INSERT INTO sys_hotfixes (scan_id, hotfix) VALUES (0, 'KB1')")
+    """
+
+    def __init__(self, socket_path=WAZUH_DB_SOCKET_PATH, timeout=None, pipeline_size=DEFAULT_WDB_PIPELINE_SIZE):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.pipeline_size = pipeline_size
+        self.sock = None
+
+    def connect(self):
+        """Open the connection to wazuh-db if it is not already open."""
+        if self.sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self.sock = sock
+
+    def close(self):
+        """Close the connection to wazuh-db."""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _recv_exactly(self, size):
+        """Receive exactly `size` bytes from the socket.
+
+        Raises:
+            ConnectionError: If wazuh-db closes the connection.
+        """
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            read = self.sock.recv_into(view[received:], size - received)
+            if read == 0:
+                raise ConnectionError('wazuh-db closed the connection')
+            received += read
+
+        return bytes(buffer)
+
+    def _recv_response(self):
+        return self._recv_exactly(wazuh_unpack(self._recv_exactly(4))).decode()
+
+    @staticmethod
+    def _parse_response(data):
+        """Remove the response header and cast the data to a list of dictionaries.
+
+        From --> 'ok [ {data1}, {data2}...]' To--> [ {data1}, data2}...]
+        """
+        if len(data.split()) > 1 and data.split()[0] == 'ok':
+            data = json.loads(' '.join(data.split(' ')[1:]))
+
+        return data
+
+    def _send_pipeline(self, commands, reconnect=True):
+        """Send the commands at once and read their responses.
+
+        Raises:
+            BrokenPipeError, ConnectionError: If the connection is closed and it can not be known which commands were
+                run by wazuh-db.
+        """
+        self.connect()
+        payload = memoryview(b''.join(wazuh_pack(len(command.encode())) + command.encode() for command in commands))
+        sent = 0
+        try:
+            while sent < len(payload):
+                sent += self.sock.send(payload[sent:])
+        except (BrokenPipeError, ConnectionError):
+            self.close()
+            if sent > 0 or not reconnect:
+                raise
+            # wazuh-db closed the connection before getting any command, so they can be sent through a new one
+            return self._send_pipeline(commands, reconnect=False)
+
+        return [self._parse_response(self._recv_response()) for _ in commands]
+
+    def execute_many(self, commands):
+        """Send many commands to wazuh-db, waiting for the responses every `pipeline_size` commands.
+
+        Args:
+            commands (list(str)): wazuh-db commands. For example `global get-agent-info 000`.
+
+        Returns:
+            list: Response data of each command.
+        """
+        commands = list(commands)
+        responses = []
+        for index in range(0, len(commands), self.pipeline_size):
+            chunk = commands[index:index + self.pipeline_size]
+            try:
+                responses.extend(self._send_pipeline(chunk))
+            except Exception:
+                # The responses of the chunk can not be matched with its commands anymore
+                self.close()
+                raise
+
+        return responses
+
+    def query(self, command):
+        """Send a command to wazuh-db.
+
+        Args:
+            command (str): wazuh-db command. For example `global get-agent-info 000`.
+
+        Returns:
+            list: Query response data.
+        """
+        return self.execute_many([command])[0]
+
+    @contextmanager
+    def batch(self):
+        """Collect commands and send them pipelined when the block ends.
+
+        Yields:
+            list: List to append the commands to.
+        """
+        commands = []
+        yield commands
+        self.execute_many(commands)
+
+    @staticmethod
+    def _get_errors(responses):
+        return [response for response in responses if isinstance(response, str) and response.startswith('err')]
+
+    def _rollback(self, agent_id):
+        """Roll back the open transaction of an agent database, with plain SQL if wazuh-db has no rollback command."""
+        if self._get_errors([self.query(f"agent {agent_id} rollback")]):
+            self.query(f"agent {agent_id} sql ROLLBACK")
+
+    @contextmanager
+    def transaction(self, agent_id):
+        """Collect commands for an agent database and run them in a single wazuh-db transaction when the block ends.
+
+        The transaction is only committed if every command succeeds, otherwise it is rolled back.
+
+        Args:
+            agent_id (str): Agent ID.
+
+        Yields:
+            list: List to append the commands to.
+
+        Raises:
+            ValueError: If wazuh-db rejects any of the commands.
+        """
+        commands = []
+        yield commands
+        try:
+            errors = self._get_errors(self.execute_many([f"agent {agent_id} begin"] + commands))
+        except Exception:
+            try:
+                self._rollback(agent_id)
+            except Exception:
+                pass
+            raise
+
+        if errors:
+            self._rollback(agent_id)
+            raise ValueError(f"wazuh-db transaction of agent {agent_id} failed: {errors[0]}")
+
+        errors = self._get_errors([self.query(f"agent {agent_id} commit")])
+        if errors:
+            raise ValueError(f"wazuh-db transaction of agent {agent_id} failed: {errors[0]}")
+
+
+_wdb_clients = threading.local()
+
+
+def get_wdb_client():
+    """Get the wazuh-db client of the current thread.
+
+    Returns:
+        WazuhDBClient: Client with a persistent connection to wazuh-db.
+    """
+    try:
+        return _wdb_clients.client
+    except AttributeError:
+        _wdb_clients.client = WazuhDBClient()
+        return _wdb_clients.client
+
+
 def query_wdb(command):
     """Make queries to wazuh-db using the wdb socket.
 
@@ -22,29 +232,19 @@ def query_wdb(command):
     Returns:
         list: Query response data.
     """
-    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    sock.connect(WAZUH_DB_SOCKET_PATH)
-
-    data = []
-
-    try:
-        sock.send(wazuh_pack(len(command)) + command.encode())
+    return get_wdb_client().query(command)
 
-        rcv = sock.recv(4)
 
-        if len(rcv) == 4:
-            data_len = wazuh_unpack(rcv)
+def query_wdb_many(commands):
+    """Make many queries to wazuh-db pipelined through the wdb socket.
 
-            data = sock.recv(data_len).decode()
-
-            # Remove response header and cast str to list of dictionaries
-            # From --> 'ok [ {data1}, {data2}...]' To--> [ {data1}, data2}...]
-            if len(data.split()) > 1 and data.split()[0] == 'ok':
-                data = json.loads(' '.join(data.split(' ')[1:]))
-    finally:
-        sock.close()
+    Args:
+        commands (list(str)): wazuh-db command aliases.
 
-    return data
+    Returns:
+        list: Response data of each query.
+    """
+    return get_wdb_client().execute_many(commands)
 
 
 def load_sqlite_db(db_path):
@@ -103,3 +303,154 @@ def get_sqlite_query_result(db_path, query):
     finally:
         cursor.close()
         db.close()
+
+
+def sql_literal(value):
+    """Format a value as a SQL literal.
+
+    Args:
+        value (str, int, float, None): Value to format. None and 'NULL' are formatted as NULL.
+
+    Returns:
+        str: SQL literal.
+    """
+    if value is None or value == 'NULL':
+        return 'NULL'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def read_rows(source):
+    """Read rows from an iterable of dicts, a CSV file or a JSON lines file.
+
+    Args:
+        source (iterable, str): Iterable or generator of dicts, or path of a .csv or JSON lines file.
+
+    Yields:
+        dict: Each row.
+    """
+    if not isinstance(source, str):
+        yield from source
+        return
+
+    with open(source, newline='') as f:
+        if source.endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def build_insert_statements(table, rows, columns=None, defaults=None, or_replace=False,
+                            max_rows=SQL_MAX_ROWS_PER_INSERT, max_size=None):
+    """Build multi-row INSERT statements from a stream of rows.
+
+    Args:
+        table (str): Table name.
+        rows (iterable): Rows to insert. Dicts, or a path accepted by `read_rows`.
+        columns (list): Columns to insert. Defaults to the keys of `defaults` or the first row.
+        defaults (dict): Values of the columns missing in a row.
+        or_replace (bool): Use INSERT OR REPLACE.
+        max_rows (int): Max rows per statement.
+        max_size (int): Max length of a statement, if it has to fit in a wazuh-db command.
+
+    Yields:
+        str: INSERT statements.
+    """
+    rows = read_rows(rows)
+    first_row = next(rows, None)
+    if first_row is None:
+        return
+
+    defaults = defaults or {}
+    columns = columns or list(defaults or first_row)
+    quoted_columns = ', '.join(f'"{column}"' for column in columns)
+    header = f"INSERT {'OR REPLACE ' if or_replace else ''}INTO {table} ({quoted_columns}) VALUES "
+
+    values = []
+    size = len(header)
+    for row in chain([first_row], rows):
+        row_values = '(' + ', '.join(sql_literal(row.get(column, defaults.get(column))) for column in columns) + ')'
+        if values and (len(values) >= max_rows or (max_size and size + len(row_values) + 2 > max_size)):
+            yield header + ', '.join(values)
+            values = []
+            size = len(header)
+        values.append(row_values)
+        size += len(row_values) + 2
+
+    yield header + ', '.join(values)
+
+
+def bulk_insert_wdb(target, table, rows, columns=None, defaults=None, or_replace=False):
+    """Insert a stream of rows in a wazuh-db database with multi-row INSERT statements.
+
+    The statements are pipelined through the wazuh-db client. Agent databases are filled in a single transaction,
+    that is rolled back if any statement fails.
+
+    Args:
+        target (str): wazuh-db database, `global` or `agent <ID>`.
+        table (str): Table name.
+        rows (iterable): Rows to insert. Dicts, or a path accepted by `read_rows`.
+        columns (list): Columns to insert. Defaults to the keys of `defaults` or the first row.
+        defaults (dict): Values of the columns missing in a row.
+        or_replace (bool): Use INSERT OR REPLACE.
+
+    Returns:
+        int: Number of INSERT statements sent.
+
+    Raises:
+        ValueError: If wazuh-db rejects any of the statements.
+    """
+    client = get_wdb_client()
+    prefix = f"{target} sql "
+    statements = build_insert_statements(table, rows, columns, defaults, or_replace,
+                                         max_size=WDB_MAX_COMMAND_SIZE - len(prefix.encode()))
+    transaction = target.startswith('agent ')
+    sent = 0
+
+    commands = [f"{target} begin"] if transaction else []
+    try:
+        for statement in statements:
+            commands.append(prefix + statement)
+            sent += 1
+            if len(commands) >= client.pipeline_size:
+                _check_wdb_responses(client.execute_many(commands), target)
+                commands = []
+        if transaction:
+            commands.append(f"{target} commit")
+        _check_wdb_responses(client.execute_many(commands), target)
+    except Exception:
+        # Do not leave the statements already run pending for the next commit of the agent database
+        if transaction:
+            try:
+                client._rollback(target.split()[1])
+            except Exception:
+                pass
+        raise
+
+    return sent
+
+
+def _check_wdb_responses(responses, target):
+    for response in responses:
+        if isinstance(response, str) and response.startswith('err'):
+            raise ValueError(f"wazuh-db rejected the bulk insert in {target}: {response}")
+
+
+def bulk_insert_sqlite(db_path, table, rows, columns=None, defaults=None, or_replace=False):
+    """Insert a stream of rows directly in a sqlite database, in a single transaction.
+
+    Fast path for databases that are not in use by wazuh-db, like the CVE database or offline agent databases.
+
+    Args:
+        db_path (str): Path where is located the DB.
+        table (str): Table name.
+        rows (iterable): Rows to insert. Dicts, or a path accepted by `read_rows`.
+        columns (list): Columns to insert. Defaults to the keys of `defaults` or the first row.
+        defaults (dict): Values of the columns missing in a row.
+        or_replace (bool): Use INSERT OR REPLACE.
+    """
+    make_sqlite_query(db_path, build_insert_statements(table, rows, columns, defaults, or_replace))
@@ -1,7 +1,8 @@
 import datetime
+import os
 from time import time
 
-from wazuh_testing.db_interface import query_wdb
+from wazuh_testing.db_interface import query_wdb, query_wdb_many, bulk_insert_wdb, bulk_insert_sqlite, QUEUE_DB_PATH
 from wazuh_testing.modules.vulnerability_detector import DEFAULT_PACKAGE_NAME
 
 
@@ -16,6 +17,16 @@ def clean_table(agent_id, table):
     query_wdb(query_string)
 
 
+def clean_tables(agent_id, tables):
+    """Delete all the entries of several tables of the agent DB in a single round trip to wazuh_db.
+
+    Args:
+        agent_id (str): Agent ID.
+        tables (list): Tables from the agent DB.
+    """
+    query_wdb_many([f"agent {agent_id} sql DELETE FROM {table}" for table in tables])
+
+
 def update_last_full_scan(last_scan=0, agent_id='000'):
     """Update the last scan of an agent.
 
@@ -120,6 +131,58 @@ def insert_package(agent_id='000', scan_id=int(time()), format='rpm', name=DEFAU
               f"{arguments['item_id']})")
 
 
+def _bulk_insert(agent_id, table, rows, defaults, db_path):
+    if db_path:
+        bulk_insert_sqlite(db_path, table, rows, defaults=defaults)
+    else:
+        bulk_insert_wdb(f"agent {agent_id}", table, rows, defaults=defaults)
+
+
+def insert_packages(packages, agent_id='000', db_path=None):
+    """Insert many packages in the agent DB with multi-row INSERT statements in a single transaction.
+
+    Args:
+        packages (iterable): Packages as dicts with the `insert_package` arguments as keys, or the path of a CSV or
+            JSON lines file with them. Missing values take the `insert_package` defaults.
+        agent_id (str): Agent ID.
+        db_path (str): Path of the agent DB to write it directly instead of through wazuh-db, when wazuh-db is
+            stopped. Use `get_agent_db_path` to get it.
+    """
+    now = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+    defaults = {'scan_id': int(time()), 'scan_time': now, 'format': 'rpm', 'name': DEFAULT_PACKAGE_NAME,
+                'priority': '', 'section': 'Unspecified', 'size': 99, 'vendor': 'wazuhintegrationtests',
+                'install_time': now, 'version': '1.0.0-1.el7', 'architecture': 'x86_64', 'multiarch': '',
+                'source': 'Wazuh Integration tests mock package', 'description': 'Wazuh Integration tests mock package',
+                'location': '', 'triaged': 0, 'checksum': 'dummychecksum', 'item_id': 'dummyitemid'}
+    _bulk_insert(agent_id, 'sys_programs', packages, defaults, db_path)
+
+
+def insert_hotfixes(hotfixes, agent_id='000', db_path=None):
+    """Insert many hotfixes in the agent DB with multi-row INSERT statements in a single transaction.
+
+    Args:
+        hotfixes (iterable): Hotfixes as dicts with the `insert_hotfix` arguments as keys, or the path of a CSV or
+            JSON lines file with them. Missing values take the `insert_hotfix` defaults.
+        agent_id (str): Agent ID.
+        db_path (str): Path of the agent DB to write it directly instead of through wazuh-db.
+    """
+    defaults = {'scan_id': int(time()), 'scan_time': datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S"),
+                'hotfix': '000000', 'checksum': 'dummychecksum'}
+    _bulk_insert(agent_id, 'sys_hotfixes', hotfixes, defaults, db_path)
+
+
+def get_agent_db_path(agent_id):
+    """Get the path of the database of an agent.
+
+    Args:
+        agent_id (str): Agent ID.
+
+    Returns:
+        str: Path of the agent DB.
+    """
+    return os.path.join(QUEUE_DB_PATH, f"{agent_id}.db")
+
+
 def update_sync_info(agent_id='000', component='syscollector-packages', last_attempt=1, last_completion=1,
                      n_attempts=0, n_completions=0, last_agent_checksum=''):
     """Update the sync_info table of the specified agent for the selected component.
@@ -2,7 +2,7 @@ from datetime import datetime
 from time import sleep
 from sqlite3 import OperationalError
 
-from wazuh_testing.db_interface import make_sqlite_query, get_sqlite_query_result, CVE_DB_PATH
+from wazuh_testing.db_interface import make_sqlite_query, get_sqlite_query_result, bulk_insert_sqlite, CVE_DB_PATH
 from wazuh_testing.modules import vulnerability_detector as vd
 
 
@@ -67,6 +67,17 @@ def insert_vulnerability(cveid=vd.DEFAULT_VULNERABILITY_ID, target='RHEL7', targ
     make_sqlite_query(vd.CVE_DB_PATH, queries)
 
 
+def insert_rows(table, rows, or_replace=False):
+    """Insert many rows in a table of the CVE database with multi-row INSERT statements in a single transaction.
+
+    Args:
+        table (str): DB table.
+        rows (iterable): Rows as dicts with the column names as keys, or the path of a CSV or JSON lines file.
+        or_replace (bool): Replace the rows that already exist.
+    """
+    bulk_insert_sqlite(vd.CVE_DB_PATH, table, rows, or_replace=or_replace)
+
+
 def delete_vulnerability(cveid):
     """Remove a vulnerability from the DB.
 
@@ -1,4 +1,6 @@
-from wazuh_testing.db_interface import query_wdb
+from inspect import signature
+
+from wazuh_testing.db_interface import query_wdb, bulk_insert_wdb, bulk_insert_sqlite, read_rows
 
 
 def modify_system(os_name='CentOS Linux', os_major='7', name='centos7', agent_id='000', os_minor='1', os_arch='x86_64',
@@ -68,6 +70,28 @@ def create_or_update_agent(agent_id='001', name='centos8-agent', ip='127.0.0.1',
     query_wdb(query)
 
 
+def create_or_update_agents(agents, db_path=None):
+    """Create many agents or update their info if they already exist with multi-row INSERT OR REPLACE statements.
+
+    Args:
+        agents (iterable): Agents as dicts with the `create_or_update_agent` arguments as keys (`id` can be used
+            instead of `agent_id`), or the path of a CSV or JSON lines file with them. Missing values take the
+            `create_or_update_agent` defaults.
+        db_path (str): Path of the global DB to write it directly instead of through wazuh-db, when wazuh-db is
+            stopped.
+    """
+    defaults = {'id' if name == 'agent_id' else name: parameter.default
+                for name, parameter in signature(create_or_update_agent).parameters.items()}
+    agents = ({'id': agent['agent_id'], **agent} if 'agent_id' in agent else agent
+              for agent in read_rows(agents))
+    columns = list(defaults)
+
+    if db_path:
+        bulk_insert_sqlite(db_path, 'agent', agents, columns=columns, defaults=defaults, or_replace=True)
+    else:
+        bulk_insert_wdb('global', 'agent', agents, columns=columns, defaults=defaults, or_replace=True)
+
+
 def get_last_agent_id():
     """Get the last agent ID registered in the global DB.
 
@@ -5,6 +5,7 @@
 import json
 import os
 import platform
+import random
 import re
 import shutil
 import socket
@@ -12,20 +13,21 @@ import subprocess
 import sys
 import tempfile
 import time
-from collections import Counter
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from datetime import datetime
 from datetime import timedelta
 from hashlib import sha1
-from json import JSONDecodeError
 from stat import ST_ATIME, ST_MTIME
 from typing import Sequence, Union, Generator, Any
 
 import pytest
-from jsonschema import validate
 from wazuh_testing import global_parameters, logger
 from wazuh_testing.tools import LOG_FILE_PATH, WAZUH_PATH
-from wazuh_testing.tools.monitoring import FileMonitor
+from wazuh_testing.tools.event_fields import EventIndex
+from wazuh_testing.tools.monitoring import FileMonitor, PatternMatcher
+from wazuh_testing.tools.schemas import validate
 from wazuh_testing.tools.time import TimeMachine
 
 if sys.platform == 'win32':
@@ -34,17 +36,27 @@ if sys.platform == 'win32':
     import win32security as win32sec
     import ntsecuritycon as ntc
     import pywintypes
-elif sys.platform == 'linux2' or sys.platform == 'linux':
-    from jq import jq
 
 _data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
 
+# Shared by the FIM callbacks, so the regexes run only once per log line
+fim_matcher = PatternMatcher()
+fim_matcher.add_patterns({
+    'fim_event': {'pattern': r'.*Sending FIM event: (.+)$', 'json_group': 1},
+    'integrity_event': {'pattern': r'.*Sending integrity control message: (.+)$', 'json_group': 1}
+})
+
 FIFO = 'fifo'
 SYMLINK = 'sym_link'
 HARDLINK = 'hard_link'
 SOCKET = 'socket'
 REGULAR = 'regular'
 
+# Manifest entry of a file created by create_file_tree, with its target path when it is a link
+FileTreeEntry = namedtuple('FileTreeEntry', ['path', 'type', 'size', 'target'])
+_DIR_FD_SUPPORTED = sys.platform != 'win32' and {os.open, os.mkfifo, os.symlink, os.link, os.unlink} <= \
+    os.supports_dir_fd
+
 CHECK_ALL = 'check_all'
 CHECK_SUM = 'check_sum'
 CHECK_SHA1SUM = 'check_sha1sum'
@@ -185,6 +197,46 @@ else:
     RegCloseKey = 0
 
 
+_required_attributes_cache = {}
+
+
+def _get_event_schema_path():
+    json_file = 'syscheck_event_windows.json' if sys.platform == "win32" else 'syscheck_event.json'
+    return os.path.join(_data_path, json_file)
+
+
+def _expand_required_attributes(required_attributes_map, check_attributes, result):
+    for check in check_attributes:
+        mapped = required_attributes_map[check]
+        if isinstance(mapped, str):
+            result |= {mapped}
+        elif isinstance(mapped, list):
+            result |= set(mapped)
+        elif isinstance(mapped, set):
+            _expand_required_attributes(required_attributes_map, mapped, result)
+    return result
+
+
+def get_required_attributes(checks, required_attributes_map=None):
+    """Get the event attributes required by a set of CHECK_* options. Results are cached per combination of checks.
+
+    Args:
+        checks (set): set of XML CHECK_* options.
+        required_attributes_map (dict, optional): attributes of each check. Default `REQUIRED_ATTRIBUTES`.
+
+    Returns:
+        frozenset: required attributes.
+    """
+    required_attributes_map = REQUIRED_ATTRIBUTES if required_attributes_map is None else required_attributes_map
+    key = (id(required_attributes_map), frozenset(checks))
+    try:
+        return _required_attributes_cache[key]
+    except KeyError:
+        required_attributes = frozenset(_expand_required_attributes(required_attributes_map, checks, set()))
+        _required_attributes_cache[key] = required_attributes
+        return required_attributes
+
+
 def validate_event(event, checks=None, mode=None):
     """Check if event is properly formatted according to some checks.
 
@@ -193,23 +245,7 @@ def validate_event(event, checks=None, mode=None):
         checks (:obj:`set`, optional): set of XML CHECK_* options. Default `{CHECK_ALL}`
         mode (:obj:`str`, optional): represents the FIM mode expected for the event to validate.
     """
-
-    def get_required_attributes(check_attributes, result=None):
-        result = set() if result is None else result
-        for check in check_attributes:
-            mapped = REQUIRED_ATTRIBUTES[check]
-            if isinstance(mapped, str):
-                result |= {mapped}
-            elif isinstance(mapped, list):
-                result |= set(mapped)
-            elif isinstance(mapped, set):
-                result |= get_required_attributes(mapped, result=result)
-        return result
-
-    json_file = 'syscheck_event_windows.json' if sys.platform == "win32" else 'syscheck_event.json'
-    with open(os.path.join(_data_path, json_file), 'r') as f:
-        schema = json.load(f)
-    validate(schema=schema, instance=event)
+    validate(event, _get_event_schema_path())
 
     # Check FIM mode
     mode = global_parameters.current_configuration['metadata']['fim_mode'] if mode is None else mode.replace('-', '')
@@ -254,25 +290,7 @@ def validate_registry_key_event(event, checks=None, mode=None):
         mode (:obj:`str`, optional): represents the FIM mode expected for the event to validate.
     """
 
-    def get_required_attributes(check_attributes, result=None):
-        result = set() if result is None else result
-        for check in check_attributes:
-            mapped = REQUIRED_REG_KEY_ATTRIBUTES[check]
-
-            if isinstance(mapped, str):
-                result |= {mapped}
-            elif isinstance(mapped, list):
-                result |= set(mapped)
-            elif isinstance(mapped, set):
-                result |= get_required_attributes(mapped, result=result)
-
-        return result
-
-    json_file = 'syscheck_event_windows.json' if sys.platform == "win32" else 'syscheck_event.json'
-    with open(os.path.join(_data_path, json_file), 'r') as f:
-        schema = json.load(f)
-
-    validate(schema=schema, instance=event)
+    validate(event, _get_event_schema_path())
 
     # Check FIM mode
     mode = global_parameters.current_configuration['metadata']['fim_mode'] if mode is None else mode.replace('-', '')
@@ -283,7 +301,7 @@ def validate_registry_key_event(event, checks=None, mode=None):
     if checks:
         attributes = event['data']['attributes'].keys() - {'type', 'checksum'}
 
-        required_attributes = get_required_attributes(checks)
+        required_attributes = get_required_attributes(checks, REQUIRED_REG_KEY_ATTRIBUTES)
 
         intersection = attributes ^ required_attributes
         intersection_debug = "Event attributes are: " + str(attributes)
@@ -319,25 +337,7 @@ def validate_registry_value_event(event, checks=None, mode=None):
         mode (:obj:`str`, optional): represents the FIM mode expected for the event to validate.
     """
 
-    def get_required_attributes(check_attributes, result=None):
-        result = set() if result is None else result
-        for check in check_attributes:
-            mapped = REQUIRED_REG_VALUE_ATTRIBUTES[check]
-
-            if isinstance(mapped, str):
-                result |= {mapped}
-            elif isinstance(mapped, list):
-                result |= set(mapped)
-            elif isinstance(mapped, set):
-                result |= get_required_attributes(mapped, result=result)
-
-        return result
-
-    json_file = 'syscheck_event_windows.json' if sys.platform == "win32" else 'syscheck_event.json'
-    with open(os.path.join(_data_path, json_file), 'r') as f:
-        schema = json.load(f)
-
-    validate(schema=schema, instance=event)
+    validate(event, _get_event_schema_path())
 
     # Check FIM mode
     mode = global_parameters.current_configuration['metadata']['fim_mode'] if mode is None else mode.replace('-', '')
@@ -348,7 +348,7 @@ def validate_registry_value_event(event, checks=None, mode=None):
     if checks:
         attributes = event['data']['attributes'].keys() - {'type', 'checksum'}
 
-        required_attributes = get_required_attributes(checks)
+        required_attributes = get_required_attributes(checks, REQUIRED_REG_VALUE_ATTRIBUTES)
 
         intersection = attributes ^ required_attributes
         intersection_debug = "Event attributes are: " + str(attributes)
@@ -375,6 +375,25 @@ def validate_registry_value_event(event, checks=None, mode=None):
                                                  old_intersection_debug)
 
 
+def validate_events(events, checks=None, mode=None, event_type='file'):
+    """Check if many events are properly formatted according to some checks.
+
+    The schema is compiled and the required attributes are computed once for all the events.
+
+    Args:
+        events (iterable): events generated by syscheckd.
+        checks (:obj:`set`, optional): set of XML CHECK_* options. Default `{CHECK_ALL}`
+        mode (:obj:`str`, optional): represents the FIM mode expected for the events to validate.
+        event_type (str, optional): file, registry_key or registry_value. Default file.
+    """
+    validate_function = {'file': validate_event, 'registry_key': validate_registry_key_event,
+                         'registry_value': validate_registry_value_event}[event_type]
+    checks = frozenset(checks) if checks else checks
+
+    for event in events:
+        validate_function(event, checks, mode)
+
+
 def is_fim_scan_ended():
     """Check if a FIM scan has ended or not
 
@@ -564,6 +583,311 @@ def delete_file(path, name):
         os.remove(regular_path)
 
 
+class FileTreeSpec:
+    """Shape of a file tree to build in bulk with `create_file_tree`.
+
+    The files are spread evenly over all the directories of the tree, the root included, and their types and sizes
+    are drawn from the given weights, so the same spec always builds the same tree.
+
+    Args:
+        num_files (int): Number of files, links excluded.
+        depth (int, optional): Levels of subdirectories under the root. Default `0`
+        fan_out (int, optional): Subdirectories of each directory above the last level. Default `1`
+        sizes (int, list or dict, optional): Size in bytes of the regular files. It can be a single size, a list of
+            sizes to choose from or a {size: weight} dict. Default `0`
+        file_types (dict, optional): {type: weight} of the files. The types can be REGULAR, FIFO and SOCKET.
+            Default only REGULAR files.
+        symlinks (int, optional): Number of symbolic links to random regular files of the tree. Default `0`
+        hardlinks (int, optional): Number of hard links to random regular files of the tree. Default `0`
+        file_prefix (str, optional): Prefix of the file names, followed by their number. Default `'testfile'`
+        dir_prefix (str, optional): Prefix of the directory names, followed by their number. Default `'subdir'`
+        seed (int, optional): Seed of the random choices. Default `0`
+
+    Raises:
+        ValueError: If a file type is not supported or there are links but no regular files to point to.
+
+    Example:
+        >>> spec = FileTreeSpec(100000, depth=2, fan_out=10, sizes={0: 5, 1024: 4, 1048576: 1}, hardlinks=100)
+    """
+
+    def __init__(self, num_files, depth=0, fan_out=1, sizes=0, file_types=None, symlinks=0, hardlinks=0,
+                 file_prefix='testfile', dir_prefix='subdir', seed=0):
+        self.num_files = num_files
+        self.depth = depth
+        self.fan_out = fan_out
+        self.sizes = {sizes: 1} if isinstance(sizes, int) else \
+            dict(sizes) if isinstance(sizes, dict) else {size: 1 for size in sizes}
+        self.file_types = {REGULAR: 1} if file_types is None else dict(file_types)
+        self.symlinks = symlinks
+        self.hardlinks = hardlinks
+        self.file_prefix = file_prefix
+        self.dir_prefix = dir_prefix
+        self.seed = seed
+
+        supported_types = {REGULAR} if sys.platform == 'win32' else {REGULAR, FIFO, SOCKET}
+        unsupported_types = set(self.file_types) - supported_types
+        if unsupported_types:
+            raise ValueError(f"File types {sorted(unsupported_types)} are not supported in a file tree")
+        if (symlinks or hardlinks) and (num_files == 0 or self.file_types.get(REGULAR, 0) == 0):
+            raise ValueError('Links need regular files in the tree to point to')
+
+    def plan(self):
+        """Get the directories and files of the tree, without creating them.
+
+        Returns:
+            tuple: Relative paths of the directories, parents first and the root as `''`, the FileTreeEntry of each
+                file and the FileTreeEntry of each link.
+        """
+        directories = ['']
+        level = ['']
+        for _ in range(self.depth):
+            level = [os.path.join(parent, f"{self.dir_prefix}{i}") for parent in level for i in range(self.fan_out)]
+            directories.extend(level)
+
+        rng = random.Random(self.seed)
+        types = rng.choices(list(self.file_types), list(self.file_types.values()), k=self.num_files)
+        sizes = rng.choices(list(self.sizes), list(self.sizes.values()), k=self.num_files)
+        files = [FileTreeEntry(os.path.join(directories[i % len(directories)], f"{self.file_prefix}{i}"), type_,
+                               sizes[i] if type_ == REGULAR else 0, None)
+                 for i, type_ in enumerate(types)]
+
+        links = []
+        regular_files = [entry for entry in files if entry.type == REGULAR]
+        if regular_files:
+            for i in range(self.symlinks):
+                target = rng.choice(regular_files)
+                links.append(FileTreeEntry(os.path.join(directories[i % len(directories)],
+                                                        f"{self.file_prefix}_symlink{i}"), SYMLINK, 0, target.path))
+            for i in range(self.hardlinks):
+                target = rng.choice(regular_files)
+                links.append(FileTreeEntry(os.path.join(directories[i % len(directories)],
+                                                        f"{self.file_prefix}_hardlink{i}"), HARDLINK, target.size,
+                                           target.path))
+
+        return directories, files, links
+
+
+class FileTree:
+    """Manifest of a file tree created by `create_file_tree`.
+
+    Its `file_list` is relative to `root`, so it can be given directly to `EventChecker` along with the root as folder.
+
+    Args:
+        root (str): Path of the root directory of the tree.
+        directories (list): Relative paths of the directories, parents first and the root as `''`.
+        entries (list): FileTreeEntry of each file of the tree.
+
+    Attributes:
+        root (str): Path of the root directory of the tree.
+        directories (list): Relative paths of the directories, parents first and the root as `''`.
+        entries (dict): FileTreeEntry of each file, by its path relative to the root.
+
+    Example:
+        >>> tree = create_file_tree(testdir, FileTreeSpec(NUM_FILES, depth=1, fan_out=10))
+        >>> EventChecker(wazuh_log_monitor, tree.root, tree.file_list).fetch_and_check('added')
+    """
+
+    def __init__(self, root, directories, entries):
+        self.root = root
+        self.directories = directories
+        self.entries = {entry.path: entry for entry in entries}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    @property
+    def file_list(self):
+        """list: Relative paths of all the files of the tree."""
+        return list(self.entries)
+
+    def get_file_list(self, *types):
+        """Get the relative paths of the files of some types.
+
+        Args:
+            *types (str): File types, like REGULAR or SYMLINK. All the files if there are none.
+
+        Returns:
+            list: Relative paths of the files.
+        """
+        return [path for path, entry in self.entries.items() if not types or entry.type in types]
+
+    def get_paths(self, file_list=None):
+        """Get the absolute paths of some files of the tree.
+
+        Args:
+            file_list (list, optional): Relative paths of the files. Default all the files.
+
+        Returns:
+            list: Absolute paths of the files.
+        """
+        return [os.path.join(self.root, path) for path in (self.entries if file_list is None else file_list)]
+
+
+def _run_on_file_tree(root, entries, operation, workers):
+    """Run an operation on many files of a tree, with a task per directory for a pool of threads.
+
+    Each task opens its directory once and, where the platform allows it, works on the files by name relative to it,
+    so the kernel does not resolve the whole path for every syscall.
+
+    Args:
+        root (str): Path of the root directory of the tree.
+        entries (list): FileTreeEntry of the files.
+        operation (callable): Function called with the file path relative to the directory descriptor (or the full
+            path when there is none), the descriptor and the FileTreeEntry.
+        workers (int): Number of threads. Default the ThreadPoolExecutor one.
+    """
+    def run_on_directory(directory, directory_entries):
+        directory_path = os.path.join(root, directory)
+        dir_fd = os.open(directory_path, os.O_RDONLY) if _DIR_FD_SUPPORTED else None
+        try:
+            for entry in directory_entries:
+                name = os.path.basename(entry.path)
+                operation(name if dir_fd is not None else os.path.join(directory_path, name), dir_fd, entry)
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+
+    entries_per_directory = {}
+    for entry in entries:
+        entries_per_directory.setdefault(os.path.dirname(entry.path), []).append(entry)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_on_directory, directory, directory_entries)
+                   for directory, directory_entries in entries_per_directory.items()]
+        for future in futures:
+            future.result()
+
+
+def _write_tree_file(path, dir_fd, flags, content):
+    fd = os.open(path, flags | getattr(os, 'O_BINARY', 0), 0o666, dir_fd=dir_fd)
+    try:
+        written = 0
+        while written < len(content):
+            written += os.write(fd, content[written:])
+    finally:
+        os.close(fd)
+
+
+def create_file_tree(root, spec, workers=None):
+    """Create a whole file tree in bulk, for tests that need many files like the file_limit ones.
+
+    The directories are created first and then the files of each directory are created by a pool of threads, without
+    logging them one by one. The regular files are filled with slices of the same random block.
+
+    Args:
+        root (str): Path of the root directory of the tree. It is created if it does not exist.
+        spec (FileTreeSpec): Shape of the tree.
+        workers (int, optional): Number of threads. Default the ThreadPoolExecutor one.
+
+    Returns:
+        FileTree: Manifest of the created tree.
+
+    Raises:
+        OSError: If a directory or file can not be created.
+    """
+    directories, files, links = spec.plan()
+    logger.info(f"Creating a tree of {len(files) + len(links)} files and {len(directories) - 1} directories "
+                f"in {root}")
+    os.makedirs(root, exist_ok=True, mode=0o777)
+    for directory in directories[1:]:
+        try:
+            os.mkdir(os.path.join(root, directory), mode=0o777)
+        except FileExistsError:
+            pass
+
+    content = os.urandom(max((entry.size for entry in files), default=0))
+
+    def create_entry(path, dir_fd, entry):
+        if entry.type == REGULAR:
+            _write_tree_file(path, dir_fd, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, memoryview(content)[:entry.size])
+        elif entry.type == FIFO:
+            os.mkfifo(path, dir_fd=dir_fd)
+        elif entry.type == SOCKET:
+            _create_socket(root, entry.path)
+        elif entry.type == SYMLINK:
+            os.symlink(os.path.join(root, entry.target), path, dir_fd=dir_fd)
+        else:
+            os.link(os.path.join(root, entry.target), path, dst_dir_fd=dir_fd)
+
+    # Links are created once all the files they can point to exist
+    _run_on_file_tree(root, files, create_entry, workers)
+    _run_on_file_tree(root, links, create_entry, workers)
+
+    return FileTree(root, directories, files + links)
+
+
+def modify_file_tree(tree, file_list=None, new_content=None, workers=None):
+    """Append content to many files of a tree in bulk, so each one raises a 'modified' event.
+
+    Args:
+        tree (FileTree): Manifest of the tree.
+        file_list (list, optional): Relative paths of the files to modify. Default all the regular files.
+        new_content (str or bytes, optional): Content appended to each file. Default the `modify_file_content` one.
+        workers (int, optional): Number of threads. Default the ThreadPoolExecutor one.
+
+    Returns:
+        list: Relative paths of the modified files.
+
+    Raises:
+        ValueError: If a file is a FIFO or a socket, which have no content to modify.
+    """
+    file_list = tree.get_file_list(REGULAR) if file_list is None else list(file_list)
+    entries = [tree.entries[path] for path in file_list]
+    if any(entry.type in (FIFO, SOCKET) for entry in entries):
+        raise ValueError('FIFO and socket files can not be modified')
+
+    content = "1234567890qwertyu" if new_content is None else new_content
+    content = content.encode() if isinstance(content, str) else content
+    logger.info(f"Modifying {len(entries)} files of the tree in {tree.root}")
+
+    _run_on_file_tree(tree.root, entries,
+                      lambda path, dir_fd, entry: _write_tree_file(path, dir_fd, os.O_WRONLY | os.O_APPEND, content),
+                      workers)
+
+    return file_list
+
+
+def delete_file_tree(tree, file_list=None, workers=None):
+    """Delete many files of a tree in bulk and remove them from its manifest.
+
+    When all the files are deleted, the subdirectories of the tree are removed too, but not its root.
+
+    Args:
+        tree (FileTree): Manifest of the tree.
+        file_list (list, optional): Relative paths of the files to delete. Default all the files.
+        workers (int, optional): Number of threads. Default the ThreadPoolExecutor one.
+
+    Returns:
+        list: Relative paths of the deleted files.
+    """
+    delete_all = file_list is None
+    file_list = tree.file_list if delete_all else list(file_list)
+    logger.info(f"Deleting {len(file_list)} files of the tree in {tree.root}")
+
+    def delete_entry(path, dir_fd, entry):
+        try:
+            os.unlink(path, dir_fd=dir_fd)
+        except FileNotFoundError:
+            pass
+
+    _run_on_file_tree(tree.root, [tree.entries[path] for path in file_list], delete_entry, workers)
+    for path in file_list:
+        del tree.entries[path]
+
+    if delete_all:
+        for directory in reversed(tree.directories[1:]):
+            try:
+                os.rmdir(os.path.join(tree.root, directory))
+            except FileNotFoundError:
+                pass
+        tree.directories = tree.directories[:1]
+
+    return file_list
+
+
 def delete_registry(key, subkey, arch):
     """Delete a registry key.
 
@@ -972,15 +1296,14 @@ def change_conf_param(param, value):
 
 
 def callback_detect_end_scan(line):
-    msg = r'.*Sending FIM event: (.+)$'
-    match = re.match(msg, line)
-    if not match:
+    event = fim_matcher.match(line).get('fim_event')
+    if event is None:
         return None
 
     try:
-        if json.loads(match.group(1))['type'] == 'scan_end':
+        if event['type'] == 'scan_end':
             return True
-    except (JSONDecodeError, AttributeError, KeyError) as e:
+    except (AttributeError, KeyError, TypeError) as e:
         logger.warning(f"Couldn't load a log line into json object. Reason {e}")
 
 
@@ -988,15 +1311,14 @@ def callback_detect_scan_start(line):
     """
     Detect the start of a scheduled scan or initial scan.
     """
-    msg = r'.*Sending FIM event: (.+)$'
-    match = re.match(msg, line)
-    if not match:
+    event = fim_matcher.match(line).get('fim_event')
+    if event is None:
         return None
 
     try:
-        if json.loads(match.group(1))['type'] == 'scan_start':
+        if event['type'] == 'scan_start':
             return True
-    except (JSONDecodeError, AttributeError, KeyError) as e:
+    except (AttributeError, KeyError, TypeError) as e:
         logger.warning(f"Couldn't load a log line into json object. Reason {e}")
 
 
@@ -1004,14 +1326,13 @@ def callback_get_scan_timestap(line):
     """
     Get the timestamp for the end of the initial scan or a scheduled scan
     """
-    msg = r'.*Sending FIM event: (.+)$'
-    match = re.match(msg, line)
-    if not match:
+    event = fim_matcher.match(line).get('fim_event')
+    if event is None:
         return None
     try:
-        if json.loads(match.group(1))['type'] == 'scan_end':
-            return json.loads(match.group(1))['data']['timestamp']
-    except (JSONDecodeError, AttributeError, KeyError) as e:
+        if event['type'] == 'scan_end':
+            return event['data']['timestamp']
+    except (AttributeError, KeyError, TypeError) as e:
         logger.warning(f"Couldn't load a log line into json object. Reason {e}")
 
 
@@ -1019,69 +1340,58 @@ def callback_detect_event(line):
     """
     Detect an 'event' type FIM log.
     """
-    msg = r'.*Sending FIM event: (.+)$'
-    match = re.match(msg, line)
-    if not match:
+    json_event = fim_matcher.match(line).get('fim_event')
+    if json_event is None:
         return None
 
     try:
-        json_event = json.loads(match.group(1))
         if json_event['type'] == 'event':
             return json_event
-    except (JSONDecodeError, AttributeError, KeyError) as e:
+    except (AttributeError, KeyError, TypeError) as e:
         logger.warning(f"Couldn't load a log line into json object. Reason {e}")
 
 
 def callback_detect_modified_event(line):
-    msg = r'.*Sending FIM event: (.+)$'
-    match = re.match(msg, line)
-    if not match:
+    json_event = fim_matcher.match(line).get('fim_event')
+    if json_event is None:
         return None
 
     try:
-        json_event = json.loads(match.group(1))
         if json_event['type'] == 'event' and json_event['data']['type'] == 'modified':
             return json_event
-    except (JSONDecodeError, AttributeError, KeyError) as e:
+    except (AttributeError, KeyError, TypeError) as e:
         logger.warning(f"Couldn't load a log line into json object. Reason {e}")
 
 
 def callback_detect_delete_event(line):
-    msg = r'.*Sending FIM event: (.+)$'
-    match = re.match(msg, line)
-    if not match:
+    json_event = fim_matcher.match(line).get('fim_event')
+    if json_event is None:
         return None
 
     try:
-        json_event = json.loads(match.group(1))
         if json_event['type'] == 'event' and json_event['data']['type'] == 'deleted':
             return json_event
-    except (JSONDecodeError, AttributeError, KeyError) as e:
+    except (AttributeError, KeyError, TypeError) as e:
         logger.warning(f"Couldn't load a log line into json object. Reason {e}")
 
 
 def callback_detect_modified_event_with_inode_mtime(line):
-    msg = r'.*Sending FIM event: (.+)$'
-    match = re.match(msg, line)
-    if not match:
+    json_event = fim_matcher.match(line).get('fim_event')
+    if json_event is None:
         return None
 
     try:
-        json_event = json.loads(match.group(1))
         if json_event['type'] == 'event' and json_event['data']['type'] == 'modified':
             # If 'changed_attributes' are not exactly 'inode' and 'mtime', symmetric_difference
             # will return a non-empty set, returning the event.
             if {'inode', 'mtime'}.symmetric_difference(set(json_event['data']['changed_attributes'])):
                 return json_event
-    except (JSONDecodeError, AttributeError, KeyError) as e:
+    except (AttributeError, KeyError, TypeError) as e:
         logger.warning(f"Couldn't load a log line into json object. Reason {e}")
 
 
 def callback_detect_integrity_event(line):
-    match = re.match(r'.*Sending integrity control message: (.+)$', line)
-    if match:
-        return json.loads(match.group(1))
-    return None
+    return fim_matcher.match(line).get('integrity_event')
 
 
 def callback_detect_registry_integrity_state_event(line):
@@ -1607,41 +1917,34 @@ class EventChecker:
                 options (set): set of XML CHECK_* options. Default `{CHECK_ALL}`
                 mode (str): represents the FIM mode expected for the event to validate.
             """
-            for ev in events:
-                validate_event(ev, options, mode)
+            validate_events(events, options, mode)
 
-        def check_events_type(events, ev_type, file_list=['testfile0']):
-            event_types = Counter(filter_events(events, ".[].data.type"))
+        def check_events_type(event_index, ev_type, file_list=['testfile0']):
+            event_types = event_index.counter('.data.type')
             msg = f"Non expected number of events. {event_types[ev_type]} != {len(file_list)}"
             assert (event_types[ev_type] == len(file_list)), msg
 
-        def check_events_path(events, folder, file_list=['testfile0'], mode=None):
+        def check_events_path(event_index, folder, file_list=['testfile0'], mode=None):
             mode = global_parameters.current_configuration['metadata']['fim_mode'] if mode is None else mode
-            data_path = filter_events(events, ".[].data.path")
+            data_path = event_index.values('.data.path')
+            if self.encoding is not None:
+                data_path = [item.encode(encoding=self.encoding) for item in data_path]
+            data_paths = set(data_path)
             for file_name in file_list:
                 expected_path = os.path.join(folder, file_name)
-                if self.encoding is not None:
-                    for index, item in enumerate(data_path):
-                        data_path[index] = item.encode(encoding=self.encoding)
                 if sys.platform == 'darwin' and self.encoding and self.encoding != 'utf-8':
                     logger.info(f"Not asserting {expected_path} in event.data.path. "
                                 f'Reason: using non-utf-8 encoding in darwin.')
                 else:
                     error_msg = f"Expected data path was '{expected_path}' but event data path is '{data_path}'"
-                    assert (expected_path in data_path), error_msg
-
-        def filter_events(events, mask):
-            """Returns a list of elements matching a specified mask in the events list using jq module."""
-            if sys.platform in ("win32", 'sunos5', 'darwin'):
-                stdout = subprocess.check_output(["jq", "-r", mask], input=json.dumps(events).encode())
-                return stdout.decode("utf8").strip().split(os.linesep)
-            else:
-                return jq(mask).transform(events, multiple_output=True)
+                    assert (expected_path in data_paths), error_msg
 
         if self.events is not None:
             validate_checkers_per_event(self.events, self.options, mode)
-            check_events_type(self.events, event_type, self.file_list)
-            check_events_path(self.events, self.folder, file_list=self.file_list, mode=mode)
+            # Extract the checked fields of all the events at once, so each check is a lookup
+            event_index = EventIndex(self.events, '.data.type', '.data.path')
+            check_events_type(event_index, event_type, self.file_list)
+            check_events_path(event_index, self.folder, file_list=self.file_list, mode=mode)
 
             if self.custom_validator is not None:
                 self.custom_validator.validate_after_cud(self.events)
@@ -1750,63 +2053,52 @@ if sys.platform == 'win32':
                     options (set): set of XML CHECK_* options. Default `{CHECK_ALL}`
                     mode (str): represents the FIM mode expected for the event to validate.
                 """
-                for ev in events:
-                    if self.is_value:
-                        validate_registry_value_event(ev, options, mode)
-                    else:
-                        validate_registry_key_event(ev, options, mode)
+                validate_events(events, options, mode,
+                                event_type='registry_value' if self.is_value else 'registry_key')
 
-            def check_events_type(events, ev_type, reg_list=['testkey0']):
-                event_types = Counter(filter_events(events, ".[].data.type"))
+            def check_events_type(event_index, ev_type, reg_list=['testkey0']):
+                event_types = event_index.counter('.data.type')
 
                 assert (event_types[ev_type] == len(reg_list)
                         ), f'Non expected number of events. {event_types[ev_type]} != {len(reg_list)}'
 
-            def check_events_key_path(events, registry_key, reg_list=['testkey0'], mode=None):
+            def check_events_key_path(event_index, registry_key, reg_list=['testkey0'], mode=None):
                 mode = global_parameters.current_configuration['metadata']['fim_mode'] if mode is None else mode
-                key_path = filter_events(events, ".[].data.path")
+                key_path = event_index.values('.data.path')
+
+                if self.encoding is not None:
+                    key_path = [item.encode(encoding=self.encoding) for item in key_path]
+                key_paths = set(key_path)
 
                 for reg in reg_list:
                     expected_path = os.path.join(registry_key, reg)
 
-                    if self.encoding is not None:
-                        for index, item in enumerate(key_path):
-                            key_path[index] = item.encode(encoding=self.encoding)
-
                     error_msg = f"Expected key path was '{expected_path}' but event key path is '{key_path}'"
-                    assert (expected_path in key_path), error_msg
+                    assert (expected_path in key_paths), error_msg
 
-            def check_events_registry_value(events, key, value_list=['testvalue0'], mode=None):
+            def check_events_registry_value(event_index, key, value_list=['testvalue0'], mode=None):
                 mode = global_parameters.current_configuration['metadata']['fim_mode'] if mode is None else mode
-                key_path = filter_events(events, ".[].data.path")
-                value_name = filter_events(events, ".[].data.value_name")
+                key_path = event_index.values('.data.path')
+                value_name = event_index.values('.data.value_name')
 
                 for value in value_list:
                     error_msg = f"Expected value name was '{value}' but event value name is '{value_name}'"
-                    assert (value in value_name), error_msg
+                    assert (value in event_index.set('.data.value_name')), error_msg
 
                     error_msg = f"Expected key path was '{key}' but event key path is '{key_path}'"
-                    assert (key in key_path), error_msg
-
-            def filter_events(events, mask):
-                """Returns a list of elements matching a specified mask in the events list using jq module."""
-                if sys.platform in ("win32", 'sunos5', 'darwin'):
-                    stdout = subprocess.check_output(["jq", "-r", mask], input=json.dumps(events).encode())
-
-                    return stdout.decode("utf8").strip().split(os.linesep)
-                else:
-                    return jq(mask).transform(events, multiple_output=True)
+                    assert (key in event_index.set('.data.path')), error_msg
 
             if self.events is not None:
                 validate_checkers_per_event(self.events, self.options, mode)
+                event_index = EventIndex(self.events, '.data.type', '.data.path', '.data.value_name')
 
                 if self.is_value:
-                    check_events_type(self.events, event_type, self.registry_dict)
-                    check_events_registry_value(self.events, self.registry_key, value_list=self.registry_dict,
+                    check_events_type(event_index, event_type, self.registry_dict)
+                    check_events_registry_value(event_index, self.registry_key, value_list=self.registry_dict,
                                                 mode=mode)
                 else:
-                    check_events_type(self.events, event_type, self.registry_dict)
-                    check_events_key_path(self.events, self.registry_key, reg_list=self.registry_dict, mode=mode)
+                    check_events_type(event_index, event_type, self.registry_dict)
+                    check_events_key_path(event_index, self.registry_key, reg_list=self.registry_dict, mode=mode)
 
                 if self.custom_validator is not None:
                     self.custom_validator.validate_after_cud(self.events)
@@ -1,4 +1,5 @@
 import os
+from tempfile import gettempdir
 
 from wazuh_testing.tools import WAZUH_PATH
 from wazuh_testing.db_interface import CVE_DB_PATH
@@ -108,6 +109,7 @@ MSU_LOG = 'Microsoft Security Update'
 CUSTOM_MSU = 'custom_msu.json'
 CUSTOM_CPE_HELPER = 'custom_cpe_helper.json'
 VULNERABILITIES = 'vulnerabilities.json'
+FEED_INDEX_CACHE_PATH = os.path.join(gettempdir(), 'wazuh_testing_feed_index_cache')
 
 FEED_TABLES = ['vulnerabilities', 'vulnerabilities_info', 'references_info', 'bugzilla_references_info',
                'advisories_info', 'metadata', 'variables']
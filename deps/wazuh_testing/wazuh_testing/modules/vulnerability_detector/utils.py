@@ -1,11 +1,21 @@
+import hashlib
 import json
 import functools
+import os
+import pickle
+import re
+import xml.etree.ElementTree as ET
+from collections import namedtuple
 from sqlite3 import OperationalError
 
 from wazuh_testing.modules import vulnerability_detector as vd
 from wazuh_testing.db_interface import agent_db
 from wazuh_testing.db_interface import cve_db
 
+CVEScore = namedtuple('CVEScore', ['severity', 'cvss2', 'cvss3'])
+# Red Hat OVAL criteria name the package in their comment, like 'libvpx-devel is installed'
+_OVAL_PACKAGE_COMMENT = re.compile(r'^(\S+) (?:is installed|is earlier than|DPKG is earlier than)\b')
+
 
 def clean_vd_tables(agent_id='000'):
     """Clean the tables involved with vulnerability detector packages and feeds
@@ -14,11 +24,7 @@ def clean_vd_tables(agent_id='000'):
         agent_id (str): id of the agent
     """
     # Clean tables in Wazuh-DB
-    for item in vd.AGENT_SYS_TABLES:
-        try:
-            agent_db.clean_table(agent_id, item)
-        except OperationalError:
-            pass
+    agent_db.clean_tables(agent_id, vd.AGENT_SYS_TABLES)
 
     # Clean feeds DB
     for item in vd.FEED_TABLES:
@@ -105,9 +111,336 @@ def calculate_severity_from_score(base_score, cvss):
     return severity
 
 
+def _severity_from_scores(cvss2_score, cvss3_score, default='-'):
+    """Get the severity of a CVE from its scores, where CVSS3 has priority over CVSS2."""
+    if cvss3_score is not None:
+        return calculate_severity_from_score(cvss3_score, 'cvss3')
+    if cvss2_score is not None:
+        return calculate_severity_from_score(cvss2_score, 'cvss2')
+
+    return default
+
+
+def _oval_score(value):
+    """Get the base score of an OVAL `cvss2`/`cvss3` attribute, like `7.5/CVSS:3.1/AV:N/...`."""
+    try:
+        return float(value.split('/', 1)[0]) if value else None
+    except ValueError:
+        return None
+
+
+def _local_name(tag):
+    """Get the name of an XML tag without its namespace."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _find_all(element, name):
+    """Get the descendants of an XML element with a name, whatever their namespace is."""
+    return [child for child in element.iter() if _local_name(child.tag) == name]
+
+
+class FeedIndex:
+    """Scores and affected packages of the CVEs of a vulnerability feed, indexed by CVE ID and by package name.
+
+    The feed is scanned only once, when the index is built, so each lookup takes constant time. The severity of each
+    CVE is precomputed from its scores, where CVSS3 has priority over CVSS2, and a score is None when the feed does not
+    have it.
+
+    Args:
+        cves (dict): CVEScore of each CVE ID.
+        packages (dict): CVE IDs affecting each package name.
+
+    Attributes:
+        cves (dict): CVEScore of each CVE ID.
+        packages (dict): CVE IDs affecting each package name.
+
+    Example:
+        >>> nvd_index = load_feed_index(nvd_feed_path)
+        >>> severity, cvss2_score, cvss3_score = nvd_index.get_score('CVE-2019-11764')
+    """
+
+    def __init__(self, cves=None, packages=None):
+        self.cves = {} if cves is None else cves
+        self.packages = {} if packages is None else packages
+
+    def __len__(self):
+        return len(self.cves)
+
+    def __contains__(self, cve_id):
+        return cve_id in self.cves
+
+    def _add(self, cve_id, score, packages):
+        # The first entry of a CVE is the one used by the vulnerability detector, as in the former linear scans
+        self.cves.setdefault(cve_id, score)
+        for package in packages:
+            self.packages.setdefault(package, set()).add(cve_id)
+
+    @classmethod
+    def from_nvd(cls, cve_items):
+        """Build the index of a NVD JSON feed.
+
+        The affected packages are the products of its `affects` section and of the CPEs of its configurations.
+
+        Args:
+            cve_items (dict or list): NVD feed or its `CVE_Items` list.
+
+        Returns:
+            FeedIndex: Index of the feed.
+        """
+        index = cls()
+        for cve in cve_items['CVE_Items'] if isinstance(cve_items, dict) else cve_items:
+            impact = cve.get('impact', {})
+            cvss2_score = impact['baseMetricV2']['cvssV2']['baseScore'] if 'baseMetricV2' in impact else None
+            cvss3_score = impact['baseMetricV3']['cvssV3']['baseScore'] if 'baseMetricV3' in impact else None
+
+            packages = set()
+            for vendor in cve['cve'].get('affects', {}).get('vendor', {}).get('vendor_data', []):
+                packages.update(product['product_name'] for product in vendor['product']['product_data'])
+            nodes = list(cve.get('configurations', {}).get('nodes', []))
+            while nodes:
+                node = nodes.pop()
+                nodes.extend(node.get('children', []))
+                packages.update(cpe['cpe23Uri'].split(':')[4] for cpe in node.get('cpe_match', [])
+                                if cpe.get('vulnerable', True))
+
+            index._add(cve['cve']['CVE_data_meta']['ID'],
+                       CVEScore(_severity_from_scores(cvss2_score, cvss3_score), cvss2_score, cvss3_score), packages)
+
+        return index
+
+    @classmethod
+    def from_redhat_json(cls, cve_items):
+        """Build the index of a Red Hat JSON feed.
+
+        Unlike in the other feeds, a CVE with many entries gets the scores of the last entry that has them, which is
+        how the Red Hat scores override the NVD ones.
+
+        Args:
+            cve_items (list): Entries of the feed.
+
+        Returns:
+            FeedIndex: Index of the feed.
+        """
+        index = cls()
+        for cve in cve_items:
+            severity, cvss2_score, cvss3_score = index.cves.get(cve['CVE'], CVEScore('-', None, None))
+            if cve.get('cvss_score') is not None:
+                cvss2_score = float(cve['cvss_score'])
+                severity = calculate_severity_from_score(cvss2_score, 'cvss2')
+            if cve.get('cvss3_score') is not None:
+                cvss3_score = float(cve['cvss3_score'])
+                severity = calculate_severity_from_score(cvss3_score, 'cvss3')
+            index.cves[cve['CVE']] = CVEScore(severity, cvss2_score, cvss3_score)
+            for package in cve.get('affected_packages') or []:
+                # Affected packages are NEVRAs like 'libvpx-0:1.3.0-8.el6'
+                index.packages.setdefault(re.sub(r'-(\d+:)?[^-]+-[^-]+$', '', package), set()).add(cve['CVE'])
+
+        return index
+
+    @classmethod
+    def from_oval(cls, feed):
+        """Build the index of an OVAL XML feed, like the Canonical, Debian or Red Hat ones.
+
+        The affected packages are the products of the definitions metadata and the names of the objects checked by
+        their criteria, or the package named by the criterion comment when the feed has no objects.
+
+        Args:
+            feed (str): Path of the OVAL feed or its XML content.
+
+        Returns:
+            FeedIndex: Index of the feed.
+        """
+        root = ET.fromstring(feed) if feed.lstrip().startswith('<') else ET.parse(feed).getroot()
+
+        # Resolve the packages checked by each test: test -> object -> name, given directly or by a variable
+        variable_values = {element.get('id'): [value.text.strip() for value in element
+                                               if _local_name(value.tag) == 'value' and value.text]
+                           for element in root.iter() if _local_name(element.tag).endswith('_variable')}
+        object_names = {}
+        for element in root.iter():
+            if _local_name(element.tag).endswith('_object'):
+                for child in element:
+                    if _local_name(child.tag) == 'name':
+                        object_names[element.get('id')] = [child.text.strip()] if child.text and child.text.strip() \
+                            else variable_values.get(child.get('var_ref'), [])
+        test_packages = {}
+        for element in root.iter():
+            if _local_name(element.tag).endswith('_test'):
+                for child in element:
+                    if _local_name(child.tag) == 'object' and object_names.get(child.get('object_ref')):
+                        test_packages[element.get('id')] = object_names[child.get('object_ref')]
+
+        index = cls()
+        for definition in _find_all(root, 'definition'):
+            cve_ids = [reference.get('ref_id') for reference in _find_all(definition, 'reference')
+                       if reference.get('source') == 'CVE']
+            cvss2_score = cvss3_score = None
+            for cve in _find_all(definition, 'cve'):
+                if cve.text and cve.text.strip() not in cve_ids:
+                    cve_ids.append(cve.text.strip())
+                cvss2_score = _oval_score(cve.get('cvss2')) if cvss2_score is None else cvss2_score
+                cvss3_score = _oval_score(cve.get('cvss3')) if cvss3_score is None else cvss3_score
+            advisory_severity = next((severity.text.strip().capitalize()
+                                      for severity in _find_all(definition, 'severity') if severity.text), '-')
+
+            packages = {product.text.strip() for product in _find_all(definition, 'product') if product.text}
+            for criterion in _find_all(definition, 'criterion'):
+                if criterion.get('test_ref') in test_packages:
+                    packages.update(test_packages[criterion.get('test_ref')])
+                else:
+                    match = _OVAL_PACKAGE_COMMENT.match(criterion.get('comment', ''))
+                    if match:
+                        packages.add(match.group(1))
+
+            score = CVEScore(_severity_from_scores(cvss2_score, cvss3_score, advisory_severity), cvss2_score,
+                             cvss3_score)
+            for cve_id in cve_ids:
+                index._add(cve_id, score, packages)
+
+        return index
+
+    def get_score(self, cve_id, default=None):
+        """Get the severity and scores of a CVE.
+
+        Args:
+            cve_id (str): CVE ID.
+            default (any, optional): Value returned if the CVE is not in the feed. Default `None`
+
+        Returns:
+            CVEScore: Severity, CVSS2 and CVSS3 scores of the CVE.
+        """
+        return self.cves.get(cve_id, default)
+
+    def get_cves(self, package):
+        """Get the CVEs affecting a package.
+
+        Args:
+            package (str): Package name.
+
+        Returns:
+            list: Sorted CVE IDs.
+        """
+        return sorted(self.packages.get(package, ()))
+
+
+_FEED_INDEX_BUILDERS = {
+    'nvd': FeedIndex.from_nvd,
+    'redhat_json': FeedIndex.from_redhat_json,
+    'oval': lambda content: FeedIndex.from_oval(content.decode())
+}
+# Bumped when the index changes, so the indexes cached by other versions are not used
+_FEED_INDEX_VERSION = b'1'
+_feed_indexes = {}
+_array_indexes = {}
+
+
+def _get_feed_index_cache_dir():
+    """Get the directory of the cached feed indexes, if it is only writable by the current user."""
+    try:
+        os.makedirs(vd.FEED_INDEX_CACHE_PATH, mode=0o700, exist_ok=True)
+        cache_stat = os.stat(vd.FEED_INDEX_CACHE_PATH)
+    except OSError:
+        return None
+
+    # The cached indexes are unpickled, so they must not be replaceable by other users
+    if hasattr(os, 'getuid') and (cache_stat.st_uid != os.getuid() or cache_stat.st_mode & 0o022):
+        return None
+
+    return vd.FEED_INDEX_CACHE_PATH
+
+
+def load_feed_index(feed_path, feed_format=None, disk_cache=True):
+    """Load the index of a feed file, building it only if the file changed since it was last indexed.
+
+    The indexes are cached in memory and on disk, keyed by the digest of the file content, so each feed is only
+    scanned once across test sessions.
+
+    Args:
+        feed_path (str): Path of the feed.
+        feed_format (str, optional): 'nvd', 'redhat_json' or 'oval'. Default guessed from the file content.
+        disk_cache (bool, optional): Keep the indexes in FEED_INDEX_CACHE_PATH, to reuse them in other sessions.
+            Default `True`
+
+    Returns:
+        FeedIndex: Index of the feed.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    with open(feed_path, 'rb') as feed:
+        content = feed.read()
+    document = None
+    if feed_format is None:
+        feed_format, document = _guess_feed_format(content)
+    if feed_format not in _FEED_INDEX_BUILDERS:
+        raise ValueError(f"Unknown feed format '{feed_format}'")
+    digest = hashlib.sha1(_FEED_INDEX_VERSION + feed_format.encode() + b'\0' + content).hexdigest()
+
+    index = _feed_indexes.get(digest)
+    if index is None:
+        cache_dir = _get_feed_index_cache_dir() if disk_cache else None
+        cache_file = os.path.join(cache_dir, f"{digest}.pickle") if cache_dir else None
+        if cache_file:
+            try:
+                with open(cache_file, 'rb') as cached:
+                    index = pickle.load(cached)
+            except Exception:
+                index = None
+
+        if index is None:
+            if document is None:
+                document = content if feed_format == 'oval' else json.loads(content)
+            index = _FEED_INDEX_BUILDERS[feed_format](document)
+            if cache_file:
+                try:
+                    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+                    with open(temp_file, 'wb') as cached:
+                        pickle.dump(index, cached, protocol=4)
+                    os.replace(temp_file, cache_file)
+                except OSError:
+                    pass
+        _feed_indexes[digest] = index
+
+    return index
+
+
+def _guess_feed_format(content):
+    """Get the format of a feed from its content, along with the decoded JSON document if it is a JSON feed.
+
+    Raises:
+        ValueError: If the content is not an OVAL, NVD or Red Hat JSON feed.
+    """
+    if content.lstrip().startswith(b'<'):
+        return 'oval', None
+
+    document = json.loads(content)
+    if isinstance(document, dict) and 'CVE_Items' in document:
+        return 'nvd', document
+    if isinstance(document, list) and all(isinstance(cve, dict) and 'CVE' in cve for cve in document):
+        return 'redhat_json', document
+
+    raise ValueError('Unknown feed format, expected an OVAL, NVD or Red Hat JSON feed')
+
+
+def _get_array_index(cve_array, builder):
+    """Get the index of a feed already loaded in memory, building it only the first time.
+
+    The array is kept referenced along with its index, so its id can not be reused, and the index is built again if
+    the array length changes.
+    """
+    key = (id(cve_array), builder)
+    cached = _array_indexes.get(key)
+    if cached is None or cached[1] != len(cve_array):
+        cached = _array_indexes[key] = (cve_array, len(cve_array), builder(cve_array))
+
+    return cached[2]
+
+
 def find_cve_severity_score(cve_array, cve_id):
     """Get the CVE severity and score.
 
+    The CVE array is indexed the first time it is used, so the next lookups do not scan it again.
+
     Args:
         cve_array (str): The CVE's data read from the NVD feed.
         cve_id (str): The CVE ID to find and return its severity and score.
@@ -115,23 +448,10 @@ def find_cve_severity_score(cve_array, cve_id):
     Returns:
         (str, float, float): Severity and score.
     """
-    severity = '-'
-    cvss2_score = 0
-    cvss3_score = 0
-
-    for cve in cve_array:
-        if cve['cve']['CVE_data_meta']['ID'] == cve_id:
-            # The CVSS3 has priority over CVSS2
-            if 'baseMetricV2' in cve['impact']:
-                cvss2_score = cve['impact']['baseMetricV2']['cvssV2']['baseScore']
-                severity = calculate_severity_from_score(cvss2_score, 'cvss2')
+    severity, cvss2_score, cvss3_score = _get_array_index(cve_array, FeedIndex.from_nvd).get_score(
+        cve_id, CVEScore('-', None, None))
 
-            if 'baseMetricV3' in cve['impact']:
-                cvss3_score = cve['impact']['baseMetricV3']['cvssV3']['baseScore']
-                severity = calculate_severity_from_score(cvss3_score, 'cvss3')
-            break
-
-    return severity, cvss2_score, cvss3_score
+    return severity, cvss2_score or 0, cvss3_score or 0
 
 
 def find_rhel_cve_severity_score(cve_nvd_array, cve_rhel_array, cve_id):
@@ -151,15 +471,11 @@ def find_rhel_cve_severity_score(cve_nvd_array, cve_rhel_array, cve_id):
     """
     severity, cvss2_score, cvss3_score = find_cve_severity_score(cve_nvd_array, cve_id)
 
-    for cve in cve_rhel_array:
-        if cve['CVE'] == cve_id:
-            # The CVSS3 has priority over CVSS2
-            if 'cvss_score' in cve and cve['cvss_score'] is not None:
-                cvss2_score = float(cve['cvss_score'])
-                severity = calculate_severity_from_score(cvss2_score, 'cvss2')
-            if 'cvss3_score' in cve and cve['cvss3_score'] is not None:
-                cvss3_score = float(cve['cvss3_score'])
-                severity = calculate_severity_from_score(cvss3_score, 'cvss3')
+    rhel_score = _get_array_index(cve_rhel_array, FeedIndex.from_redhat_json).get_score(cve_id)
+    if rhel_score is not None and (rhel_score.cvss2 is not None or rhel_score.cvss3 is not None):
+        severity = rhel_score.severity
+        cvss2_score = cvss2_score if rhel_score.cvss2 is None else rhel_score.cvss2
+        cvss3_score = cvss3_score if rhel_score.cvss3 is None else rhel_score.cvss3
 
     return severity, cvss2_score, cvss3_score
 
@@ -1,6 +1,7 @@
 import sys
 
 from wazuh_testing.tools import CLIENT_KEYS_PATH
+from wazuh_testing.tools.client_keys import ClientKeys
 
 
 def main():
@@ -20,10 +21,8 @@ def main():
 
     agents_list = [str(agent_id).zfill(3) for agent_id in range(first_id, last_id + 1)]
 
-    with open(file=CLIENT_KEYS_PATH, mode='a') as f:
-        for agent_id in agents_list:
-            f.write(f"{agent_id} new_agent_{agent_id} any {agent_id}\n")
-            f.flush()  # Avoid bytes staying in the buffer until the loop has finished
+    with ClientKeys(CLIENT_KEYS_PATH) as client_keys:
+        client_keys.add_many((agent_id, f"new_agent_{agent_id}", 'any', agent_id) for agent_id in agents_list)
     exit(0)
 
 
@@ -2,6 +2,7 @@ import os
 import sys
 
 from wazuh_testing.tools import CLIENT_KEYS_PATH
+from wazuh_testing.tools.client_keys import ClientKeys
 
 
 def main():
@@ -22,13 +23,11 @@ def main():
 
     agents_list = [str(agent_id).zfill(3) for agent_id in range(first_id, last_id + 1)]
 
-    with open(file=CLIENT_KEYS_PATH, mode='r') as f:
-        agents_in_client_keys = f.read().split('\n')[:-1]
-    available_agents = [agent.split()[0] for agent in agents_in_client_keys]
+    client_keys = ClientKeys(CLIENT_KEYS_PATH)
 
-    for agent_id in set(agents_list).intersection(available_agents):
+    for agent_id in agents_list:
         agent_group_file = f"/var/ossec/queue/agent-groups/{agent_id}"
-        if not os.path.exists(agent_group_file):
+        if agent_id in client_keys and not os.path.exists(agent_group_file):
             with open(file=agent_group_file, mode='w') as f:
                 f.write('default')
 
@@ -118,6 +118,17 @@ def create_agents(args):
             set_agent_modules_and_eps(agent, item[0].split(' ') + ['keepalive', 'receive_messages'],
                                       item[1].split(' ') + ['0', '0'])
             agents.append(agent)
+    elif args.enrollment_concurrency > 1 or args.offline_enrollment:
+        agents, report = ag.enroll_agents(args.agents_number, args.manager_address,
+                                          agents_os=[args.os] * args.agents_number,
+                                          agents_version=[args.version] * args.agents_number,
+                                          concurrency=args.enrollment_concurrency, offline=args.offline_enrollment,
+                                          registration_address=args.manager_registration_address,
+                                          fixed_message_size=args.fixed_message_size, labels=custom_labels)
+        logger.info(f"Enrolled {report['enrolled']} agents in {report['time']:.2f} seconds "
+                    f"({len(report['failed'])} failed).")
+        for agent in agents:
+            set_agent_modules_and_eps(agent, args.modules, args.modules_eps)
     else:
         for _ in range(args.agents_number):
             agent = ag.Agent(manager_address=args.manager_address, os=args.os,
@@ -129,13 +140,15 @@ def create_agents(args):
     return agents
 
 
-def create_injectors(agents, manager_address, protocol):
+def create_injectors(agents, manager_address, protocol, eps_mode='smooth', global_eps=None):
     """Create injectos objects from list of agents and connection parameters.
 
     Args:
         agents (list): List of agents to create the injectors (1 injector/agent).
         manager_address (str): Manager IP address to connect the agents.
         protocol (str): TCP or UDP protocol to connect the agents to the manager.
+        eps_mode (str): smooth or burst pacing of the events.
+        global_eps (float): Max EPS of all the agents together, evenly split among the injectors.
 
     Returns:
         list: List of injector objects.
@@ -144,9 +157,12 @@ def create_injectors(agents, manager_address, protocol):
 
     logger.info(f"Starting {len(agents)} agents.")
 
+    injector_eps = global_eps / len(agents) if global_eps and agents else None
+
     for agent in agents:
         sender = ag.Sender(manager_address, protocol=protocol)
-        injectors.append(ag.Injector(sender, agent))
+        scheduler = ag.RateScheduler(mode=eps_mode, global_eps=injector_eps)
+        injectors.append(ag.Injector(sender, agent, scheduler=scheduler))
 
     return injectors
 
@@ -172,6 +188,7 @@ def stop(injector):
         injector (Injector): Injector object.
     """
     injector.stop_receive()
+    injector.scheduler.log_report()
 
 
 def run(injectors, time_alive):
@@ -322,6 +339,28 @@ def main():
                             help='Waiting time in seconds between agent registration and the sending of events.',
                             required=False, default=0, dest='waiting_connection_time')
 
+    arg_parser.add_argument('--async', action='store_true', required=False, dest='async_engine',
+                            help='Run the agents on asyncio event loops instead of one process per agent.')
+
+    arg_parser.add_argument('--workers', metavar='<workers>', type=int, required=False, default=1,
+                            help='Number of processes the agents are split into. Can only be used if the parameter '
+                                 '--async was specified', dest='workers')
+
+    arg_parser.add_argument('--enrollment-concurrency', metavar='<enrollment_concurrency>', type=int, required=False,
+                            default=1, dest='enrollment_concurrency',
+                            help='Number of agents enrolled at the same time. Not used in balance mode.')
+
+    arg_parser.add_argument('--offline-enrollment', action='store_true', required=False, dest='offline_enrollment',
+                            help='Write the agents directly to the client.keys file of the local manager instead of '
+                                 'enrolling them. Not used in balance mode.')
+
+    arg_parser.add_argument('--eps-mode', metavar='<eps_mode>', type=str, required=False, default='smooth',
+                            choices=['smooth', 'burst'], dest='eps_mode',
+                            help='Spread the events of each second evenly (smooth) or send them at once (burst).')
+
+    arg_parser.add_argument('--global-eps', metavar='<global_eps>', type=float, required=False, default=None,
+                            help='Max EPS of all the simulated agents together.', dest='global_eps')
+
     args = arg_parser.parse_args()
 
     process_script_parameters(args)
@@ -333,9 +372,15 @@ def main():
     # Waiting time to prevent CPU overload when registering many agents (registration + event generation).
     sleep(args.waiting_connection_time)
 
-    injectors = create_injectors(agents, args.manager_address, args.agent_protocol)
+    if args.async_engine:
+        logger.info(f"Starting {len(agents)} agents in {args.workers} asyncio workers.")
+        ag.run_async_agents(agents, args.manager_address, args.simulation_time, protocol=args.agent_protocol,
+                            workers=args.workers, eps_mode=args.eps_mode, global_eps=args.global_eps)
+    else:
+        injectors = create_injectors(agents, args.manager_address, args.agent_protocol, eps_mode=args.eps_mode,
+                                     global_eps=args.global_eps)
 
-    run(injectors, args.simulation_time)
+        run(injectors, args.simulation_time)
 
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@ import argparse
 from datetime import datetime
 from os.path import join
 from tempfile import gettempdir
-from time import time
+from time import sleep, time
 
 from wazuh_testing.tools.performance.binary import ClusterLogParser, APILogParser
 
@@ -18,8 +18,14 @@ def get_script_arguments():
                         help='Log file to be analyzed.', action='store')
     parser.add_argument('-t', '--target', dest='log_type_target', default='cluster',
                         choices=target_choices, help='Log type to be parsed. Default cluster.')
-    parser.add_argument('-o', '--output', dest='output', action='store', default=None,
-                        help='Folder where the extracted data will be dumped (csv).')
+    parser.add_argument('-o', '--output', dest='output', action='store', default=CURRENT_SESSION,
+                        help=f'Folder where the extracted data will be dumped (csv). Default {CURRENT_SESSION}.')
+    parser.add_argument('-i', '--incremental', dest='incremental', action='store_true', default=False,
+                        help='Only parse the lines appended since the previous run with the same output folder.')
+    parser.add_argument('-f', '--follow', dest='follow', action='store_true', default=False,
+                        help='Keep parsing the new lines of the log until the script is interrupted.')
+    parser.add_argument('-s', '--sleep', dest='sleep', type=float, default=5,
+                        help='Seconds between each parsing of the log in follow mode. Default 5.')
 
     return parser.parse_args()
 
@@ -28,10 +34,17 @@ def main():
     options = get_script_arguments()
 
     if options.log and options.log_type_target:
-        if options.log_type_target == 'cluster':
-            ClusterLogParser(log_file=options.log, dst_dir=options.output).write_csv()
-        elif options.log_type_target == 'api':
-            APILogParser(log_file=options.log, dst_dir=options.output).write_csv()
+        parser_class = ClusterLogParser if options.log_type_target == 'cluster' else APILogParser
+        log_parser = parser_class(log_file=options.log, dst_dir=options.output,
+                                  incremental=options.incremental or options.follow)
+        log_parser.write_csv()
+
+        try:
+            while options.follow:
+                sleep(options.sleep)
+                log_parser.write_csv()
+        except KeyboardInterrupt:
+            pass
 
 
 if __name__ == '__main__':
@@ -8,11 +8,12 @@ from signal import signal, SIGTERM, SIGINT
 from tempfile import gettempdir
 from time import time, sleep
 
-from wazuh_testing.tools.performance.binary import Monitor, logger
+from wazuh_testing.tools.performance.binary import Monitor, MonitorSampler, logger
 
 METRICS_FOLDER = join(gettempdir(), 'process_metrics')
 CURRENT_SESSION = join(METRICS_FOLDER, datetime.now().strftime('%d-%m-%Y'), str(int(time())))
 ACTIVE_MONITORS = defaultdict(list)
+SAMPLER = None
 SESSION_ACTIVE = True
 
 
@@ -25,6 +26,7 @@ def shutdown_threads(signal_number, frame):
     # Shutdown all possible monitors
     for monitor in sum(ACTIVE_MONITORS.values(), []):
         monitor.shutdown()
+    SAMPLER is not None and SAMPLER.shutdown()
 
     logger.info('Process finished gracefully')
 
@@ -45,6 +47,11 @@ def get_script_arguments():
                         help='Time in seconds between each health check.')
     parser.add_argument('-r', '--retries', dest='health_retries', action='store', default=5, type=int,
                         help='Number of reconnection retries before aborting the monitoring process.')
+    parser.add_argument('-m', '--full-memory-sleep', dest='full_memory_time', type=float, default=10, action='store',
+                        help='Time in seconds between each collection of the USS, PSS and SWAP, which are more '
+                             'expensive to get than the rest of the values. Default 10.')
+    parser.add_argument('-f', '--flush-time', dest='flush_time', type=float, default=10, action='store',
+                        help='Time in seconds between each write of the collected entries to the CSVs. Default 10.')
     parser.add_argument('--store', dest='store_path', action='store', default=gettempdir(),
                         help=f"Path to store the CSVs with the data. Default {gettempdir()}.")
 
@@ -82,8 +89,9 @@ def check_monitors_health(options):
                 p_name = process if i == 0 else f'{process}_child_{i}'
                 monitor = Monitor(process_name=p_name, pid=pid, value_unit=options.data_unit,
                                   time_step=options.sleep_time,
-                                  version=options.version, dst_dir=options.store_path)
-                monitor.start()
+                                  version=options.version, dst_dir=options.store_path,
+                                  full_memory_step=options.full_memory_time)
+                SAMPLER.add_monitor(monitor)
 
                 try:
                     # Replace old monitors for new ones
@@ -126,15 +134,22 @@ def main():
     options.debug and logger.setLevel(logging.DEBUG)
     logger.info(f'Started new session: {CURRENT_SESSION}')
 
+    # A single sampler scans all the processes, so the monitoring does not need a thread per process
+    global SAMPLER
+    SAMPLER = MonitorSampler(time_step=options.sleep_time, flush_step=options.flush_time)
+
     for process in options.process_list:
         # Launch a monitor for every possible child process
         for i, pid in enumerate(Monitor.get_process_pids(process)):
             p_name = process if i == 0 else f'{process}_child_{i}'
             monitor = Monitor(process_name=p_name, pid=pid, value_unit=options.data_unit, time_step=options.sleep_time,
-                              version=options.version, dst_dir=options.store_path)
-            monitor.start()
+                              version=options.version, dst_dir=options.store_path,
+                              full_memory_step=options.full_memory_time)
+            SAMPLER.add_monitor(monitor)
             ACTIVE_MONITORS[process].append(monitor)
 
+    SAMPLER.start()
+
     monitors_healthcheck(options)
 
 
@@ -25,6 +25,7 @@ if sys.platform == 'win32':
     ANALYSIS_STATISTICS_FILE = None
     UPGRADE_PATH = os.path.join(WAZUH_PATH, 'upgrade')
     AGENT_AUTH_BINARY_PATH = os.path.join(WAZUH_PATH, 'agent-auth.exe')
+    WAZUH_RUN_PATH = None
 
 else:
 
@@ -59,6 +60,7 @@ else:
     UPGRADE_PATH = os.path.join(WAZUH_PATH, 'var', 'upgrade')
     AGENT_AUTH_BINARY_PATH = os.path.join(WAZUH_PATH, 'bin', 'agent-auth')
     GLOBAL_DB_PATH = os.path.join(WAZUH_PATH, 'queue', 'db', 'global.db')
+    WAZUH_RUN_PATH = os.path.join(WAZUH_PATH, 'var', 'run')
 
     try:
         import grp
@@ -70,17 +72,52 @@ else:
         pass
 
 
-def get_version():
+_installation_info = {}
+
+
+def _get_installation_info(key, getter):
+    """Get a value of the installation, calling `getter` only the first time or if the installation changed.
+
+    The value is kept while the file with the installation version is not replaced, e.g. by an upgrade.
 
+    Args:
+        key (str): Name of the value.
+        getter (callable): Function that gets the value.
+
+    Returns:
+        any: Value of the installation.
+    """
     if platform.system() in ['Windows', 'win32']:
-        with open(os.path.join(WAZUH_PATH, 'VERSION'), 'r') as f:
-            version = f.read()
-            return version[:version.rfind('\n')]
+        version_file = os.path.join(WAZUH_PATH, 'VERSION')
+    else:
+        version_file = os.path.join(WAZUH_PATH, 'bin', 'wazuh-control')
 
-    else:  # Linux, sunos5, darwin, aix...
-        return subprocess.check_output([
-          f"{WAZUH_PATH}/bin/wazuh-control", "info", "-v"
-        ], stderr=subprocess.PIPE).decode('utf-8').rstrip()
+    try:
+        file_stat = os.stat(version_file)
+        signature = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+    except OSError:
+        signature = None
+
+    if signature is None or _installation_info.get(key, (None,))[0] != signature:
+        _installation_info[key] = (signature, getter())
+
+    return _installation_info[key][1]
+
+
+def get_version():
+
+    def read_version():
+        if platform.system() in ['Windows', 'win32']:
+            with open(os.path.join(WAZUH_PATH, 'VERSION'), 'r') as f:
+                version = f.read()
+                return version[:version.rfind('\n')]
+
+        else:  # Linux, sunos5, darwin, aix...
+            return subprocess.check_output([
+              f"{WAZUH_PATH}/bin/wazuh-control", "info", "-v"
+            ], stderr=subprocess.PIPE).decode('utf-8').rstrip()
+
+    return _get_installation_info('version', read_version)
 
 
 def get_service():
@@ -88,9 +125,9 @@ def get_service():
         return 'wazuh-agent'
 
     else:  # Linux, sunos5, darwin, aix...
-        service = subprocess.check_output([
+        service = _get_installation_info('type', lambda: subprocess.check_output([
           f"{WAZUH_PATH}/bin/wazuh-control", "info", "-t"
-        ], stderr=subprocess.PIPE).decode('utf-8').strip()
+        ], stderr=subprocess.PIPE).decode('utf-8').strip())
 
     return 'wazuh-manager' if service == 'server' else 'wazuh-agent'
 
@@ -139,6 +176,8 @@ WAZUH_SOCKETS = {
     'wazuh-apid': [],
     'wazuh-agentlessd': [],
     'wazuh-csyslogd': [],
+    'wazuh-dbd': [],
+    'wazuh-integratord': [],
     'wazuh-analysisd': [
                         ANALYSISD_ANALISIS_SOCKET_PATH,
                         ANALYSISD_QUEUE_SOCKET_PATH
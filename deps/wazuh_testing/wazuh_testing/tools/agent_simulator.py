@@ -11,6 +11,7 @@
 # Python 3.7 or greater
 # Dependencies: pip3 install pycryptodome
 
+import asyncio
 import hashlib
 import json
 import logging
@@ -19,30 +20,39 @@ import socket
 import ssl
 import threading
 import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from itertools import cycle
-from random import randint, sample, choice, getrandbits
+from multiprocessing import Process
+from random import randint, sample, choice, getrandbits, uniform
 from stat import S_IFLNK, S_IFREG, S_IRWXU, S_IRWXG, S_IRWXO
 from string import ascii_letters, digits
 from struct import pack
 from sys import getsizeof
-from time import mktime, localtime, sleep, time
+from time import mktime, localtime, monotonic, sleep, time
 
 import wazuh_testing.data.syscollector as syscollector
 import wazuh_testing.data.winevt as winevt
 import wazuh_testing.wazuh_db as wdb
 from wazuh_testing import TCP
 from wazuh_testing import is_udp, is_tcp
+from wazuh_testing.tools import CLIENT_KEYS_PATH
+from wazuh_testing.tools.client_keys import get_client_keys
 from wazuh_testing.tools.monitoring import wazuh_unpack, Queue
 from wazuh_testing.tools.remoted_sim import Cipher
 from wazuh_testing.tools.utils import retry, get_random_ip, get_random_string
 
 _data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'data')
 
+# Constant part of every composed event: random number, global counter and local counter
+EVENT_PREFIX = b'55555' + b'1234567891' + b':' + b'5555' + b':'
+
 os_list = ["debian7", "debian8", "debian9", "debian10", "ubuntu12.04",
            "ubuntu14.04", "ubuntu16.04", "ubuntu18.04", "mojave", "solaris11"]
 agent_count = 1
 
+DEFAULT_ENROLLMENT_CONCURRENCY = 50
+
 
 class Agent:
     """Class that allows us to simulate an agent registered in a manager.
@@ -146,6 +156,7 @@ class Agent:
         self.manager_address = manager_address
         self.registration_address = manager_address if registration_address is None else registration_address
         self.encryption_key = ""
+        self._encryptor = None
         self.keep_alive_event = ""
         self.keep_alive_raw_msg = ""
         self.merged_checksum = 'd6e3ac3e75ca0319af3e7c262776f331'
@@ -235,28 +246,7 @@ class Agent:
 
     def _register_helper(self):
         """Helper function to enroll an agent."""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
-        try:
-            ssl_socket = context.wrap_socket(sock, server_hostname=self.registration_address)
-            ssl_socket.connect((self.registration_address, 1515))
-
-            if self.authd_password is None:
-                event = f"OSSEC A:'{self.name}'\n".encode()
-            else:
-                event = f"OSSEC PASS: {self.authd_password} OSSEC A:'{self.name}'\n".encode()
-
-            ssl_socket.send(event)
-            recv = ssl_socket.recv(4096)
-            registration_info = recv.decode().split("'")[1].split(" ")
-
-            self.id = registration_info[0]
-            self.key = registration_info[3]
-        finally:
-            ssl_socket.close()
-            sock.close()
+        self.id, self.key = request_enrollment(self.name, self.registration_address, self.authd_password)
 
         logging.debug(f"Registration - {self.name}({self.id}) in {self.registration_address}")
 
@@ -317,6 +307,7 @@ class Agent:
         sum2 = hashlib.md5(key).hexdigest().encode()
         key = sum2 + sum1
         self.encryption_key = key
+        self._encryptor = None
 
     @staticmethod
     def compose_event(message):
@@ -409,6 +400,56 @@ class Agent:
 
         return headers_event
 
+    def create_events(self, messages, framed=False):
+        """Build the events of several raw string messages at once.
+
+        The encryption key, its encryptor and the event header are prepared once for the whole batch and each event
+        is assembled with a single allocation.
+
+        Args:
+            messages (list): Raw messages.
+            framed (boolean): Prefix each event with its size, as required to send it through TCP.
+
+        Returns:
+            list: Built events (compressed, padded, encrypted and with headers), in the same order as the messages.
+        """
+        if self._encryptor is None:
+            self._encryptor = Cipher.encryptor(self.encryption_key, self.cypher)
+        encrypt = self._encryptor
+        header = "!{0}!#AES:".format(self.id).encode() if self.cypher == "aes" else "!{0}!:".format(self.id).encode()
+        compress = zlib.compress
+        md5 = hashlib.md5
+        paddings = [b'!' * (8 - extra) for extra in range(8)]
+
+        events = []
+        for message in messages:
+            msg = EVENT_PREFIX + message.encode()
+            compressed_event = compress(b''.join((md5(msg).hexdigest().encode(), msg)))
+            encrypted_event = encrypt(paddings[len(compressed_event) % 8] + compressed_event)
+            if framed:
+                events.append(b''.join((pack('<I', len(header) + len(encrypted_event)), header, encrypted_event)))
+            else:
+                events.append(header + encrypted_event)
+
+        return events
+
+    def fit_message_size(self, event_msg):
+        """Fill a module message with dummy data up to the fixed message size, if it is set.
+
+        Args:
+            event_msg (str): Module message.
+
+        Returns:
+            str: Message with the fixed size.
+        """
+        if self.fixed_message_size is not None:
+            event_msg_size = getsizeof(event_msg)
+            dummy_message_size = self.fixed_message_size - event_msg_size
+            char_size = getsizeof(event_msg[0]) - getsizeof('')
+            event_msg += 'A' * (dummy_message_size//char_size)
+
+        return event_msg
+
     def receive_message(self, sender):
         """Agent listener to receive messages and process the accepted commands.
 
@@ -433,30 +474,45 @@ class Agent:
                     return
             else:
                 buffer_array, client_address = sender.socket.recvfrom(65536)
-            index = buffer_array.find(b'!')
-            if index == 0:
-                index = buffer_array[1:].find(b'!')
-                buffer_array = buffer_array[index + 2:]
-            if self.cypher == "aes":
-                msg_remove_header = bytes(buffer_array[5:])
-                msg_decrypted = Cipher(msg_remove_header, self.encryption_key).decrypt_aes()
-            else:
-                msg_remove_header = bytes(buffer_array[1:])
-                msg_decrypted = Cipher(msg_remove_header, self.encryption_key).decrypt_blowfish()
             try:
-                padding = 0
-                while msg_decrypted:
-                    if msg_decrypted[padding] == 33:
-                        padding += 1
-                    else:
-                        break
-                msg_remove_padding = msg_decrypted[padding:]
-                msg_decompress = zlib.decompress(msg_remove_padding)
-                msg_decoded = msg_decompress.decode('ISO-8859-1')
-                self.process_message(sender, msg_decoded)
+                self.process_message(sender, self.decode_message(buffer_array))
             except zlib.error:
                 logging.error("Corrupted message from the manager. Continuing.")
 
+    def decode_message(self, buffer_array):
+        """Decrypt, decompress and decode a message received from the manager.
+
+        Args:
+            buffer_array (bytes): Received message, without the size header.
+
+        Returns:
+            str: Decoded message in ISO-8859-1 format.
+
+        Raises:
+            zlib.error: If the message is corrupted.
+        """
+        index = buffer_array.find(b'!')
+        if index == 0:
+            index = buffer_array[1:].find(b'!')
+            buffer_array = buffer_array[index + 2:]
+        if self.cypher == "aes":
+            msg_remove_header = bytes(buffer_array[5:])
+            msg_decrypted = Cipher(msg_remove_header, self.encryption_key).decrypt_aes()
+        else:
+            msg_remove_header = bytes(buffer_array[1:])
+            msg_decrypted = Cipher(msg_remove_header, self.encryption_key).decrypt_blowfish()
+
+        padding = 0
+        while msg_decrypted:
+            if msg_decrypted[padding] == 33:
+                padding += 1
+            else:
+                break
+        msg_remove_padding = msg_decrypted[padding:]
+        msg_decompress = zlib.decompress(msg_remove_padding)
+
+        return msg_decompress.decode('ISO-8859-1')
+
     def stop_receiver(self):
         """Stop Agent listener."""
         self.stop_receive = 1
@@ -697,6 +753,44 @@ class Agent:
         if self.winevt is None:
             self.winevt = GeneratorWinevt(self.name, self.id)
 
+    def get_module_event_generator(self, module):
+        """Initialize a module and get the function that generates its messages.
+
+        Args:
+            module (str): Module name.
+
+        Returns:
+            callable: Function that returns a new message of the module each time it is called.
+
+        Raises:
+            ValueError: If the module does not generate messages.
+        """
+        if module == 'hostinfo':
+            self.init_hostinfo()
+            return self.hostinfo.generate_event
+        elif module == 'rootcheck':
+            self.init_rootcheck()
+            return self.rootcheck.get_message
+        elif module == 'syscollector':
+            self.init_syscollector()
+            return self.syscollector.generate_event
+        elif module == 'fim_integrity':
+            self.init_fim_integrity()
+            return self.fim_integrity.get_message
+        elif module == 'fim':
+            return self.fim.get_message
+        elif module == 'sca':
+            self.init_sca()
+            return self.sca.get_message
+        elif module == 'winevt':
+            self.init_winevt()
+            return self.winevt.generate_event
+        elif module == 'logcollector':
+            self.init_logcollector()
+            return self.logcollector.generate_event
+        else:
+            raise ValueError('Invalid module selected')
+
     def get_agent_info(self, field):
         agent_info = wdb.query_wdb(f"global get-agent-info {self.id}")
 
@@ -1470,6 +1564,170 @@ class GeneratorFIM:
         return generated_message
 
 
+class TokenBucket:
+    """Token bucket that paces the messages sent at a given rate.
+
+    Tokens are refilled according to the real elapsed time, so the time spent generating and encrypting the messages
+    is taken into account. Requesting more tokens than available leaves the bucket in debt, and the returned waiting
+    time makes the caller pay for it.
+
+    Args:
+        rate (float): Tokens per second. A rate lower or equal than 0 means no limit.
+        capacity (float): Max tokens the bucket can accumulate, i.e. the max burst.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.timestamp = monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens):
+        """Take tokens from the bucket.
+
+        Args:
+            tokens (int): Number of tokens to take.
+
+        Returns:
+            float: Seconds to wait before using the tokens.
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            self.tokens -= tokens
+
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateScheduler:
+    """Scheduler that paces the messages of many agents and modules with a token bucket for each one.
+
+    In `smooth` mode the messages are spread evenly along each second, sending a small batch every `interval` seconds.
+    In `burst` mode, the messages of a whole second are sent at once. An optional global bucket caps the EPS of all
+    the registered agents together. The scheduler also tracks the achieved EPS of each agent and module.
+
+    Args:
+        mode (str, optional): smooth or burst. Default smooth.
+        global_eps (float, optional): Max EPS of all the agents together. Default None for no limit.
+        interval (float, optional): Seconds between batches in smooth mode. Default 0.05.
+
+    Examples:
+        >>> scheduler = RateScheduler(mode='smooth', global_eps=5000)
+        >>> scheduler.register(('001', 'fim'), eps=100)
+        >>> sleep(scheduler.acquire(('001', 'fim'), scheduler.batch_size(('001', 'fim'))))
+    """
+
+    def __init__(self, mode='smooth', global_eps=None, interval=0.05):
+        if mode not in ('smooth', 'burst'):
+            raise ValueError(f"Invalid scheduler mode: {mode}. Valid ones are smooth or burst")
+        self.mode = mode
+        self.interval = interval
+        self.global_eps = global_eps
+        self.global_bucket = TokenBucket(global_eps, self._capacity(global_eps)) if global_eps else None
+        self.buckets = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _capacity(self, eps):
+        return max(1.0, eps if self.mode == 'burst' else eps * self.interval)
+
+    def register(self, key, eps):
+        """Register a new flow of messages.
+
+        Args:
+            key (hashable): Identifier of the flow, for example (agent ID, module).
+            eps (float): Requested EPS. 0 means no limit.
+        """
+        with self.lock:
+            self.buckets[key] = TokenBucket(eps, self._capacity(eps))
+            self.stats[key] = {'requested_eps': eps, 'messages': 0, 'last_batch': 0, 'start': None, 'end': None}
+
+    def batch_size(self, key):
+        """Get how many messages of the flow should be sent at once.
+
+        Args:
+            key (hashable): Identifier of the flow.
+
+        Returns:
+            int: Number of messages.
+        """
+        return max(1, int(self.buckets[key].capacity))
+
+    def acquire(self, key, messages=1):
+        """Take the tokens for sending messages of a flow.
+
+        Args:
+            key (hashable): Identifier of the flow.
+            messages (int, optional): Number of messages to send. Default 1.
+
+        Returns:
+            float: Seconds to wait before sending the messages.
+        """
+        wait = self.buckets[key].reserve(messages)
+        if self.global_bucket is not None:
+            wait = max(wait, self.global_bucket.reserve(messages))
+
+        # Keep when the batches are due, so the achieved EPS does not depend on when the report is requested
+        stats = self.stats[key]
+        stats['end'] = monotonic() + wait
+        if stats['start'] is None:
+            stats['start'] = stats['end']
+        stats['messages'] += messages
+        stats['last_batch'] = messages
+
+        return wait
+
+    def wait(self, key, messages=1):
+        """Block until the messages of a flow can be sent."""
+        wait = self.acquire(key, messages)
+        if wait > 0:
+            sleep(wait)
+
+    async def wait_async(self, key, messages=1):
+        """Wait in the event loop until the messages of a flow can be sent."""
+        wait = self.acquire(key, messages)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def report(self):
+        """Get the requested and achieved EPS of every flow and of all of them together.
+
+        Returns:
+            dict: Flow identifiers (and 'total') as keys and their requested EPS, achieved EPS and sent messages.
+        """
+        report = {}
+        total_requested = total_achieved = total_messages = 0
+        for key, stats in list(self.stats.items()):
+            elapsed = stats['end'] - stats['start'] if stats['start'] is not None else 0
+            achieved = (stats['messages'] - stats['last_batch']) / elapsed if elapsed > 0 else 0.0
+            report[key] = {'requested_eps': stats['requested_eps'], 'achieved_eps': round(achieved, 2),
+                           'messages': stats['messages']}
+            total_requested += stats['requested_eps']
+            total_achieved += achieved
+            total_messages += stats['messages']
+        if self.global_eps:
+            total_requested = min(total_requested, self.global_eps)
+        report['total'] = {'requested_eps': total_requested, 'achieved_eps': round(total_achieved, 2),
+                           'messages': total_messages}
+
+        return report
+
+    def log_report(self):
+        """Log the requested and achieved EPS of every flow, warning about the ones that undershoot."""
+        for key, stats in self.report().items():
+            message = f"EPS {key}: requested {stats['requested_eps']}, achieved {stats['achieved_eps']}, " \
+                      f"messages {stats['messages']}"
+            if stats['messages'] > 1 and stats['achieved_eps'] < 0.95 * stats['requested_eps']:
+                logging.warning(message)
+            else:
+                logging.info(message)
+
+
 class Sender:
     """This class sends events to the manager through a socket.
 
@@ -1497,22 +1755,41 @@ class Sender:
         if is_udp(self.protocol):
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
+    def _send_tcp(self, data):
+        """Send already framed data through the TCP socket, reconnecting if the pipe is broken."""
+        try:
+            self.socket.sendall(data)
+        except BrokenPipeError:
+            logging.warning(f"Broken Pipe error while sending event. Creating new socket...")
+            sleep(5)
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.connect((self.manager_address, int(self.manager_port)))
+            self.socket.sendall(data)
+        except ConnectionResetError:
+            logging.warning(f"Connection reset by peer. Continuing...")
+
     def send_event(self, event):
         if is_tcp(self.protocol):
-            length = pack('<I', len(event))
-            try:
-                self.socket.send(length + event)
-            except BrokenPipeError:
-                logging.warning(f"Broken Pipe error while sending event. Creating new socket...")
-                sleep(5)
-                self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.socket.connect((self.manager_address, int(self.manager_port)))
-                self.socket.send(length + event)
-            except ConnectionResetError:
-                logging.warning(f"Connection reset by peer. Continuing...")
+            self._send_tcp(pack('<I', len(event)) + event)
         if is_udp(self.protocol):
             self.socket.sendto(event, (self.manager_address, int(self.manager_port)))
 
+    def send_events(self, events, framed=False):
+        """Send several events. Through TCP, all of them are written to the socket at once.
+
+        Args:
+            events (list): Events to send.
+            framed (boolean): The events are already prefixed with their size (see `Agent.create_events`).
+        """
+        if is_tcp(self.protocol):
+            if not framed:
+                events = [pack('<I', len(event)) + event for event in events]
+            self._send_tcp(b''.join(events))
+        if is_udp(self.protocol):
+            address = (self.manager_address, int(self.manager_port))
+            for event in events:
+                self.socket.sendto(event, address)
+
 
 class Injector:
     """This class simulates a daemon used to send and receive messages with the manager.
@@ -1538,16 +1815,17 @@ class Injector:
         >>> injector.run()
     """
 
-    def __init__(self, sender, agent):
+    def __init__(self, sender, agent, scheduler=None):
         self.sender = sender
         self.agent = agent
+        self.scheduler = RateScheduler() if scheduler is None else scheduler
         self.thread_number = 0
         self.threads = []
         for module, config in self.agent.modules.items():
             if config["status"] == "enabled":
                 self.threads.append(
                     InjectorThread(self.thread_number, f"Thread-{self.agent.id}{module}", self.sender,
-                                   self.agent, module))
+                                   self.agent, module, scheduler=self.scheduler))
                 self.thread_number += 1
 
     def run(self):
@@ -1576,8 +1854,9 @@ class InjectorThread(threading.Thread):
         agent (Agent): agent owner of the injector and the sender.
         module (str): module used to send events (fim, syscollector, etc).
         stop_thread (int): 0 if the thread is running, 1 if it is stopped.
+        scheduler (RateScheduler): scheduler that paces the events of the module.
     """
-    def __init__(self, thread_id, name, sender, agent, module):
+    def __init__(self, thread_id, name, sender, agent, module, scheduler=None):
         super(InjectorThread, self).__init__()
         self.thread_id = thread_id
         self.name = name
@@ -1586,6 +1865,7 @@ class InjectorThread(threading.Thread):
         self.totalMessages = 0
         self.module = module
         self.stop_thread = 0
+        self.scheduler = RateScheduler() if scheduler is None else scheduler
 
     def keep_alive(self):
         """Send a keep alive message from the agent to the manager."""
@@ -1599,9 +1879,15 @@ class InjectorThread(threading.Thread):
         if 'eps' in self.agent.modules["keepalive"]:
             frequency = 0
             eps = self.agent.modules["keepalive"]["eps"]
+        key = (self.agent.id, 'keepalive')
+        self.scheduler.register(key, eps if frequency == 0 else 1 / frequency)
         while self.stop_thread == 0:
             # Send agent keep alive
             logging.debug(f"KeepAlive - {self.agent.name}({self.agent.id})")
+            if frequency == 0:
+                self.scheduler.wait(key)
+            else:
+                self.scheduler.acquire(key)
             self.sender.send_event(self.agent.keep_alive_event)
             self.totalMessages += 1
             if frequency > 0:
@@ -1610,8 +1896,6 @@ class InjectorThread(threading.Thread):
                 logging.debug('Merged checksum modified to force manager overload')
                 new_checksum = str(getrandbits(128))
                 self.agent.update_checksum(new_checksum)
-                if self.totalMessages % eps == 0:
-                    sleep(1.0 - ((time() - start_time) % 1.0))
 
     def run_module(self, module):
         """Send a module message from the agent to the manager.
@@ -1630,50 +1914,26 @@ class InjectorThread(threading.Thread):
         else:
             batch_messages = eps
 
-        if module == 'hostinfo':
-            self.agent.init_hostinfo()
-            module_event_generator = self.agent.hostinfo.generate_event
-        elif module == 'rootcheck':
-            self.agent.init_rootcheck()
-            module_event_generator = self.agent.rootcheck.get_message
+        module_event_generator = self.agent.get_module_event_generator(module)
+        if module == 'rootcheck':
             batch_messages = len(self.agent.rootcheck.messages_list) * eps
-        elif module == 'syscollector':
-            self.agent.init_syscollector()
-            module_event_generator = self.agent.syscollector.generate_event
-        elif module == 'fim_integrity':
-            self.agent.init_fim_integrity()
-            module_event_generator = self.agent.fim_integrity.get_message
-        elif module == 'fim':
-            module_event_generator = self.agent.fim.get_message
-        elif module == 'sca':
-            self.agent.init_sca()
-            module_event_generator = self.agent.sca.get_message
-        elif module == 'winevt':
-            self.agent.init_winevt()
-            module_event_generator = self.agent.winevt.generate_event
-        elif module == 'logcollector':
-            self.agent.init_logcollector()
-            module_event_generator = self.agent.logcollector.generate_event
-        else:
-            raise ValueError('Invalid module selected')
+
+        framed = is_tcp(self.sender.protocol)
+        key = (self.agent.id, module)
+        self.scheduler.register(key, eps)
 
         # Loop events
         while self.stop_thread == 0:
             sent_messages = 0
-            while sent_messages < batch_messages:
-                event_msg = module_event_generator()
-                if self.agent.fixed_message_size is not None:
-                    event_msg_size = getsizeof(event_msg)
-                    dummy_message_size = self.agent.fixed_message_size - event_msg_size
-                    char_size = getsizeof(event_msg[0]) - getsizeof('')
-                    event_msg += 'A' * (dummy_message_size//char_size)
-
-                event = self.agent.create_event(event_msg)
-                self.sender.send_event(event)
-                self.totalMessages += 1
-                sent_messages += 1
-                if self.totalMessages % eps == 0:
-                    sleep(1.0 - ((time() - start_time) % 1.0))
+            while sent_messages < batch_messages and self.stop_thread == 0:
+                batch_size = max(1, int(min(self.scheduler.batch_size(key), batch_messages - sent_messages)))
+                messages = [self.agent.fit_message_size(module_event_generator()) for _ in range(batch_size)]
+                events = self.agent.create_events(messages, framed=framed)
+
+                self.scheduler.wait(key, batch_size)
+                self.sender.send_events(events, framed=framed)
+                self.totalMessages += batch_size
+                sent_messages += batch_size
             if frequency > 1:
                 sleep(frequency - ((time() - start_time) % frequency))
 
@@ -1699,10 +1959,11 @@ class InjectorThread(threading.Thread):
 
 
 def create_agents(agents_number, manager_address, cypher='aes', fim_eps=100, authd_password=None, agents_os=None,
-                  agents_version=None, disable_all_modules=False):
+                  agents_version=None, disable_all_modules=False, concurrency=1, offline=False):
     """Create a list of generic agents
 
     This will create a list with `agents_number` amount of agents. All of them will be registered in the same manager.
+    With a `concurrency` greater than 1 or in `offline` mode, the agents are enrolled with `enroll_agents`.
 
     Args:
         agents_number (int): total number of agents.
@@ -1713,11 +1974,24 @@ def create_agents(agents_number, manager_address, cypher='aes', fim_eps=100, aut
         agents_os (list, optional): list containing different operative systems for the agents.
         agents_version (list, optional): list containing different version of the agent.
         disable_all_modules (boolean): Disable all simulated modules for this agent.
+        concurrency (int, optional): max enrollments in progress at the same time. Default 1.
+        offline (boolean, optional): write the agents to the local client.keys instead of enrolling them.
 
     Returns:
         list: list of the new virtual agents.
+
+    Raises:
+        ValueError: If any agent could not be enrolled concurrently.
     """
     global agent_count
+    if concurrency > 1 or offline:
+        agents, report = enroll_agents(agents_number, manager_address, cypher, authd_password=authd_password,
+                                       agents_os=agents_os, agents_version=agents_version, concurrency=concurrency,
+                                       offline=offline, fim_eps=fim_eps, disable_all_modules=disable_all_modules)
+        if report['failed']:
+            raise ValueError(f"{len(report['failed'])} agents were not correctly enrolled.")
+        return agents
+
     # Read client.keys and create virtual agents
     agents = []
     for agent in range(agents_number):
@@ -1732,6 +2006,150 @@ def create_agents(agents_number, manager_address, cypher='aes', fim_eps=100, aut
     return agents
 
 
+def request_enrollment(name, registration_address, authd_password=None, timeout=None):
+    """Enroll an agent name in the manager.
+
+    Args:
+        name (str): agent name.
+        registration_address (str): IP address of the manager enrollment service.
+        authd_password (str, optional): password to enroll an agent.
+        timeout (float, optional): socket timeout in seconds. Default None.
+
+    Returns:
+        tuple: ID and key of the new agent.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    try:
+        ssl_socket = context.wrap_socket(sock, server_hostname=registration_address)
+        try:
+            ssl_socket.connect((registration_address, 1515))
+
+            if authd_password is None:
+                event = f"OSSEC A:'{name}'\n".encode()
+            else:
+                event = f"OSSEC PASS: {authd_password} OSSEC A:'{name}'\n".encode()
+
+            ssl_socket.send(event)
+            recv = ssl_socket.recv(4096)
+            registration_info = recv.decode().split("'")[1].split(" ")
+        finally:
+            ssl_socket.close()
+    finally:
+        sock.close()
+
+    return registration_info[0], registration_info[3]
+
+
+def _enroll_with_backoff(name, registration_address, authd_password, retries, backoff, timeout):
+    """Enroll an agent name, retrying with exponential backoff and jitter.
+
+    Returns:
+        tuple: ID, key and number of attempts.
+
+    Raises:
+        Exception: The error of the last attempt.
+    """
+    for attempt in range(retries + 1):
+        try:
+            agent_id, key = request_enrollment(name, registration_address, authd_password, timeout=timeout)
+            return agent_id, key, attempt + 1
+        except Exception:
+            if attempt == retries:
+                raise
+            sleep(backoff * 2 ** attempt * uniform(0.5, 1.5))
+
+
+def enroll_agents(agents_number, manager_address, cypher='aes', authd_password=None, agents_os=None,
+                  agents_version=None, concurrency=DEFAULT_ENROLLMENT_CONCURRENCY, retries=3, backoff=1.0, timeout=30,
+                  offline=False, client_keys_path=CLIENT_KEYS_PATH, first_id=None, **agent_kwargs):
+    """Enroll many agents concurrently and create them.
+
+    Enrollments run in a pool of `concurrency` threads and each one is retried `retries` times with exponential
+    backoff. In offline mode, the keys are written directly to the client.keys file of the manager (it has to be
+    local), without going through the enrollment service.
+
+    Args:
+        agents_number (int): total number of agents.
+        manager_address (str): IP address of the manager.
+        cypher (str): cypher used for the communications. It may be aes or blowfish.
+        authd_password (str, optional): password to enroll an agent.
+        agents_os (list, optional): list containing different operative systems for the agents.
+        agents_version (list, optional): list containing different version of the agent.
+        concurrency (int, optional): max enrollments in progress at the same time.
+        retries (int, optional): retries of each enrollment.
+        backoff (float, optional): seconds to wait before the first retry. It doubles with each retry.
+        timeout (float, optional): socket timeout of each enrollment in seconds.
+        offline (boolean, optional): write the agents to the client.keys file instead of enrolling them.
+        client_keys_path (str, optional): client.keys file used in offline mode.
+        first_id (int, optional): ID of the first agent in offline mode. Default the next ID of the client.keys file.
+        agent_kwargs: other parameters of the agents, like `fim_eps` or `registration_address`.
+
+    Returns:
+        tuple: list of the new agents (failed enrollments are left out) and report with the `enrolled` agents number,
+            the `failed` agents (name and error), the enrollment `latencies` and `attempts` per agent name and the
+            total `time`.
+    """
+    global agent_count
+    start_time = time()
+    registration_address = agent_kwargs.get('registration_address') or manager_address
+    agents_data = []
+    for index in range(agents_number):
+        agent_os = agents_os[index] if agents_os is not None else os_list[agent_count % len(os_list) - 1]
+        agent_version = agents_version[index] if agents_version is not None else None
+        name = f"{agent_count}-{''.join(sample(f'0123456789{ascii_letters}', 16))}-{agent_os}"
+        agents_data.append((name, agent_os, agent_version))
+        agent_count = agent_count + 1
+
+    def create_agent(name, agent_os, agent_version, agent_id, key):
+        return Agent(manager_address, cypher, os=agent_os, version=agent_version, id=agent_id, name=name, key=key,
+                     authd_password=authd_password, **agent_kwargs)
+
+    report = {'enrolled': 0, 'failed': {}, 'latencies': {}, 'attempts': {}}
+    agents = []
+    if offline:
+        client_keys = get_client_keys(client_keys_path)
+        next_id = (client_keys.last_id() if first_id is None else first_id - 1) + 1
+        entries = client_keys.add_many((str(next_id + index).zfill(3), name)
+                                       for index, (name, _, _) in enumerate(agents_data))
+        client_keys.flush()
+        for (name, agent_os, agent_version), (agent_id, _, _, key) in zip(agents_data, entries):
+            agents.append(create_agent(name, agent_os, agent_version, agent_id, key))
+        report['enrolled'] = len(agents)
+    else:
+        def enroll(name, agent_os, agent_version):
+            enrollment_start = time()
+            agent_id, key, attempts = _enroll_with_backoff(name, registration_address, authd_password, retries,
+                                                           backoff, timeout)
+            report['latencies'][name] = time() - enrollment_start
+            report['attempts'][name] = attempts
+            return create_agent(name, agent_os, agent_version, agent_id, key)
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [(data[0], executor.submit(enroll, *data)) for data in agents_data]
+            for name, future in futures:
+                try:
+                    agents.append(future.result())
+                except Exception as error:
+                    report['failed'][name] = repr(error)
+        report['enrolled'] = len(agents)
+
+        latencies = list(report['latencies'].values())
+        if latencies:
+            logging.info(f"Enrolled {report['enrolled']} agents ({len(report['failed'])} failed). Latency: "
+                         f"min {min(latencies):.3f}s, avg {sum(latencies) / len(latencies):.3f}s, "
+                         f"max {max(latencies):.3f}s")
+        for name, error in report['failed'].items():
+            logging.error(f"The agent {name} was not enrolled: {error}")
+
+    report['time'] = time() - start_time
+
+    return agents, report
+
+
 def connect(agent,  manager_address='localhost', protocol=TCP, manager_port='1514'):
     """Connects an agent to the manager
 
@@ -1746,3 +2164,314 @@ def connect(agent,  manager_address='localhost', protocol=TCP, manager_port='151
     injector.run()
     agent.wait_status_active()
     return sender, injector
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    """Protocol that puts the datagrams received by an `AsyncSender` in its queue."""
+
+    def __init__(self, datagrams):
+        self.datagrams = datagrams
+
+    def datagram_received(self, data, addr):
+        self.datagrams.put_nowait(data)
+
+
+class AsyncSender:
+    """Asynchronous version of `Sender`, so the connections of many agents can share the same event loop.
+
+    `connect` has to be awaited before sending anything. `send_event` and `send_events` only buffer the data, so they
+    can also be called from synchronous code such as `Agent.process_message`, and `drain` waits until the buffered
+    data has been written.
+
+    Attributes:
+        manager_address (str): IP of the manager.
+        manager_port (str, optional): port used by remoted in the manager.
+        protocol (str, optional): protocol used by remoted. TCP or UDP.
+        reader (asyncio.StreamReader): Reader of the TCP connection.
+        writer (asyncio.StreamWriter): Writer of the TCP connection.
+        transport (asyncio.DatagramTransport): Transport of the UDP endpoint.
+    """
+    def __init__(self, manager_address, manager_port='1514', protocol=TCP):
+        self.manager_address = manager_address
+        self.manager_port = manager_port
+        self.protocol = protocol.upper()
+        self.reader = None
+        self.writer = None
+        self.transport = None
+        self.datagrams = None
+
+    async def connect(self):
+        """Open the connection with the manager."""
+        if is_tcp(self.protocol):
+            self.reader, self.writer = await asyncio.open_connection(self.manager_address, int(self.manager_port))
+        if is_udp(self.protocol):
+            self.datagrams = asyncio.Queue()
+            self.transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: _DatagramReceiver(self.datagrams), remote_addr=(self.manager_address, int(self.manager_port)))
+
+    def send_event(self, event):
+        if is_tcp(self.protocol):
+            self.writer.write(pack('<I', len(event)) + event)
+        if is_udp(self.protocol):
+            self.transport.sendto(event)
+
+    def send_events(self, events, framed=False):
+        """Send several events.
+
+        Args:
+            events (list): Events to send.
+            framed (boolean): The events are already prefixed with their size (see `Agent.create_events`).
+        """
+        if is_tcp(self.protocol):
+            if not framed:
+                events = [pack('<I', len(event)) + event for event in events]
+            self.writer.write(b''.join(events))
+        if is_udp(self.protocol):
+            for event in events:
+                self.transport.sendto(event)
+
+    async def drain(self):
+        """Wait until the buffered events are written, reconnecting if the connection was lost."""
+        if is_tcp(self.protocol):
+            try:
+                await self.writer.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                logging.warning(f"Connection lost while sending events. Creating new connection...")
+                await asyncio.sleep(5)
+                await self.connect()
+
+    async def receive(self):
+        """Wait for the next message from the manager.
+
+        Returns:
+            bytes: Received message, without the size header.
+
+        Raises:
+            asyncio.IncompleteReadError: If the connection is closed.
+        """
+        if is_tcp(self.protocol):
+            data_len = wazuh_unpack(await self.reader.readexactly(4))
+            return await self.reader.readexactly(data_len)
+
+        return await self.datagrams.get()
+
+    def close(self):
+        """Close the connection with the manager."""
+        if self.writer is not None:
+            self.writer.close()
+        if self.transport is not None:
+            self.transport.close()
+
+
+class AsyncInjector:
+    """Asynchronous version of `Injector`. Instead of a thread per module, every enabled module of the agent runs as a
+    task of the current event loop, so thousands of agents can be simulated by the same process.
+
+    Attributes:
+        sender (AsyncSender): sender used to connect to the manager and send messages.
+        agent (Agent): agent owner of the injector and the sender.
+        scheduler (RateScheduler): scheduler that paces the events of the modules.
+        tasks (list): tasks running the agent modules.
+        stop_thread (int): 0 if the injector is running, 1 if it is stopped.
+        total_messages (dict): number of messages sent by each module.
+
+    Examples:
+        >>> import asyncio
+        >>> import wazuh_testing.tools.agent_simulator as ag
+        >>> agent = ag.Agent(manager_address, "aes", os="debian8", version="4.2.0")
+        >>> injector = ag.AsyncInjector(ag.AsyncSender(manager_address, protocol=TCP), agent)
+        >>> asyncio.run(injector.run())
+    """
+
+    def __init__(self, sender, agent, scheduler=None):
+        self.sender = sender
+        self.agent = agent
+        self.scheduler = RateScheduler() if scheduler is None else scheduler
+        self.tasks = []
+        self.stop_thread = 0
+        self.total_messages = {}
+
+    async def run(self):
+        """Connect to the manager and start a task for every enabled module."""
+        await self.sender.connect()
+        for module, config in self.agent.modules.items():
+            if config["status"] == "enabled":
+                self.total_messages[module] = 0
+                self.tasks.append(asyncio.ensure_future(self._run_module_task(module)))
+
+    async def _run_module_task(self, module):
+        logging.debug(f"Starting - {self.agent.name}({self.agent.id})({self.agent.os}) - {module}")
+        try:
+            if module == "keepalive":
+                await self.keep_alive()
+            elif module == "receive_messages":
+                await self.receive_messages()
+            else:
+                await self.run_module(module)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Module {module} of agent {self.agent.name}({self.agent.id}) stopped: {e}")
+
+    async def keep_alive(self):
+        """Send keep alive messages from the agent to the manager."""
+        await asyncio.sleep(10)
+        logging.debug("Startup - {}({})".format(self.agent.name, self.agent.id))
+        self.sender.send_event(self.agent.startup_msg)
+        self.sender.send_event(self.agent.keep_alive_event)
+        await self.sender.drain()
+        start_time = time()
+        frequency = self.agent.modules["keepalive"]["frequency"]
+        eps = 1
+        if 'eps' in self.agent.modules["keepalive"]:
+            frequency = 0
+            eps = self.agent.modules["keepalive"]["eps"]
+        key = (self.agent.id, 'keepalive')
+        self.scheduler.register(key, eps if frequency == 0 else 1 / frequency)
+        while self.stop_thread == 0:
+            logging.debug(f"KeepAlive - {self.agent.name}({self.agent.id})")
+            if frequency == 0:
+                await self.scheduler.wait_async(key)
+            else:
+                self.scheduler.acquire(key)
+            self.sender.send_event(self.agent.keep_alive_event)
+            await self.sender.drain()
+            self.total_messages['keepalive'] += 1
+            if frequency > 0:
+                await asyncio.sleep(frequency - ((time() - start_time) % frequency))
+            else:
+                new_checksum = str(getrandbits(128))
+                self.agent.update_checksum(new_checksum)
+
+    async def run_module(self, module):
+        """Send module messages from the agent to the manager.
+
+        Args:
+            module (str): Module name
+        """
+        module_info = self.agent.modules[module]
+        eps = module_info['eps'] if 'eps' in module_info else 1
+        frequency = module_info["frequency"] if 'frequency' in module_info else 1
+
+        await asyncio.sleep(10)
+        start_time = time()
+        batch_messages = eps * 0.5 * frequency if frequency > 1 else eps
+
+        module_event_generator = self.agent.get_module_event_generator(module)
+        if module == 'rootcheck':
+            batch_messages = len(self.agent.rootcheck.messages_list) * eps
+
+        framed = is_tcp(self.sender.protocol)
+        key = (self.agent.id, module)
+        self.scheduler.register(key, eps)
+
+        while self.stop_thread == 0:
+            sent_messages = 0
+            while sent_messages < batch_messages:
+                batch_size = max(1, int(min(self.scheduler.batch_size(key), batch_messages - sent_messages)))
+                messages = [self.agent.fit_message_size(module_event_generator()) for _ in range(batch_size)]
+                events = self.agent.create_events(messages, framed=framed)
+
+                await self.scheduler.wait_async(key, batch_size)
+                self.sender.send_events(events, framed=framed)
+                await self.sender.drain()
+                self.total_messages[module] += batch_size
+                sent_messages += batch_size
+            if frequency > 1:
+                await asyncio.sleep(frequency - ((time() - start_time) % frequency))
+
+    async def receive_messages(self):
+        """Receive the messages from the manager and process the accepted commands."""
+        while self.agent.stop_receive == 0:
+            try:
+                data = await self.sender.receive()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            try:
+                self.agent.process_message(self.sender, self.agent.decode_message(data))
+            except zlib.error:
+                logging.error("Corrupted message from the manager. Continuing.")
+            await self.sender.drain()
+
+    async def stop(self):
+        """Stop all the module tasks and close the connection."""
+        self.stop_thread = 1
+        self.agent.stop_receiver()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.sender.close()
+
+
+async def run_async_injectors(agents, manager_address, time_alive, protocol=TCP, manager_port='1514', scheduler=None):
+    """Run a group of agents in the current event loop for a period of time.
+
+    Args:
+        agents (list): Agents to run.
+        manager_address (str): Manager IP address to connect the agents.
+        time_alive (int): Period of time in seconds during the agents will be running.
+        protocol (str, optional): TCP or UDP protocol to connect the agents to the manager. Default TCP.
+        manager_port (str, optional): Port used by remoted in the manager. Default '1514'.
+        scheduler (RateScheduler, optional): Scheduler shared by all the agents. Default a new smooth one.
+
+    Returns:
+        list: Agents that could not be started. The rest keep running even if some of them fail.
+    """
+    scheduler = RateScheduler() if scheduler is None else scheduler
+    injectors = [AsyncInjector(AsyncSender(manager_address, manager_port=manager_port, protocol=protocol), agent,
+                               scheduler=scheduler)
+                 for agent in agents]
+    try:
+        results = await asyncio.gather(*[injector.run() for injector in injectors], return_exceptions=True)
+        failed_agents = []
+        for injector, result in zip(injectors, results):
+            if isinstance(result, Exception):
+                logging.error(f"The agent {injector.agent.name}({injector.agent.id}) could not be started: {result}")
+                failed_agents.append(injector.agent)
+        if len(failed_agents) < len(injectors):
+            await asyncio.sleep(time_alive)
+    finally:
+        await asyncio.gather(*[injector.stop() for injector in injectors], return_exceptions=True)
+        scheduler.log_report()
+
+    return failed_agents
+
+
+def _run_async_shard(agents, manager_address, time_alive, protocol, manager_port, eps_mode, global_eps):
+    asyncio.run(run_async_injectors(agents, manager_address, time_alive, protocol=protocol, manager_port=manager_port,
+                                    scheduler=RateScheduler(mode=eps_mode, global_eps=global_eps)))
+
+
+def run_async_agents(agents, manager_address, time_alive, protocol=TCP, manager_port='1514', workers=1,
+                     eps_mode='smooth', global_eps=None):
+    """Run agents on asyncio event loops, splitting them among several worker processes.
+
+    Every worker runs all the connections and modules of its agents in a single event loop. Keep in mind that each TCP
+    agent needs a file descriptor, so the open files limit of the workers has to be big enough.
+
+    Args:
+        agents (list): Agents to run.
+        manager_address (str): Manager IP address to connect the agents.
+        time_alive (int): Period of time in seconds during the agents will be running.
+        protocol (str, optional): TCP or UDP protocol to connect the agents to the manager. Default TCP.
+        manager_port (str, optional): Port used by remoted in the manager. Default '1514'.
+        workers (int, optional): Number of processes the agents are split into. Default 1.
+        eps_mode (str, optional): smooth or burst pacing of the events. Default smooth.
+        global_eps (float, optional): Max EPS of all the agents together, evenly split among the workers. Default None.
+    """
+    if workers <= 1:
+        _run_async_shard(agents, manager_address, time_alive, protocol, manager_port, eps_mode, global_eps)
+        return
+
+    workers = min(workers, len(agents))
+    worker_eps = global_eps / workers if global_eps else None
+    processes = [Process(target=_run_async_shard,
+                         args=(agents[shard::workers], manager_address, time_alive, protocol, manager_port, eps_mode,
+                               worker_eps))
+                 for shard in range(workers)]
+
+    for worker in processes:
+        worker.start()
+
+    for worker in processes:
+        worker.join()
@@ -2,7 +2,7 @@ import ssl
 import time
 
 from wazuh_testing.tools.monitoring import ManInTheMiddle
-from wazuh_testing.tools.security import CertificateController
+from wazuh_testing.tools.security import CertificateController, DEFAULT_KEY_SIZE
 
 
 class AuthdSimulator:
@@ -11,14 +11,14 @@ class AuthdSimulator:
     """
 
     def __init__(self, server_address='127.0.0.1', enrollment_port=1515, key_path='/etc/manager.key',
-                 cert_path='/etc/manager.cert', initial_mode='ACCEPT'):
+                 cert_path='/etc/manager.cert', initial_mode='ACCEPT', key_size=DEFAULT_KEY_SIZE):
         self.mitm_enrollment = ManInTheMiddle(address=(server_address, enrollment_port), family='AF_INET',
                                               connection_protocol='SSL', func=self._process_enrollment_message)
         self.key_path = key_path
         self.cert_path = cert_path
         self.id_count = 1
         self.secret = 'TopSecret'
-        self.controller = CertificateController()
+        self.controller = CertificateController(key_size=key_size)
         self.mode = initial_mode
 
     def start(self):
@@ -1,62 +1,266 @@
+import os
 import random
+import shutil
+import threading
 
 import wazuh_testing
 
 
-def add_client_keys_entry(agent_id, agent_name, agent_ip='any', agent_key=None):
-    """Add new entry to client keys file. If the agent_id already exists, this will be overwritten.
+_client_keys_stores = {}
+_client_keys_lock = threading.Lock()
+
+
+def _generate_key():
+    return ''.join(random.choice('0123456789abcdef') for i in range(64))
+
+
+class ClientKeys:
+    """In-memory copy of a client.keys file, indexed by agent ID, name and IP.
+
+    Changes are only written to disk by `flush`, which replaces the file atomically (temporary file and rename), so
+    adding or removing many agents costs a single write of the file. The lines that are not an entry are kept as they
+    are and written back after the entries.
 
     Args:
-        agent_id (str): Agent identifier.
-        agent_name (str): Agent name.
-        agent_ip (str): Agent ip.
-        agent_key (str): Agent key.
+        path (str): Path of the client.keys file.
+
+    Attributes:
+        path (str): Path of the client.keys file.
+        entries (dict): (ID, name, IP, key) entry of each agent ID, in file order.
+        unparsed_lines (list): Non-empty lines of the file that are not an entry, in file order.
+        dirty (bool): There are changes not written to disk yet.
+
+    Example:
+        >>> with ClientKeys() as client_keys:
+        ...     client_keys.add_many((str(agent_id).zfill(3), f"agent_{agent_id}") for agent_id in range(1, 1000))
     """
-    registered_client_key_entries_dict = {}
 
-    # Generate new key if necessary
-    if agent_key is None:
-        agent_key = ''.join(random.choice('0123456789abcdef') for i in range(64))
+    def __init__(self, path=None):
+        self.path = wazuh_testing.CLIENT_KEYS_PATH if path is None else path
+        self.entries = {}
+        self.unparsed_lines = []
+        self._by_name = {}
+        self._by_ip = {}
+        self.dirty = False
+        self._signature = None
+        self.load()
 
-    # Read client keys data
-    with open(wazuh_testing.CLIENT_KEYS_PATH, 'r') as client_keys:
-        registered_client_key_entries_str = client_keys.readlines()
+    def __enter__(self):
+        return self
 
-    # Process current client key entries
-    for client_key_entry in registered_client_key_entries_str:
-        _agent_id, _agent_name, _agent_ip, _agent_key = client_key_entry.split()
-        registered_client_key_entries_dict[_agent_id] = f"{_agent_id} {_agent_name} {_agent_ip} {_agent_key}"
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
 
-    # Add the new client key entry
-    registered_client_key_entries_dict[agent_id] = f"{agent_id} {agent_name} {agent_ip} {agent_key}"
+    def __len__(self):
+        return len(self.entries)
 
-    # Save new client keys content
-    with open(wazuh_testing.CLIENT_KEYS_PATH, 'w') as client_keys:
-        for _, client_key_entry in registered_client_key_entries_dict.items():
-            client_keys.write(f"{client_key_entry}\n")
+    def __contains__(self, agent_id):
+        return agent_id in self.entries
 
+    def __iter__(self):
+        return iter(self.entries.values())
 
-def delete_client_keys_entry(agent_id):
-    """Delete an entry from client keys file.
+    def _file_signature(self):
+        try:
+            file_stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+        return file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size
+
+    def load(self):
+        """Read the client.keys file, discarding the changes not written to disk."""
+        self.entries = {}
+        self.unparsed_lines = []
+        self._by_name = {}
+        self._by_ip = {}
+        self._signature = self._file_signature()
+        if self._signature is not None:
+            with open(self.path) as client_keys:
+                for line in client_keys:
+                    fields = line.split()
+                    if len(fields) == 4:
+                        self._index(tuple(fields))
+                    elif fields:
+                        self.unparsed_lines.append(line.rstrip('\n'))
+        self.dirty = False
+
+    def reload_if_changed(self):
+        """Read the client.keys file again if it was modified by someone else and there are no pending changes."""
+        if not self.dirty and self._file_signature() != self._signature:
+            self.load()
+
+    def _index(self, entry):
+        self._unindex(entry[0])
+        self.entries[entry[0]] = entry
+        self._by_name[entry[1]] = entry[0]
+        self._by_ip.setdefault(entry[2], set()).add(entry[0])
+
+    def _unindex(self, agent_id):
+        entry = self.entries.pop(agent_id, None)
+        if entry is not None:
+            if self._by_name.get(entry[1]) == agent_id:
+                del self._by_name[entry[1]]
+            self._by_ip[entry[2]].discard(agent_id)
+        return entry
+
+    def get(self, agent_id):
+        """Get the entry of an agent.
+
+        Args:
+            agent_id (str): Agent identifier.
+
+        Returns:
+            tuple: ID, name, IP and key of the agent. None if it does not exist.
+        """
+        return self.entries.get(agent_id)
+
+    def get_by_name(self, agent_name):
+        """Get the entry of an agent by its name.
+
+        Args:
+            agent_name (str): Agent name.
+
+        Returns:
+            tuple: ID, name, IP and key of the agent. None if it does not exist.
+        """
+        agent_id = self._by_name.get(agent_name)
+        return None if agent_id is None else self.entries[agent_id]
+
+    def get_by_ip(self, agent_ip):
+        """Get the entries of the agents with an IP.
+
+        Args:
+            agent_ip (str): Agent IP.
+
+        Returns:
+            list: ID, name, IP and key of each agent.
+        """
+        return [self.entries[agent_id] for agent_id in self._by_ip.get(agent_ip, ())]
+
+    def last_id(self):
+        """Get the highest agent ID.
+
+        Returns:
+            int: Highest agent ID, 0 if there are no agents.
+        """
+        return max((int(agent_id) for agent_id in self.entries), default=0)
+
+    def add(self, agent_id, agent_name, agent_ip='any', agent_key=None):
+        """Add an entry. If the agent_id already exists, this will be overwritten.
+
+        Args:
+            agent_id (str): Agent identifier.
+            agent_name (str): Agent name.
+            agent_ip (str): Agent ip.
+            agent_key (str): Agent key. A random one is generated if it is None.
+
+        Returns:
+            tuple: New entry.
+        """
+        entry = (agent_id, agent_name, agent_ip, _generate_key() if agent_key is None else agent_key)
+        self._index(entry)
+        self.dirty = True
+
+        return entry
+
+    def add_many(self, entries):
+        """Add many entries.
+
+        Args:
+            entries (iterable): Tuples or dicts with the `add` arguments.
+
+        Returns:
+            list: New entries.
+        """
+        return [self.add(**entry) if isinstance(entry, dict) else self.add(*entry) for entry in entries]
+
+    def remove(self, agent_id):
+        """Remove an entry.
+
+        Args:
+            agent_id (str): Agent identifier.
+
+        Returns:
+            tuple: Removed entry. None if it did not exist.
+        """
+        entry = self._unindex(agent_id)
+        if entry is not None:
+            self.dirty = True
+
+        return entry
+
+    def remove_many(self, agent_ids):
+        """Remove many entries.
+
+        Args:
+            agent_ids (iterable): Agent identifiers.
+        """
+        for agent_id in agent_ids:
+            self.remove(agent_id)
+
+    def flush(self):
+        """Write the changes to the client.keys file, replacing it atomically."""
+        if not self.dirty:
+            return
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as client_keys:
+            client_keys.write(''.join(f"{' '.join(entry)}\n" for entry in self.entries.values()))
+            client_keys.write(''.join(f"{line}\n" for line in self.unparsed_lines))
+        if os.path.exists(self.path):
+            shutil.copymode(self.path, temp_path)
+            file_stat = os.stat(self.path)
+            try:
+                os.chown(temp_path, file_stat.st_uid, file_stat.st_gid)
+            except (AttributeError, OSError):
+                pass
+        os.replace(temp_path, self.path)
+
+        self._signature = self._file_signature()
+        self.dirty = False
+
+
+def get_client_keys(path=None):
+    """Get the client.keys store shared by the scripts and fixtures, reloaded if the file changed on disk.
 
     Args:
-        agent_id (str): Agent identifier.
+        path (str): Path of the client.keys file. Default the client.keys of the installation.
+
+    Returns:
+        ClientKeys: Shared store of the file.
     """
-    registered_client_key_entries_dict = {}
+    path = wazuh_testing.CLIENT_KEYS_PATH if path is None else path
+    with _client_keys_lock:
+        if path not in _client_keys_stores:
+            _client_keys_stores[path] = ClientKeys(path)
+        else:
+            _client_keys_stores[path].reload_if_changed()
 
-    # Read client keys data
-    with open(wazuh_testing.CLIENT_KEYS_PATH, 'r') as client_keys:
-        registered_client_key_entries_str = client_keys.readlines()
+        return _client_keys_stores[path]
 
-    # Process current client key entries
-    for client_key_entry in registered_client_key_entries_str:
-        _agent_id, _agent_name, _agent_ip, _agent_key = client_key_entry.split()
-        registered_client_key_entries_dict[_agent_id] = f"{_agent_id} {_agent_name} {_agent_ip} {_agent_key}"
 
-    # Remove client key entry
-    registered_client_key_entries_dict.pop(agent_id, None)
+def add_client_keys_entry(agent_id, agent_name, agent_ip='any', agent_key=None):
+    """Add new entry to client keys file. If the agent_id already exists, this will be overwritten.
+
+    Args:
+        agent_id (str): Agent identifier.
+        agent_name (str): Agent name.
+        agent_ip (str): Agent ip.
+        agent_key (str): Agent key.
+    """
+    client_keys = get_client_keys()
+    client_keys.add(agent_id, agent_name, agent_ip, agent_key)
+    client_keys.flush()
+
+
+def delete_client_keys_entry(agent_id):
+    """Delete an entry from client keys file.
 
-    # Save new client keys content
-    with open(wazuh_testing.CLIENT_KEYS_PATH, 'w') as client_keys:
-        for _, client_key_entry in registered_client_key_entries_dict.items():
-            client_keys.write(f"{client_key_entry}\n")
+    Args:
+        agent_id (str): Agent identifier.
+    """
+    client_keys = get_client_keys()
+    client_keys.remove(agent_id)
+    client_keys.flush()
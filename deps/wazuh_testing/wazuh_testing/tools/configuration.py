@@ -1,19 +1,23 @@
 # Copyright (C) 2015-2021, Wazuh Inc.
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+import hashlib
 import itertools
 import os
+import pickle
+import re
 import sys
+import time
 import xml.etree.ElementTree as ET
-from copy import deepcopy
+from copy import copy, deepcopy
 from subprocess import check_call, DEVNULL, check_output
+from tempfile import gettempdir
 from typing import List, Any, Set
 
 import pytest
 import yaml
 from wazuh_testing import global_parameters, logger
 from wazuh_testing.tools import WAZUH_PATH, GEN_OSSEC, WAZUH_CONF, PREFIX, WAZUH_LOCAL_INTERNAL_OPTIONS
-from wazuh_testing import global_parameters, logger
 
 
 # customize _serialize_xml to avoid lexicographical order in XML attributes
@@ -70,6 +74,38 @@ def _serialize_xml(write, elem, qnames, namespaces,
 
 ET._serialize_xml = _serialize_xml  # override _serialize_xml to avoid lexicographical order in XML attributes
 
+# Parsed YAML files, as pickles to get independent copies of them quickly
+YAML_CACHE_PATH = os.path.join(gettempdir(), 'wazuh_testing_yaml_cache')
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_yaml_cache = {}
+
+# Maximum time to wait for the pid files of the daemons started by a ConfigurationManager
+DAEMON_PID_FILE_TIMEOUT = 10
+
+# Daemons that read each section of the ossec.conf. A change in any other section restarts the whole service.
+SECTION_DAEMONS = {
+    'syscheck': ['wazuh-syscheckd'],
+    'rootcheck': ['wazuh-syscheckd'],
+    'localfile': ['wazuh-logcollector'],
+    'socket': ['wazuh-logcollector'],
+    'wodle': ['wazuh-modulesd'],
+    'sca': ['wazuh-modulesd'],
+    'vulnerability-detector': ['wazuh-modulesd'],
+    'gcp-pubsub': ['wazuh-modulesd'],
+    'github': ['wazuh-modulesd'],
+    'office365': ['wazuh-modulesd'],
+    'agent-upgrade': ['wazuh-modulesd'],
+    'task-manager': ['wazuh-modulesd'],
+    'remote': ['wazuh-remoted'],
+    'auth': ['wazuh-authd'],
+    'cluster': ['wazuh-clusterd'],
+    'integration': ['wazuh-integratord'],
+    'syslog_output': ['wazuh-csyslogd'],
+    'database_output': ['wazuh-dbd'],
+    'agentless': ['wazuh-agentlessd'],
+    'client_buffer': ['wazuh-agentd']
+}
+
 
 def set_wazuh_conf(wazuh_conf: List[str]):
     """
@@ -324,7 +360,7 @@ def set_section_wazuh_conf(sections, template=None):
                         section_conf.attrib[attr_name] = str(attr_value)
 
         # Insert elements
-        new_elements = section.get('elements', list())
+        new_elements = list(section.get('elements', list()))
         if global_parameters.fim_database_memory and section['section'] == 'syscheck':
             new_elements.append({'database': {'value': 'memory'}})
         if new_elements:
@@ -362,6 +398,66 @@ def expand_placeholders(mutable_obj, placeholders=None):
     return mutable_obj
 
 
+def compile_placeholders(obj, path=(), plan=None):
+    """
+    Get the positions of every value inside obj that `expand_placeholders` could replace.
+
+    Args:
+        obj (dict or list): Target object of the replacements.
+        path (tuple, optional): Keys and indexes from the root object to obj. Default `()`
+        plan (dict, optional): Plan to extend. Default `None`
+
+    Returns:
+        dict: Paths (tuple of keys and indexes) of each value.
+    """
+    plan = {} if plan is None else plan
+    items = enumerate(obj) if isinstance(obj, list) else obj.items() if isinstance(obj, dict) else ()
+    for key, value in items:
+        if isinstance(value, (dict, list)):
+            compile_placeholders(value, path=path + (key,), plan=plan)
+        else:
+            try:
+                plan.setdefault(value, []).append(path + (key,))
+            except TypeError:
+                pass
+
+    return plan
+
+
+def apply_placeholders(obj, plan, placeholders=None):
+    """
+    Get a copy of obj with the placeholders replaced, like `expand_placeholders` does, without modifying obj.
+
+    Only obj and the lists and dicts that contain a replacement are copied, the rest are shared with obj.
+
+    Args:
+        obj (dict or list): Target object of the replacements.
+        plan (dict): Positions of the values of obj, as returned by `compile_placeholders`.
+        placeholders (dict, optional): Each key is a placeholder and its value is the replacement. Default `None`
+
+    Returns:
+        dict or list: Shallow copy of obj with the replacements.
+    """
+    new_obj = copy(obj)
+    copied = {(): new_obj}
+    for placeholder, replacement in ({} if placeholders is None else placeholders).items():
+        try:
+            paths = plan.get(placeholder, ())
+        except TypeError:
+            continue
+        for path in paths:
+            parent = new_obj
+            for depth in range(1, len(path)):
+                child = copied.get(path[:depth])
+                if child is None:
+                    child = copied[path[:depth]] = copy(parent[path[depth - 1]])
+                    parent[path[depth - 1]] = child
+                parent = child
+            parent[path[-1]] = replacement
+
+    return new_obj
+
+
 def add_metadata(dikt, metadata=None):
     """
     Create a new key 'metadata' in dict if not already exists and updates it with metadata content.
@@ -371,7 +467,8 @@ def add_metadata(dikt, metadata=None):
         metadata (dict, optional):  Dict including the new properties to be saved in the metadata key.
     """
     if metadata is not None:
-        new_metadata = dikt['metadata'] if 'metadata' in dikt else {}
+        # The metadata can be shared with other configurations, so it is replaced instead of updated in place
+        new_metadata = dict(dikt['metadata']) if 'metadata' in dikt else {}
         new_metadata.update(metadata)
         dikt['metadata'] = new_metadata
 
@@ -417,16 +514,83 @@ def load_wazuh_configurations(yaml_file_path: str, test_name: str, params: list
     if len(params) != len(metadata):
         raise ValueError(f"params and metadata should have the same length {len(params)} != {len(metadata)}")
 
-    with open(yaml_file_path) as stream:
-        configurations = yaml.safe_load(stream)
+    configurations = load_yaml(yaml_file_path)
 
     if sys.platform == 'darwin':
         configurations = set_correct_prefix(configurations, PREFIX)
 
-    return [process_configuration(configuration, placeholders=replacement, metadata=meta)
-            for replacement, meta in zip(params, metadata)
-            for configuration in configurations
-            if test_name in expand_placeholders(configuration.get('apply_to_modules'), placeholders=replacement)]
+    # The configurations of each param set only copy what their placeholders change
+    plans = [compile_placeholders(configuration) for configuration in configurations]
+    new_configurations = []
+    for replacement, meta in zip(params, metadata):
+        for configuration, plan in zip(configurations, plans):
+            new_configuration = apply_placeholders(configuration, plan, placeholders=replacement)
+            if test_name in new_configuration.get('apply_to_modules'):
+                add_metadata(new_configuration, metadata=meta)
+                new_configurations.append(new_configuration)
+
+    return new_configurations
+
+
+def _get_yaml_cache_dir():
+    """Get the directory of the parsed YAML files, if it is only writable by the current user."""
+    try:
+        os.makedirs(YAML_CACHE_PATH, mode=0o700, exist_ok=True)
+        cache_stat = os.stat(YAML_CACHE_PATH)
+    except OSError:
+        return None
+
+    # The cached files are unpickled, so they must not be replaceable by other users
+    if hasattr(os, 'getuid') and (cache_stat.st_uid != os.getuid() or cache_stat.st_mode & 0o022):
+        return None
+
+    return YAML_CACHE_PATH
+
+
+def load_yaml(yaml_file_path, disk_cache=True):
+    """
+    Load a YAML file using the C loader of PyYAML if it is available.
+
+    The parsed documents are cached in memory and on disk, keyed by the digest of the file content, so each file is
+    only parsed again when it changes. Every call returns a new copy of the document.
+
+    Args:
+        yaml_file_path (str): Path of the YAML file.
+        disk_cache (bool, optional): Keep the parsed documents in YAML_CACHE_PATH, to reuse them in other sessions.
+            Default `True`
+
+    Returns:
+        Python object with the YAML file content.
+    """
+    with open(yaml_file_path, 'rb') as stream:
+        content = stream.read()
+    digest = hashlib.sha1(_YamlLoader.__name__.encode() + b'\0' + content).hexdigest()
+
+    document = _yaml_cache.get(digest)
+    if document is None:
+        cache_dir = _get_yaml_cache_dir() if disk_cache else None
+        cache_file = os.path.join(cache_dir, f"{digest}.pickle") if cache_dir else None
+        if cache_file:
+            try:
+                with open(cache_file, 'rb') as cached:
+                    document = cached.read()
+                pickle.loads(document)
+            except Exception:
+                document = None
+
+        if document is None:
+            document = pickle.dumps(yaml.load(content, Loader=_YamlLoader), protocol=4)
+            if cache_file:
+                try:
+                    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+                    with open(temp_file, 'wb') as cached:
+                        cached.write(document)
+                    os.replace(temp_file, cache_file)
+                except OSError:
+                    pass
+        _yaml_cache[digest] = document
+
+    return pickle.loads(document)
 
 
 def set_correct_prefix(configurations, new_prefix):
@@ -642,3 +806,228 @@ def set_local_internal_options_dict(dict_local_internal_options):
         for option_name, option_value in dict_local_internal_options.items():
             local_internal_configuration_string = f"{str(option_name)}={str(option_value)}\n"
             local_internal_option_file.write(local_internal_configuration_string)
+
+
+def _canonical_element(element):
+    """Get a representation of an XML element that ignores formatting, comments and attribute order."""
+    return (element.tag, tuple(sorted(element.attrib.items())), (element.text or '').strip(),
+            tuple(_canonical_element(child) for child in element if isinstance(child.tag, str)))
+
+
+class ConfigurationManager:
+    """Keep track of the configuration loaded by the running Wazuh daemons, to restart only the daemons that read the
+    sections changed by a new configuration.
+
+    The configuration is parsed in sections, keyed by tag and attributes (like `wodle[name=syscollector]`), with a
+    canonical form that ignores formatting and comments. The active configuration is the one on disk the last time
+    that the daemons were (re)started through `apply` or `set_applied`. It is discarded if any daemon was restarted by
+    other means since then, or if the local internal options changed.
+
+    Attributes:
+        active_sections (dict): Canonical form of each section of the active configuration. None if it is unknown.
+        active_hash (str): Hash of the active configuration. None if it is unknown.
+    """
+
+    def __init__(self):
+        self.active_sections = None
+        self.active_hash = None
+        self._active_internal_options = None
+        self._active_pids = None
+
+    @staticmethod
+    def parse_sections(wazuh_conf=None):
+        """Parse a Wazuh configuration in sections.
+
+        Args:
+            wazuh_conf (list or str, optional): Lines of the ossec.conf. Default the current ossec.conf.
+
+        Returns:
+            dict: Canonical form of the blocks of each section, in order. Sections with several blocks, like
+                `localfile`, have one item per block.
+        """
+        wazuh_conf = get_wazuh_conf() if wazuh_conf is None else wazuh_conf
+        content = wazuh_conf if isinstance(wazuh_conf, str) else ''.join(wazuh_conf)
+        # The ossec.conf can have several <ossec_config> roots
+        content = re.sub(r'<\?xml[^>]*\?>', '', content)
+        sections = {}
+        for root in ET.fromstring(f"<root>{content}</root>"):
+            for section in root:
+                if isinstance(section.tag, str):
+                    attributes = ''.join(f"[{name}={value}]" for name, value in sorted(section.attrib.items()))
+                    sections.setdefault(f"{section.tag}{attributes}", []).append(_canonical_element(section))
+
+        return {key: tuple(blocks) for key, blocks in sections.items()}
+
+    @staticmethod
+    def get_hash(sections):
+        """Get the canonical hash of a configuration.
+
+        Args:
+            sections (dict): Sections of the configuration, as returned by `parse_sections`.
+
+        Returns:
+            str: SHA-1 of the canonical form of the configuration.
+        """
+        return hashlib.sha1(repr(sorted(sections.items())).encode()).hexdigest()
+
+    @staticmethod
+    def diff(old_sections, new_sections):
+        """Get the sections that differ between two configurations.
+
+        Args:
+            old_sections (dict): Sections of the previous configuration.
+            new_sections (dict): Sections of the new configuration.
+
+        Returns:
+            set: Keys of the sections added, removed or modified.
+        """
+        return {key for key in old_sections.keys() | new_sections.keys()
+                if old_sections.get(key) != new_sections.get(key)}
+
+    @staticmethod
+    def get_affected_daemons(changed_sections):
+        """Get the daemons that read a set of sections.
+
+        Args:
+            changed_sections (set): Keys of the changed sections.
+
+        Returns:
+            set: Names of the daemons. None if any section is read by unknown daemons, so the whole service is
+                affected.
+        """
+        daemons = set()
+        for key in changed_sections:
+            section_daemons = SECTION_DAEMONS.get(key.split('[', 1)[0])
+            if section_daemons is None:
+                return None
+            daemons.update(section_daemons)
+
+        return daemons
+
+    @staticmethod
+    def _get_pids():
+        from wazuh_testing.tools.services import get_wazuh_daemons, get_daemon_pids
+
+        return {daemon: sorted(get_daemon_pids(daemon)) for daemon in get_wazuh_daemons()}
+
+    @staticmethod
+    def _get_internal_options():
+        try:
+            return get_wazuh_local_internal_options()
+        except FileNotFoundError:
+            return None
+
+    def is_active_known(self):
+        """Check if the configuration loaded by the running daemons is known.
+
+        Returns:
+            bool: False if no configuration was applied yet, or the daemons or internal options changed since then.
+        """
+        return (self.active_sections is not None and sys.platform != 'win32'
+                and self._active_internal_options == self._get_internal_options()
+                and self._active_pids == self._get_pids())
+
+    def get_changes(self, wazuh_conf=None):
+        """Get the sections and daemons affected by applying a configuration.
+
+        Args:
+            wazuh_conf (list or str, optional): Lines of the ossec.conf. Default the current ossec.conf.
+
+        Returns:
+            tuple: Keys of the changed sections (None if the active configuration is unknown or the new one can not be
+                parsed) and names of the affected daemons (None if the whole service is affected).
+        """
+        if not self.is_active_known():
+            return None, None
+
+        try:
+            new_sections = self.parse_sections(wazuh_conf)
+        except ET.ParseError as e:
+            logger.debug(f"Could not parse the ossec.conf to get its changes: {e}")
+            return None, None
+
+        changed_sections = self.diff(self.active_sections, new_sections)
+        return changed_sections, self.get_affected_daemons(changed_sections)
+
+    def set_applied(self, wazuh_conf=None):
+        """Record a configuration as the one loaded by the running daemons. Call it right after restarting Wazuh.
+
+        The active configuration is forgotten if it can not be parsed, Wazuh accepts some content that ElementTree
+        rejects.
+
+        Args:
+            wazuh_conf (list or str, optional): Lines of the ossec.conf. Default the current ossec.conf.
+        """
+        if sys.platform == 'win32':
+            return
+
+        try:
+            self.active_sections = self.parse_sections(wazuh_conf)
+        except ET.ParseError as e:
+            logger.debug(f"Could not parse the applied ossec.conf: {e}")
+            self.invalidate()
+            return
+
+        self.active_hash = self.get_hash(self.active_sections)
+        self._active_internal_options = self._get_internal_options()
+        self._active_pids = self._get_pids()
+
+    def invalidate(self):
+        """Forget the active configuration, so the next `apply` restarts the whole service."""
+        self.active_sections = self.active_hash = self._active_internal_options = self._active_pids = None
+
+    def apply(self, before_start=None):
+        """Restart the daemons affected by the changes of the current ossec.conf with respect to the active one.
+
+        Nothing is restarted if the configuration did not change, and the whole service is restarted if the active
+        configuration is unknown or the changes affect unknown or stopped daemons.
+
+        Args:
+            before_start (callable, optional): Function called after stopping and before starting, like truncating
+                the logs. It is called even if nothing is restarted.
+
+        Returns:
+            set: Names of the restarted daemons. None if the whole service was restarted.
+        """
+        from wazuh_testing.tools.services import control_service, get_wazuh_daemons, is_daemon_running
+
+        changed_sections, daemons = self.get_changes()
+        if daemons is not None and not all(is_daemon_running(daemon) for daemon in daemons):
+            daemons = None
+
+        if daemons is None:
+            logger.debug(f"Restarting Wazuh, changed sections: {changed_sections}")
+            control_service('stop')
+            if before_start is not None:
+                before_start()
+            control_service('start')
+        else:
+            logger.debug(f"Restarting {daemons or 'no daemons'}, changed sections: {changed_sections}")
+            # Same order that wazuh-control uses to stop and start the daemons
+            ordered_daemons = [daemon for daemon in get_wazuh_daemons() if daemon in daemons]
+            for daemon in ordered_daemons:
+                control_service('stop', daemon=daemon)
+            if before_start is not None:
+                before_start()
+            for daemon in reversed(ordered_daemons):
+                control_service('start', daemon=daemon)
+            # The started daemons write their pid files after going to background
+            deadline = time.time() + DAEMON_PID_FILE_TIMEOUT
+            while not all(is_daemon_running(daemon) for daemon in daemons) and time.time() < deadline:
+                time.sleep(0.1)
+
+        self.set_applied()
+
+        return daemons
+
+
+_configuration_manager = ConfigurationManager()
+
+
+def get_configuration_manager():
+    """Get the configuration manager shared by the fixtures.
+
+    Returns:
+        ConfigurationManager: Shared configuration manager.
+    """
+    return _configuration_manager
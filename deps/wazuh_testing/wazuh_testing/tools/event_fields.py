@@ -0,0 +1,205 @@
+# Copyright (C) 2015-2021, Wazuh Inc.
+# Created by Wazuh, Inc. <info@wazuh.com>.
+# This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+import re
+from collections import Counter
+from functools import lru_cache
+
+_PATH_STEP = re.compile(r'\.?\[\]|\.?\[(-?\d+)\]|\.?\["((?:[^"\\]|\\.)*)"\]|\.([A-Za-z_][A-Za-z0-9_]*)')
+
+
+class FieldPath:
+    """Compiled jq-like path expression, to extract fields from JSON documents loaded as Python objects.
+
+    Only the path subset of jq is supported: `.` (identity), `.key`, `.["key"]`, `.[index]` and `.[]` (iterate
+    over the items of a list or the values of a dict), chained, like `.[].data.path`. As in jq, a key of a null value
+    or a missing key is null, and every item of an iteration is a different output.
+
+    Args:
+        expression (str): Path expression.
+
+    Attributes:
+        expression (str): Path expression.
+        steps (tuple): (kind, argument) pair of each step of the path, where kind is 'key', 'index' or 'iter'.
+
+    Raises:
+        ValueError: If the expression is not a supported path.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.steps = self._parse(expression)
+
+    def __repr__(self):
+        return f"FieldPath({self.expression!r})"
+
+    @staticmethod
+    def _parse(expression):
+        expression = expression.strip()
+        if not expression.startswith('.'):
+            raise ValueError(f"Invalid path expression '{expression}': it must start with '.'")
+
+        steps = []
+        position = 1 if expression == '.' else 0
+        while position < len(expression):
+            step = _PATH_STEP.match(expression, position)
+            if step is None:
+                raise ValueError(f"Invalid path expression '{expression}' at position {position}")
+            index, quoted_key, key = step.groups()
+            if key is not None:
+                steps.append(('key', key))
+            elif quoted_key is not None:
+                steps.append(('key', re.sub(r'\\(.)', r'\1', quoted_key)))
+            elif index is not None:
+                steps.append(('index', int(index)))
+            else:
+                steps.append(('iter', None))
+            position = step.end()
+
+        return tuple(steps)
+
+    def values(self, document):
+        """Get all the outputs of the path for a document.
+
+        Args:
+            document (dict, list): JSON document.
+
+        Returns:
+            list: Outputs of the path, in order.
+
+        Raises:
+            ValueError: If a step can not be applied to the type of a value, like a key of a list.
+        """
+        values = [document]
+        for kind, argument in self.steps:
+            if kind == 'key':
+                for position, value in enumerate(values):
+                    if isinstance(value, dict):
+                        values[position] = value.get(argument)
+                    elif value is not None:
+                        raise ValueError(f"Cannot index {type(value).__name__} with '{argument}' "
+                                         f"in '{self.expression}'")
+            elif kind == 'index':
+                for position, value in enumerate(values):
+                    if isinstance(value, list):
+                        values[position] = value[argument] if -len(value) <= argument < len(value) else None
+                    elif value is not None:
+                        raise ValueError(f"Cannot index {type(value).__name__} with a number in '{self.expression}'")
+            else:
+                items = []
+                for value in values:
+                    if isinstance(value, dict):
+                        items.extend(value.values())
+                    elif isinstance(value, list):
+                        items.extend(value)
+                    else:
+                        raise ValueError(f"Cannot iterate over {type(value).__name__} in '{self.expression}'")
+                values = items
+
+        return values
+
+    def first(self, document, default=None):
+        """Get the first output of the path for a document.
+
+        Args:
+            document (dict, list): JSON document.
+            default (any): Value returned if the path has no outputs.
+
+        Returns:
+            any: First output of the path.
+        """
+        values = self.values(document)
+        return values[0] if values else default
+
+
+@lru_cache(maxsize=256)
+def compile_path(expression):
+    """Compile a path expression, reusing the previous compilations of the same expression.
+
+    Args:
+        expression (str): Path expression, like `.data.path`.
+
+    Returns:
+        FieldPath: Compiled path.
+    """
+    return FieldPath(expression)
+
+
+class EventIndex:
+    """Fields of a batch of events, extracted in a single pass and indexed for membership and count checks.
+
+    Args:
+        events (list): Events to index.
+        paths (str): Path expressions of the fields, relative to each event, like `.data.path`.
+
+    Attributes:
+        events (list): Indexed events.
+        fields (dict): Outputs of each path for all the events, in order.
+
+    Example:
+        >>> index = EventIndex(events, '.data.type', '.data.path')
+        >>> index.counter('.data.type')['added'] == len(file_list)
+        >>> all(path in index.set('.data.path') for path in expected_paths)
+    """
+
+    def __init__(self, events, *paths):
+        self.events = events
+        compiled_paths = [(path, compile_path(path)) for path in paths]
+        self.fields = {path: [] for path in paths}
+        for event in events:
+            for path, compiled_path in compiled_paths:
+                self.fields[path].extend(compiled_path.values(event))
+        self._sets = {}
+        self._counters = {}
+
+    def values(self, path):
+        """Get the outputs of a path for all the events.
+
+        Args:
+            path (str): Indexed path expression.
+
+        Returns:
+            list: Outputs of the path.
+        """
+        return self.fields[path]
+
+    def set(self, path):
+        """Get the distinct outputs of a path, to check if a value is in any event in constant time.
+
+        Args:
+            path (str): Indexed path expression.
+
+        Returns:
+            frozenset: Distinct outputs of the path.
+        """
+        if path not in self._sets:
+            self._sets[path] = frozenset(self.fields[path])
+
+        return self._sets[path]
+
+    def counter(self, path):
+        """Get the number of events with each output of a path.
+
+        Args:
+            path (str): Indexed path expression.
+
+        Returns:
+            Counter: Occurrences of each output of the path.
+        """
+        if path not in self._counters:
+            self._counters[path] = Counter(self.fields[path])
+
+        return self._counters[path]
+
+    def missing(self, path, expected_values):
+        """Get the expected values that are not an output of a path for any event.
+
+        Args:
+            path (str): Indexed path expression.
+            expected_values (iterable): Values to look for.
+
+        Returns:
+            list: Values not found, in the order they were expected.
+        """
+        found = self.set(path)
+        return [value for value in expected_values if value not in found]
@@ -11,25 +11,39 @@ try:
 except ModuleNotFoundError:
     pass
 
+import atexit
+import codecs
+import ctypes
+import ctypes.util
+import functools
+import json
+import locale
 import os
 import queue
 import re
+import select
+import shlex
+import signal
 import socket
 import socketserver
 import ssl
+import subprocess
 import sys
 import threading
 import time
 import yaml
 
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
 from collections import defaultdict
 from copy import copy
 from datetime import datetime
-from multiprocessing import Process, Manager
+from multiprocessing import Process, Manager, Queue as ProcessQueue
 from struct import pack, unpack
-from lockfile import FileLock
 from wazuh_testing import logger
-from wazuh_testing.tools.file import truncate_file
 from wazuh_testing.tools.system import HostManager
 
 REMOTED_DETECTOR_PREFIX = r'.*wazuh-remoted.*'
@@ -42,6 +56,19 @@ WAZUH_DB_PREFIX = r'.*wazuh-db.*'
 
 DEFAULT_POLL_FILE_TIME = 1
 DEFAULT_WAIT_FILE_TIMEOUT = 30
+DEFAULT_TAIL_CHUNK_SIZE = 65536
+DEFAULT_SHARED_BUFFER_CAPACITY = 100000
+DEFAULT_MATCHER_CACHE_SIZE = 4096
+
+# inotify(7) event masks used by the event driven FileTailer
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
 
 def wazuh_unpack(data, format_: str = "<I"):
     """Unpack data with a given header. Using Wazuh header by default.
@@ -98,24 +125,98 @@ def _callback_default(line):
     return None
 
 
+class _InotifyWatcher:
+    """Wait for changes in one or more files using inotify through the libc bindings.
+
+    The parent directories are watched instead of the files themselves, so the watcher survives rotations and files
+    that do not exist yet. A pipe is also registered to be able to wake up the waiting thread on shutdown.
+
+    Args:
+        file_paths (str): Paths of the files to watch.
+
+    Raises:
+        OSError: If inotify is not available in the current platform.
+    """
+
+    def __init__(self, *file_paths):
+        if not sys.platform.startswith('linux'):
+            raise OSError(f'inotify is not available in {sys.platform}')
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        for directory in {os.path.dirname(os.path.abspath(file_path)) for file_path in file_paths}:
+            if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+                errno = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(errno, f'inotify_add_watch failed for {directory}')
+
+        self._wake_r, self._wake_w = os.pipe()
+
+    def wait(self, timeout):
+        """Block until there is a change in the watched directory, the watcher is woken up or the timeout expires.
+
+        Args:
+            timeout (float): Maximum time to wait, in seconds.
+        """
+        readable, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+        if self._fd in readable:
+            try:
+                # Drain the pending events, their content is not needed since the file is read anyway
+                while os.read(self._fd, DEFAULT_TAIL_CHUNK_SIZE):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def wake_up(self):
+        """Wake up any thread blocked in `wait`."""
+        os.write(self._wake_w, b'\x00')
+
+    def close(self):
+        """Release the inotify and pipe descriptors."""
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
 class FileTailer:
+    daemon = False
+
+    def __init__(self, file_path, encoding=None, time_step=0.5, event_driven=False,
+                 chunk_size=DEFAULT_TAIL_CHUNK_SIZE):
+        """Follow a file and put every new line in a queue.
 
-    def __init__(self, file_path, encoding=None, time_step=0.5):
+        Args:
+            file_path (str): Path of the file to follow.
+            encoding (str, optional): Encoding of the file. Default `None`
+            time_step (float, optional): Time to wait between reads when there are no new lines. Default `0.5`
+            event_driven (bool, optional): Wake up on inotify events and read the file in chunks, putting the new
+                lines in the queue in batches. It falls back to polling if inotify is not available. Default `False`
+            chunk_size (int, optional): Max number of bytes read at once in event driven mode. Default `65536`
+        """
         self.file_path = file_path
         self._position = 0
         self.time_step = time_step
+        self.event_driven = event_driven
+        self.chunk_size = chunk_size
         self._queue = Queue()
         self.event = threading.Event()
         self.thread = None
-        if sys.platform == 'win32':
-            self.encoding = None if encoding is None else encoding
-        elif encoding is None:
-            self.encoding = 'utf-8'
+        self._watcher = None
+        if encoding is not None:
+            self.encoding = encoding
+        else:
+            self.encoding = None if sys.platform == 'win32' else 'utf-8'
 
     def __copy__(self):
         new_tailer = FileTailer(self.file_path)
         for attr, value in vars(self).items():
-            if attr == 'file_path':
+            if attr in ('file_path', '_watcher'):
                 continue
             elif attr != '_queue':
                 setattr(new_tailer, attr, value)
@@ -132,17 +233,33 @@ class FileTailer:
     def add_item(self, item):
         self._queue.put(item)
 
+    def add_items(self, items):
+        self._queue.put_many(items)
+
     def start(self):
         self.run()
 
     def run(self):
         self.event = threading.Event()
-        self.thread = threading.Thread(target=self._tail_forever)
+        target = self._tail_forever
+        if self.event_driven:
+            try:
+                self._watcher = _InotifyWatcher(self.file_path)
+            except OSError as e:
+                logger.debug(f'Could not watch {self.file_path} with inotify, falling back to polling: {e}')
+                self._watcher = None
+            target = self._tail_chunks_forever
+        self.thread = threading.Thread(target=target, daemon=self.daemon)
         self.thread.start()
 
     def shutdown(self):
         self.event.set()
+        if self._watcher is not None:
+            self._watcher.wake_up()
         self.thread.join()
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
 
     def _tail_forever(self):
         """Wait for new lines to be appended to the file."""
@@ -157,11 +274,321 @@ class FileTailer:
                     self.add_item(line)
                 self._position = f.tell()
 
+    def _file_reset(self):
+        """Hook called when the followed file is truncated or rotated."""
+        pass
+
+    def _wait_for_changes(self):
+        """Block until the file may have changed or the tailer is shut down."""
+        if self._watcher is not None:
+            self._watcher.wait(self.time_step)
+        else:
+            self.event.wait(self.time_step)
+
+    def _decode_lines(self, data):
+        """Split a chunk of complete lines and decode them as the text mode reader would.
+
+        Args:
+            data (bytes): Raw content that ends with a line break.
+
+        Returns:
+            list(str): Decoded lines, each one of them ending with a line break.
+        """
+        encoding = self.encoding if self.encoding is not None else locale.getpreferredencoding(False)
+        text = data.decode(encoding, errors='backslashreplace')
+        if '\r' in text:
+            text = text.replace('\r\n', '\n')
+
+        return [f'{line}\n' for line in text.split('\n')[:-1]]
+
+    def _tail_chunks_forever(self):
+        """Wait for new content to be appended to the file and put the new lines in the queue in batches.
+
+        Incomplete lines are kept until their line break is written. If the file is truncated it is read again from
+        the beginning and if it is replaced (rotated), the new file is opened.
+        """
+        f = None
+        try:
+            while not self.event.is_set():
+                if f is None:
+                    try:
+                        f = open(self.file_path, 'rb')
+                    except FileNotFoundError:
+                        self._wait_for_changes()
+                        continue
+                    f.seek(self._position)
+
+                try:
+                    path_stat = os.stat(self.file_path)
+                except FileNotFoundError:
+                    path_stat = None
+                file_stat = os.fstat(f.fileno())
+
+                if file_stat.st_size < self._position:
+                    self._position = 0
+                    f.seek(0)
+                    self._file_reset()
+
+                data = f.read(self.chunk_size)
+                last_break = data.rfind(b'\n')
+                if last_break != -1:
+                    self.add_items(self._decode_lines(data[:last_break + 1]))
+                    self._position += last_break + 1
+                f.seek(self._position)
+
+                if len(data) == self.chunk_size:
+                    if last_break == -1:
+                        # A single line bigger than the chunk, read the whole line before splitting it
+                        self.chunk_size *= 2
+                    continue
+
+                if path_stat is not None and path_stat.st_ino != file_stat.st_ino:
+                    # The file has been rotated, everything left in the old one has already been read
+                    f.close()
+                    f = None
+                    self._position = 0
+                    self._file_reset()
+                    continue
+
+                self._wait_for_changes()
+        finally:
+            if f is not None:
+                f.close()
+
+
+class RingBuffer:
+    """Bounded buffer of lines that can be read by several cursors without consuming them.
+
+    Every item is identified by an absolute index that keeps growing. Only the last `capacity` items are kept, so
+    readers that fall behind skip the discarded ones.
+
+    Args:
+        capacity (int, optional): Max number of items kept in the buffer. Default `100000`
+    """
+
+    def __init__(self, capacity=DEFAULT_SHARED_BUFFER_CAPACITY):
+        self._capacity = capacity
+        self._items = [None] * capacity
+        self._start = 0
+        self._end = 0
+        self._condition = threading.Condition()
+
+    @property
+    def first_index(self):
+        """Absolute index of the oldest item that can still be read."""
+        return max(self._start, self._end - self._capacity)
+
+    @property
+    def end_index(self):
+        """Absolute index that the next item will have."""
+        return self._end
+
+    def put(self, item):
+        self.put_many([item])
+
+    def put_many(self, items):
+        """Append several items to the buffer and wake up the waiting readers.
+
+        Args:
+            items (list): Items to be appended, in order.
+        """
+        with self._condition:
+            for item in items:
+                self._items[self._end % self._capacity] = item
+                self._end += 1
+            self._condition.notify_all()
+
+    def reset(self):
+        """Discard the current content, so readers only get the items appended from now on."""
+        with self._condition:
+            self._start = self._end
+
+    def get_item(self, index, block=True, timeout=None):
+        """Get the item with the given absolute index, waiting for it if it has not been appended yet.
+
+        Args:
+            index (int): Absolute index of the item.
+            block (bool, optional): Wait for the item if it is not available. Default `True`
+            timeout (float, optional): Max time to wait for the item, `None` to wait forever. Default `None`
+
+        Returns:
+            tuple: The item and its index, which is greater than the requested one if that item was discarded.
+
+        Raises:
+            queue.Empty: If the item is not available within the timeout.
+        """
+        with self._condition:
+            if index >= self._end:
+                if not block:
+                    raise queue.Empty
+                if not self._condition.wait_for(lambda: index < self._end, timeout=timeout):
+                    raise queue.Empty
+            index = max(index, self.first_index)
+            if index >= self._end:
+                raise queue.Empty
+
+            return self._items[index % self._capacity], index
+
+    def cursor(self, index=None):
+        """Create a new reader of the buffer.
+
+        Args:
+            index (int, optional): Absolute index the cursor starts at. Default the oldest available item.
+
+        Returns:
+            BufferCursor: New cursor.
+        """
+        return BufferCursor(self, self.first_index if index is None else index)
+
+    def __repr__(self):
+        return str([self._items[i % self._capacity] for i in range(self.first_index, self._end)])
+
+
+class BufferCursor:
+    """Reader of a `RingBuffer` or a `Queue` with its own position. It exposes the `get` and `peek` methods used by
+    `QueueMonitor`, so it can be monitored like any other queue.
+
+    Args:
+        buffer (RingBuffer or Queue): Buffer to read.
+        index (int): Absolute index of the next item to read.
+    """
+
+    def __init__(self, buffer, index):
+        self._buffer = buffer
+        self._index = index
+
+    def __copy__(self):
+        return BufferCursor(self._buffer, self._index)
+
+    @property
+    def position(self):
+        return self._index
+
+    def get(self, block=True, timeout=None):
+        """Get the next item and move the cursor forward.
+
+        Raises:
+            queue.Empty: If there is no new item within the timeout.
+        """
+        item, index = self._buffer.get_item(self._index, block=block, timeout=timeout)
+        self._index = index + 1
+
+        return item
+
+    def peek(self, *args, position=0, **kwargs):
+        """Get the item `position` places after the cursor without moving it.
+
+        Raises:
+            queue.Empty: If there is no such item within the timeout.
+        """
+        return self._buffer.get_item(self._index + position, *args, **kwargs)[0]
+
+
+class SharedFileTailer(FileTailer):
+    """Event driven tailer that keeps the lines of a file in a `RingBuffer`, so any number of monitors can read them
+    through their own cursors.
+
+    Use `get_shared_tailer` to get the instance of a file instead of creating a new one.
+    """
+    daemon = True
+
+    def __init__(self, file_path, encoding=None, time_step=0.5, capacity=DEFAULT_SHARED_BUFFER_CAPACITY):
+        super().__init__(file_path, encoding=encoding, time_step=time_step, event_driven=True)
+        self._queue = RingBuffer(capacity)
+
+    def __copy__(self):
+        raise TypeError('Shared tailers can not be copied, use subscribe to get a new cursor')
+
+    def subscribe(self):
+        """Get a new cursor that reads the file from the oldest line available.
+
+        Returns:
+            BufferCursor: New cursor.
+        """
+        return self._queue.cursor()
+
+    def _file_reset(self):
+        self._queue.reset()
+
+
+_shared_tailers = {}
+_shared_tailers_lock = threading.Lock()
+
+
+def get_shared_tailer(file_path, encoding=None, time_step=0.5, capacity=DEFAULT_SHARED_BUFFER_CAPACITY):
+    """Get the tailer shared by the whole process for a file, starting it if needed.
+
+    The encoding, time step and capacity are only used when the tailer is created.
+
+    Args:
+        file_path (str): Path of the file to follow.
+        encoding (str, optional): Encoding of the file. Default `None`
+        time_step (float, optional): Time to wait between reads if inotify is not available. Default `0.5`
+        capacity (int, optional): Max number of lines kept in memory. Default `100000`
+
+    Returns:
+        SharedFileTailer: Running tailer of the file.
+    """
+    path = os.path.realpath(file_path)
+    with _shared_tailers_lock:
+        if path not in _shared_tailers:
+            tailer = SharedFileTailer(path, encoding=encoding, time_step=time_step, capacity=capacity)
+            tailer.start()
+            _shared_tailers[path] = tailer
+
+        return _shared_tailers[path]
+
+
+@atexit.register
+def shutdown_shared_tailers():
+    """Stop all the shared tailers."""
+    with _shared_tailers_lock:
+        for tailer in _shared_tailers.values():
+            tailer.shutdown()
+        _shared_tailers.clear()
+
+
+def _get_required_literal(pattern):
+    """Get the longest substring that every string matched by a regular expression must contain.
+
+    Only the literals that are not inside optional, repeated or alternative parts of the pattern are considered.
+
+    Args:
+        pattern (str): Regular expression.
+
+    Returns:
+        str: Required substring or `None` if the pattern does not have any or it is case insensitive.
+    """
+    try:
+        if re.compile(pattern).flags & re.IGNORECASE:
+            return None
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+
+    runs = ['']
+
+    def walk(items):
+        for op, av in items:
+            if op is sre_parse.LITERAL:
+                runs[-1] += chr(av)
+            elif op is sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+                walk(av[-1])
+            elif op is not sre_parse.AT:
+                runs.append('')
+
+    walk(parsed)
+    literal = max(runs, key=len)
+
+    return literal if literal else None
+
 
 def make_callback(pattern, prefix="wazuh", escape=False):
     """
     Creates a callback function from a text pattern.
 
+    Lines that do not contain the literal text required by the pattern are discarded before running the regex.
+
     Args:
         pattern (str): String to match on the log
         prefix  (str): String prefix (modulesd, remoted, ...)
@@ -176,19 +603,184 @@ def make_callback(pattern, prefix="wazuh", escape=False):
 
     full_pattern = pattern if prefix is None else fr'{prefix}{pattern}'
     regex = re.compile(full_pattern)
+    literal = _get_required_literal(full_pattern)
+
+    if literal is None:
+        return lambda line: regex.match(line.decode() if isinstance(line, bytes) else line) is not None
+
+    def callback(line):
+        line = line.decode() if isinstance(line, bytes) else line
+        return literal in line and regex.match(line) is not None
+
+    return callback
+
+
+class PatternMatcher:
+    """Match lines against several registered patterns in a single pass.
+
+    Every pattern is compiled once and lines that do not contain the literal text required by a pattern are discarded
+    with a substring check before running its regex. Patterns with the same regex are only matched once per line. The
+    matches of the last lines are cached, so several monitors reading the same stream with the same matcher only run
+    the regexes once per line. JSON documents are decoded on every call, so each caller gets its own copy.
+
+    Args:
+        cache_size (int, optional): Number of lines whose results are cached. Default `4096`
+    """
+
+    def __init__(self, cache_size=DEFAULT_MATCHER_CACHE_SIZE):
+        self._regexes = {}
+        self._patterns = {}
+        self._match_line = functools.lru_cache(maxsize=cache_size)(self._match_line)
+
+    def add_pattern(self, name, pattern, prefix=None, json_group=None, literal=None):
+        """Register a new pattern.
+
+        Args:
+            name (str): Name used to get the results of the pattern.
+            pattern (str): Regular expression that the line must match from its beginning.
+            prefix (str, optional): Regular expression prepended to the pattern. Default `None`
+            json_group (int or str, optional): Group of the match that contains a JSON document. If set, the result
+                is the decoded document instead of the match object. Default `None`
+            literal (str, optional): Substring that every matching line contains. Default it is extracted from the
+                pattern.
+        """
+        full_pattern = pattern if prefix is None else f'{prefix}{pattern}'
+        if full_pattern not in self._regexes:
+            self._regexes[full_pattern] = (re.compile(full_pattern),
+                                           literal if literal is not None else _get_required_literal(full_pattern))
+        self._patterns[name] = (full_pattern, json_group)
+        self._match_line.cache_clear()
+
+    def add_patterns(self, patterns):
+        """Register several patterns at once.
+
+        Args:
+            patterns (dict): Names as keys and `add_pattern` keyword arguments, or the pattern itself, as values.
+        """
+        for name, pattern in patterns.items():
+            if isinstance(pattern, dict):
+                self.add_pattern(name, **pattern)
+            else:
+                self.add_pattern(name, pattern)
+
+    def match(self, line):
+        """Get the results of every pattern that matches the line.
+
+        Args:
+            line (str or bytes): Line to check.
 
-    return lambda line: regex.match(line.decode() if isinstance(line, bytes) else line) is not None
+        Returns:
+            dict: Names of the matched patterns as keys and their match object or decoded JSON as values.
+        """
+        results = {}
+        documents = {}
+        for name, (match, json_group) in self._match_line(line.decode() if isinstance(line, bytes) else line).items():
+            if json_group is None:
+                results[name] = match
+                continue
+            raw_document = match.group(json_group)
+            if raw_document not in documents:
+                documents[raw_document] = self._load_document(raw_document)
+            if documents[raw_document] is not None:
+                results[name] = documents[raw_document]
+
+        return results
+
+    @staticmethod
+    def _load_document(raw_document):
+        try:
+            return json.loads(raw_document)
+        except (json.JSONDecodeError, TypeError) as e:
+            logger.warning(f"Couldn't load a log line into json object. Reason {e}")
+            return None
+
+    def _match_line(self, line):
+        literals = {}
+        matches = {}
+        results = {}
+
+        for name, (full_pattern, json_group) in self._patterns.items():
+            if full_pattern not in matches:
+                regex, literal = self._regexes[full_pattern]
+                if literal is not None and literal not in literals:
+                    literals[literal] = literal in line
+                matches[full_pattern] = regex.match(line) if literal is None or literals[literal] else None
+
+            match = matches[full_pattern]
+            if match is not None:
+                results[name] = (match, json_group)
+
+        return results
+
+    def callback(self, name):
+        """Create a `QueueMonitor` callback that returns the result of a pattern.
+
+        Args:
+            name (str): Name of the pattern.
+
+        Returns:
+            callable: Callback that returns the match object or the decoded JSON if the line matches, `None` otherwise.
+        """
+        def callback(line):
+            matches = self._match_line(line.decode() if isinstance(line, bytes) else line)
+            match, json_group = matches.get(name, (None, None))
+            if match is None or json_group is None:
+                return match
+            return self._load_document(match.group(json_group))
+
+        return callback
+
+
+def _same_encoding(encoding, other_encoding):
+    """Check if two encoding names are the same codec, where `None` is the preferred encoding of the system."""
+    def codec_name(name):
+        return codecs.lookup(locale.getpreferredencoding(False) if name is None else name).name
+
+    return codec_name(encoding) == codec_name(other_encoding)
 
 
 class FileMonitor:
-    def __init__(self, file_path, time_step=0.5):
-        self.tailer = FileTailer(file_path, time_step=time_step)
+    def __init__(self, file_path, time_step=0.5, event_driven=False, shared=False, encoding=None):
+        """Create a new instance to monitor a file.
+
+        Args:
+            file_path (str): Path of the file to monitor.
+            time_step (float, optional): Fraction of time to wait in every get. Default `0.5`
+            event_driven (bool, optional): Use an event driven tailer. Default `False`
+            shared (bool, optional): Read the lines from the tailer shared by every monitor of the file in this
+                process instead of tailing the file on its own. Default `False`
+            encoding (str, optional): Encoding of the file, used if the shared tailer is created by this monitor.
+                Default `None`
+        """
+        self.tailer = None
+        self.cursor = None
+        self._shared_tailer = None
+        if shared:
+            self._shared_tailer = get_shared_tailer(file_path, encoding=encoding, time_step=time_step)
+            self.cursor = self._shared_tailer.subscribe()
+        else:
+            self.tailer = FileTailer(file_path, time_step=time_step, event_driven=event_driven)
         self._result = None
         self._time_step = time_step
 
     def start(self, timeout=-1, callback=_callback_default, accum_results=1, update_position=True, timeout_extra=0,
               error_message='', encoding=None):
-        """Start the file monitoring until the stop method is called."""
+        """Start the file monitoring until the stop method is called.
+
+        Raises:
+            ValueError: If the monitor reads from a shared tailer and the encoding is not the one of that tailer.
+        """
+        if self.cursor is not None:
+            if encoding is not None and not _same_encoding(encoding, self._shared_tailer.encoding):
+                raise ValueError(f"The shared tailer of {self._shared_tailer.file_path} decodes it as "
+                                 f"{self._shared_tailer.encoding}, it can not be read as {encoding}")
+            cursor = self.cursor if update_position else copy(self.cursor)
+            monitor = QueueMonitor(cursor, time_step=self._time_step)
+            self._result = monitor.start(timeout=timeout, callback=callback, accum_results=accum_results,
+                                         update_position=True, timeout_extra=timeout_extra,
+                                         error_message=error_message).result()
+            return self
+
         try:
             tailer = self.tailer if update_position else copy(self.tailer)
 
@@ -412,6 +1004,7 @@ class QueueMonitor:
         timer = 0.0
         time_wait = 0.1
         position = 0
+        cursor = self._queue.cursor() if not update_position and hasattr(self._queue, 'cursor') else None
         extra_timer_is_running = False
         extra_timer = 0.0
         while len(result_list) != accum_results or extra_timer_is_running:
@@ -425,6 +1018,8 @@ class QueueMonitor:
             try:
                 if update_position:
                     msg = self._queue.get(block=True, timeout=self._time_step)
+                elif cursor is not None:
+                    msg = cursor.get(block=True, timeout=self._time_step)
                 else:
                     msg = self._queue.peek(position=position, block=True, timeout=self._time_step)
                     position += 1
@@ -493,22 +1088,128 @@ class QueueMonitor:
 
 
 class Queue(queue.Queue):
-    def peek(self, *args, position=0, **kwargs):
+    """Queue that also allows reading its items without removing them.
+
+    Every item keeps the same absolute index while it is in the queue, so readers created with `cursor` keep their
+    position even if other consumers pop items with `get`. The items are kept in a list, so any of them is read in
+    constant time, and the popped ones are dropped from its head in batches.
+    """
+
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self._first_index = 0
+
+    def _init(self, maxsize):
+        self._items = []
+        self._head = 0
+
+    def _qsize(self):
+        return len(self._items) - self._head
+
+    @property
+    def queue(self):
+        """list: Items in the queue, in order."""
+        return self._items[self._head:]
+
+    @queue.setter
+    def queue(self, items):
+        self._items = list(items)
+        self._head = 0
+
+    def _put(self, item):
+        self._items.append(item)
+        # Several readers can be waiting for different positions, wake all of them
+        self.not_empty.notify_all()
+
+    def _get(self):
+        item = self._items[self._head]
+        self._items[self._head] = None
+        self._head += 1
+        self._first_index += 1
+        # Compact the list once half of it are popped items, so each pop is amortized constant time
+        if self._head >= 1024 and self._head * 2 >= len(self._items):
+            del self._items[:self._head]
+            self._head = 0
+
+        return item
+
+    def _wait_for_index(self, index, block, timeout):
+        """Wait until the item with the given absolute index is in the queue. The mutex must be held.
+
+        Raises:
+            queue.Empty: If the item is not available within the timeout.
+        """
+        if max(index, self._first_index) < self._first_index + self._qsize():
+            return
+        if not block or not self.not_empty.wait_for(
+                lambda: max(index, self._first_index) < self._first_index + self._qsize(), timeout=timeout):
+            raise queue.Empty
+
+    def peek(self, block=True, timeout=None, position=0):
         """Peek any given position without modifying the queue status.
 
         The difference between `peek` and `get` is `get` pops the item and `peek` does not.
 
         Args:
+            block (bool, optional): Wait for the position to be filled if the queue is shorter. Default `True`
+            timeout (float, optional): Max time to wait, `None` to wait forever. Default `None`
             position (int, optional) : Element of the queue to return. Default `0`
 
         Returns:
             (any): Any item in the given position.
+
+        Raises:
+            queue.Empty: If there is no item in that position within the timeout.
+        """
+        with self.not_empty:
+            self._wait_for_index(self._first_index + position, block, timeout)
+            return self._items[self._head + position]
+
+    def get_item(self, index, block=True, timeout=None):
+        """Get the item with the given absolute index without removing it, waiting for it if needed.
+
+        Args:
+            index (int): Absolute index of the item.
+            block (bool, optional): Wait for the item if it is not available. Default `True`
+            timeout (float, optional): Max time to wait for the item, `None` to wait forever. Default `None`
+
+        Returns:
+            tuple: The item and its index, which is greater than the requested one if that item was already popped.
+
+        Raises:
+            queue.Empty: If the item is not available within the timeout.
+        """
+        with self.not_empty:
+            self._wait_for_index(index, block, timeout)
+            index = max(index, self._first_index)
+            return self._items[self._head + index - self._first_index], index
+
+    def cursor(self, index=None):
+        """Create a reader that walks the queue without removing its items.
+
+        Args:
+            index (int, optional): Absolute index the cursor starts at. Default the first item of the queue.
+
+        Returns:
+            BufferCursor: New cursor.
         """
-        aux_queue = queue.Queue()
-        aux_queue.queue = copy(self.queue)
-        for _ in range(position):
-            aux_queue.get(*args, **kwargs)
-        return aux_queue.get(*args, **kwargs)
+        return BufferCursor(self, self._first_index if index is None else index)
+
+    def put_many(self, items):
+        """Put several items in the queue acquiring its lock only once.
+
+        Args:
+            items (list): Items to be appended to the queue, in order.
+        """
+        if self.maxsize > 0:
+            for item in items:
+                self.put(item)
+            return
+
+        with self.not_full:
+            self._items.extend(items)
+            self.unfinished_tasks += len(items)
+            self.not_empty.notify_all()
 
     def __repr__(self):
         """Returns the object representation in string format.
@@ -852,6 +1553,86 @@ def generate_monitoring_callback(regex):
     return new_callback
 
 
+class RemoteFileTailer:
+    """Read the lines appended to a file of a remote host, fetching only the bytes written since the previous read.
+
+    The byte offset and inode of the file are kept between reads, so a file that is rotated (new inode) or truncated
+    (smaller than the offset) is read again from the beginning.
+
+    Args:
+        host_manager (HostManager): Manager of the remote host.
+        host (str): Hostname.
+        path (str): Path of the file in the host.
+        max_bytes (int, optional): Maximum bytes fetched by each remote call. Default `4 MiB`
+        from_end (bool, optional): Skip the current content of the file. Default `False`
+        offset (int, optional): Bytes of the file already read by other means, ignored if `from_end` is set.
+            Default `0`
+
+    Attributes:
+        host (str): Hostname.
+        path (str): Path of the file in the host.
+        offset (int): Bytes of the file already read.
+        inode (str): Inode of the file read, None if it has not been read yet.
+    """
+    _END_MARK = '<<wazuh-testing-eof>>'
+
+    def __init__(self, host_manager, host, path, max_bytes=4 * 1024 * 1024, from_end=False, offset=0):
+        self.host_manager = host_manager
+        self.host = host
+        self.path = path
+        self.max_bytes = max_bytes
+        self.offset = 0 if from_end else offset
+        self.inode = None
+        self._from_end = from_end
+        self._partial_line = ''
+
+    def _read_command(self):
+        path = shlex.quote(self.path)
+        # Start from the end of the file in the first read if requested, and from the beginning if it was replaced
+        start = '$2' if self._from_end and self.inode is None else self.offset
+        # The file can only be known to be replaced once its inode has been read
+        replaced = f"[ \"$1\" != '{self.inode}' ] && [ {self.offset} -gt 0 ] || " if self.inode is not None else ''
+        return (f"info=$(stat -Lc '%i %s' {path} 2>/dev/null) || {{ printf '%s' '{self._END_MARK}'; exit 0; }}; "
+                f"set -- $info; start={start}; "
+                f"if {replaced}[ \"$2\" -lt $start ]; then start=0; fi; "
+                f"size=$(($2 - start)); if [ $size -gt {self.max_bytes} ]; then size={self.max_bytes}; fi; "
+                f"echo \"$1 $start $size\"; tail -c +$((start + 1)) {path} | head -c $size; "
+                f"printf '%s' '{self._END_MARK}'")
+
+    def read_lines(self):
+        """Fetch the new complete lines of the file.
+
+        Returns:
+            list: New lines, with their line break. Empty if there are no new lines or the file does not exist.
+
+        Raises:
+            RuntimeError: If the output of the remote command is not complete.
+        """
+        lines = []
+        while True:
+            output = self.host_manager.run_shell(self.host, self._read_command())
+            end = output.rfind(self._END_MARK)
+            if end == -1:
+                raise RuntimeError(f"Could not read {self.path} from {self.host}: {output}")
+            header, _, data = output[:end].partition('\n')
+            if not header:
+                return lines
+
+            inode, start, size = header.split()
+            start, size = int(start), int(size)
+            if start != self.offset and not (self._from_end and self.inode is None):
+                logger.debug(f"{self.path} of {self.host} was rotated or truncated, reading it from the beginning")
+                self._partial_line = ''
+            self.inode, self.offset = inode, start + size
+
+            new_lines = (self._partial_line + data).split('\n')
+            self._partial_line = new_lines.pop()
+            lines.extend(f"{line}\n" for line in new_lines if line)
+
+            if size < self.max_bytes:
+                return lines
+
+
 class HostMonitor:
     """This class has the capability to monitor remote host. This monitoring consists of reading the specified files to
     check that the expected message arrives to them.
@@ -863,7 +1644,7 @@ class HostMonitor:
     custom error message.
     """
 
-    def __init__(self, inventory_path, messages_path, tmp_path, time_step=0.5):
+    def __init__(self, inventory_path, messages_path, tmp_path, time_step=0.5, streaming=False):
         """Create a new instance to monitor any given file in any specified host.
 
         Args:
@@ -871,11 +1652,14 @@ class HostMonitor:
             messages_path (str):  Path to the file where the callbacks, paths and hosts to be monitored are specified.
             tmp_path (str): Path to the temporal files.
             time_step (float, optional): Fraction of time to wait in every get. Defaults to `0.5`
+            streaming (bool, optional): Follow the files of each host with a single `tail -F` running in the host
+                instead of fetching their new bytes every `time_step`. Defaults to `False`
         """
         self.host_manager = HostManager(inventory_path=inventory_path)
         self._queue = Manager().Queue()
         self._result = defaultdict(list)
         self._time_step = time_step
+        self._streaming = streaming
         self._file_monitors = list()
         self._file_content_collectors = list()
         self._tmp_path = tmp_path
@@ -888,18 +1672,18 @@ class HostMonitor:
 
     def run(self):
         """This method creates and destroy the needed processes for the messages founded in messages_path.
-        It creates one file composer (process) for every file to be monitored in every host."""
+        It creates one file composer (process) for every host, that feeds the monitors of each of its files."""
         for host, payload in self.test_cases.items():
             monitored_files = {case['path'] for case in payload}
             if len(monitored_files) == 0:
                 raise AttributeError('There is no path to monitor. Exiting...')
+            lines_queues = {path: ProcessQueue() for path in monitored_files}
+            self._file_content_collectors.append(self.file_composer(host=host, lines_queues=lines_queues))
+            logger.debug(f'Add new file composer process for {host} and paths: {monitored_files}')
             for path in monitored_files:
-                output_path = f'{host}_{path.split("/")[-1]}.tmp'
-                self._file_content_collectors.append(self.file_composer(host=host, path=path, output_path=output_path))
-                logger.debug(f'Add new file composer process for {host} and path: {path}')
                 self._file_monitors.append(self._start(host=host,
                                                        payload=[block for block in payload if block["path"] == path],
-                                                       path=output_path))
+                                                       lines_queue=lines_queues[path]))
                 logger.debug(f'Add new file monitor process for {host} and path: {path}')
 
         while True:
@@ -909,61 +1693,105 @@ class HostMonitor:
                 for file_collector in self._file_content_collectors:
                     file_collector.terminate()
                     file_collector.join()
-                self.clean_tmp_files()
                 break
             time.sleep(self._time_step)
         self.check_result()
 
     @new_process
-    def file_composer(self, host, path, output_path):
-        """Collects the file content of the specified path in the desired host and append it to the output_path file.
-        Simulates the behavior of tail -f and redirect the output to output_path.
+    def file_composer(self, host, lines_queues):
+        """Collect the new lines of the specified paths in the desired host and put them in the queue of each path.
+        Simulates the behavior of tail -F, fetching only the bytes added to the files since the previous read.
 
         Args:
             host (str): Hostname.
-            path (str): Host file path to be collect.
-            output_path (str): Output path of the content collected from the remote host path.
+            lines_queues (dict): Queue where the batches of new lines of each host path are put.
         """
-        try:
-            truncate_file(os.path.join(self._tmp_path, output_path))
-        except FileNotFoundError:
-            pass
-        logger.debug(f'Starting file composer for {host} and path: {path}. '
-                     f'Composite file in {os.path.join(self._tmp_path, output_path)}')
-        tmp_file = os.path.join(self._tmp_path, output_path)
+        logger.debug(f'Starting file composer for {host} and paths: {list(lines_queues)}')
+        # Bytes of each file already put in its queue, the fetching goes on from there if the streaming stops
+        offsets = dict.fromkeys(lines_queues, 0)
+        if self._streaming:
+            try:
+                self._stream_files(host, lines_queues, offsets)
+            except (OSError, ValueError) as e:
+                logger.warning(f'Could not follow the files of {host} ({e}), fetching their new lines instead')
+            else:
+                logger.warning(f'Stopped following the files of {host}, fetching their new lines instead')
+
+        tailers = [RemoteFileTailer(self.host_manager, host, path, offset=offsets[path]) for path in lines_queues]
         while True:
-            with FileLock(tmp_file):
-                with open(tmp_file, "r+") as file:
-                    content = self.host_manager.get_file_content(host, path).split('\n')
-                    file_content = file.read().split('\n')
-                    for new_line in content:
-                        if new_line == '':
-                            continue
-                        if new_line not in file_content:
-                            file.write(f'{new_line}\n')
-                time.sleep(self._time_step)
+            for tailer in tailers:
+                lines = tailer.read_lines()
+                if lines:
+                    lines_queues[tailer.path].put(lines)
+            time.sleep(self._time_step)
+
+    def _stream_files(self, host, lines_queues, offsets):
+        """Follow the files of a host with a `tail -F` running in it, until it ends.
+
+        Args:
+            host (str): Hostname.
+            lines_queues (dict): Queue where the batches of new lines of each host path are put.
+            offsets (dict): Bytes of each path put in its queue, updated with the lines streamed.
+        """
+        paths = ' '.join(shlex.quote(path) for path in lines_queues)
+        command_line = self.host_manager.get_command_line(host, f"tail -v -n +1 -F {paths}")
+        tail = subprocess.Popen(command_line, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        # The file composer is terminated with SIGTERM, exit through the finally clause to stop tail too
+        signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+        try:
+            current_path = None
+            # tail prints an empty line before every header but the first one, so an empty line only belongs to the
+            # file if it is not followed by a header
+            pending_empty_line = False
+            for raw_line in tail.stdout:
+                line = raw_line.decode('utf-8', errors='replace')
+                # tail prints a '==> path <==' header each time the file of the next lines changes
+                if line.startswith('==> ') and line.endswith(' <==\n') and line[4:-5] in lines_queues:
+                    current_path = line[4:-5]
+                    pending_empty_line = False
+                elif current_path is not None:
+                    offsets[current_path] += pending_empty_line
+                    pending_empty_line = line == '\n'
+                    if not pending_empty_line:
+                        offsets[current_path] += len(raw_line)
+                        if line.strip('\n'):
+                            lines_queues[current_path].put([line if line.endswith('\n') else f"{line}\n"])
+            if current_path is not None:
+                offsets[current_path] += pending_empty_line
+        finally:
+            tail.kill()
+            tail.wait()
 
     @new_process
-    def _start(self, host, payload, path, encoding=None, error_messages_per_host=None):
+    def _start(self, host, payload, lines_queue, encoding=None, error_messages_per_host=None):
         """Start the file monitoring until the QueueMonitor returns an string or TimeoutError.
 
         Args:
             host (str): Hostname
             payload (list,dict): Contains the message to be found and the timeout for it.
-            path (str): Path where it must search for the message.
+            lines_queue (multiprocessing.Queue): Queue where the file composer puts the batches of new lines.
             encoding (str): Encoding of the file.
             error_messages_per_host (dict): Dictionary with hostnames as keys and desired error messages as values
         Returns:
             Instance of HostMonitor
         """
-        tailer = FileTailer(os.path.join(self._tmp_path, path), time_step=self._time_step)
+        lines = Queue()
+        stop_event = threading.Event()
+
+        def collect_lines():
+            while not stop_event.is_set():
+                try:
+                    for line in lines_queue.get(timeout=self._time_step):
+                        lines.put(line)
+                except queue.Empty:
+                    pass
+
+        collector = threading.Thread(target=collect_lines, daemon=True)
+        collector.start()
         try:
-            if encoding is not None:
-                tailer.encoding = encoding
-            tailer.start()
             for case in payload:
                 logger.debug(f'Starting QueueMonitor for {host} and message: {case["regex"]}')
-                monitor = QueueMonitor(tailer.queue, time_step=self._time_step)
+                monitor = QueueMonitor(lines, time_step=self._time_step)
                 try:
                     self._queue.put({host: monitor.start(timeout=case['timeout'],
                                                          callback=generate_monitoring_callback(case['regex']),
@@ -977,7 +1805,8 @@ class HostMonitor:
                             host: TimeoutError(f'Did not found the expected callback in {host}: {case["regex"]}')})
                 logger.debug(f'Finishing QueueMonitor for {host} and message: {case["regex"]}')
         finally:
-            tailer.shutdown()
+            stop_event.set()
+            collector.join()
 
         return self
 
@@ -3,16 +3,18 @@
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import csv
+import gzip
+import json
 import logging
 from abc import ABC, abstractmethod
 from datetime import datetime
-from os import makedirs
-from os.path import join, isfile
+from os import makedirs, stat
+from os.path import basename, join, isfile
 from re import compile
 from sys import platform
 from tempfile import gettempdir
-from threading import Thread, Event
-from time import sleep
+from threading import Thread, Event, Lock, current_thread
+from time import monotonic, sleep
 
 import psutil
 
@@ -30,6 +32,9 @@ class Monitor:
         time_step (int, optional): time between each scan in seconds. Defaults to 1 second.
         version (str, optional): version of the binary. Defaults to None.
         dst_dir (str, optional): directory to store the CSVs. Defaults to temp directory.
+        full_memory_step (int, optional): time between each scan of the USS, PSS and SWAP in seconds. These values
+            require walking the memory maps of the process, so they can be collected less often than the rest.
+            Defaults to None (every scan).
 
     Attributes:
         process_name (str): name of the process to monitor.
@@ -39,10 +44,12 @@ class Monitor:
         dst_dir (str): directory to store the CSVs. Defaults to temp directory.
         pid (int): PID of the process.
         event (thread.Event): thread Event used to control the scans.
-        thread (thread): thread to scan the data.
+        thread (thread): thread to scan the data. None if the scans are driven by a `MonitorSampler`.
         csv_file (str): path to the CSV file.
+        full_memory_step (int): time between each scan of the USS, PSS and SWAP in seconds.
     """
-    def __init__(self, process_name, pid, value_unit='KB', time_step=1, version=None, dst_dir=gettempdir()):
+    def __init__(self, process_name, pid, value_unit='KB', time_step=1, version=None, dst_dir=gettempdir(),
+                 full_memory_step=None):
         self.process_name = process_name
         self.value_unit = value_unit
         self.time_step = time_step
@@ -52,12 +59,18 @@ class Monitor:
         self.dst_dir = dst_dir
         self.pid = pid
         self.proc = None
-        self.event = None
+        self.event = Event()
         self.thread = None
         self.previous_read = None
         self.previous_write = None
+        self.full_memory_step = full_memory_step
+        self.full_memory = None
+        self.full_memory_timestamp = None
         self.set_process()
         self.csv_file = join(self.dst_dir, f'{self.process_name}.csv')
+        self.csv_lock = Lock()
+        self._csv = None
+        self._csv_writer = None
 
     @classmethod
     def get_process_pids(cls, process_name, check_children=True) -> list:
@@ -148,12 +161,19 @@ class Monitor:
         try:
             with proc.oneshot():
                 info['CPU(%)'] = proc.cpu_percent(interval=None)
-                memory_data = proc.memory_full_info()
+                if self._full_memory_due():
+                    memory_data = proc.memory_full_info()
+                    self.full_memory = (memory_data.uss, memory_data.pss, memory_data.swap)
+                    self.full_memory_timestamp = monotonic()
+                else:
+                    # Only the cheap counters of /proc/<pid>/statm, the rest are kept from the last full scan
+                    memory_data = proc.memory_info()
+                uss, pss, swap = self.full_memory
                 info[f'VMS({self.value_unit})'] = unit_conversion(memory_data.vms)
                 info[f'RSS({self.value_unit})'] = unit_conversion(memory_data.rss)
-                info[f'USS({self.value_unit})'] = unit_conversion(memory_data.uss)
-                info[f'PSS({self.value_unit})'] = unit_conversion(memory_data.pss)
-                info[f'SWAP({self.value_unit})'] = unit_conversion(memory_data.swap)
+                info[f'USS({self.value_unit})'] = unit_conversion(uss)
+                info[f'PSS({self.value_unit})'] = unit_conversion(pss)
+                info[f'SWAP({self.value_unit})'] = unit_conversion(swap)
                 info['FD'] = proc.num_fds()
 
                 if self.platform == 'linux' or platform == "win32":
@@ -180,33 +200,64 @@ class Monitor:
             logger.debug(f'Recollected data for process {self.pid}')
             return info
 
+    def _full_memory_due(self):
+        """Check if the USS, PSS and SWAP have to be collected in this scan."""
+        return self.full_memory is None or not self.full_memory_step or \
+            monotonic() - self.full_memory_timestamp >= self.full_memory_step
+
     def _write_csv(self, data):
-        """Write the collected data in a CSV file.
+        """Write the collected data in the CSV file.
+
+        The file is kept open and the rows are buffered until `flush` is called.
 
         Args:
             data (dict): dictionary containing the data collected from the process.
         """
-        header = not isfile(self.csv_file)
-        with open(self.csv_file, 'a', newline='') as f:
-            csv_writer = csv.writer(f)
-            if header:
-                csv_writer.writerow(list(data))
-
-            csv_writer.writerow(list(data.values()))
+        with self.csv_lock:
+            if self._csv is None:
+                header = not isfile(self.csv_file)
+                self._csv = open(self.csv_file, 'a', newline='')
+                self._csv_writer = csv.writer(self._csv)
+                if header:
+                    self._csv_writer.writerow(list(data))
+
+            self._csv_writer.writerow(list(data.values()))
         logger.debug(f'Added new entry in {self.csv_file}')
 
+    def flush(self):
+        """Write the buffered rows to the CSV file."""
+        with self.csv_lock:
+            if self._csv is not None:
+                self._csv.flush()
+
+    def close(self):
+        """Write the buffered rows and close the CSV file."""
+        with self.csv_lock:
+            if self._csv is not None:
+                self._csv.close()
+                self._csv = None
+                self._csv_writer = None
+
+    def sample(self):
+        """Collect the data of the process and add it to the CSV file."""
+        data = dict()
+        try:
+            data = self.get_process_info(self.proc)
+        except Exception as e:
+            logger.error(f'Exception with {self.process_name} | {e}')
+        finally:
+            if data:
+                self._write_csv(data)
+
     def _monitor_process(self):
         """Private function that runs the function to extract data."""
-        while not self.event.is_set():
-            data = dict()
-            try:
-                data = self.get_process_info(self.proc)
-            except Exception as e:
-                logger.error(f'Exception with {self.process_name} | {e}')
-                print(e.with_traceback())
-            finally:
-                self._write_csv(data)
-            sleep(self.time_step)
+        try:
+            while not self.event.is_set():
+                self.sample()
+                self.flush()
+                sleep(self.time_step)
+        finally:
+            self.close()
 
     def run(self):
         """Run the event and thread monitoring functions."""
@@ -222,39 +273,225 @@ class Monitor:
     def shutdown(self):
         """Stop all the monitoring threads."""
         self.event.set()
-        self.thread.join()
+        if self.thread is None:
+            self.close()
+        elif self.thread is not current_thread():
+            self.thread.join()
+
+
+class MonitorSampler:
+    """Class to scan a group of monitors from a single thread.
+
+    Instead of having a thread per process, every interval the sampler scans all its monitors one after the other and
+    flushes their CSVs every `flush_step` seconds, so the monitoring perturbs less the processes being measured.
+
+    Args:
+        time_step (int, optional): time between each scan in seconds. Defaults to 1 second.
+        flush_step (int, optional): time between each flush of the CSVs in seconds. Defaults to 10 seconds.
+
+    Attributes:
+        time_step (int): time between each scan in seconds.
+        flush_step (int): time between each flush of the CSVs in seconds.
+        monitors (list): monitors scanned by the sampler.
+        event (thread.Event): thread Event used to control the scans.
+        thread (thread): thread to scan the data.
+    """
+    def __init__(self, time_step=1, flush_step=10):
+        self.time_step = time_step
+        self.flush_step = flush_step
+        self.monitors = []
+        self.lock = Lock()
+        self.event = Event()
+        self.thread = None
+
+    def add_monitor(self, monitor):
+        """Add a monitor to the sampler.
+
+        Args:
+            monitor (Monitor): monitor to be scanned.
+        """
+        monitor.event = Event()
+        with self.lock:
+            self.monitors.append(monitor)
+        logger.info(f'Started monitoring process {monitor.process_name} ({monitor.pid})')
+
+    def remove_monitor(self, monitor):
+        """Remove a monitor from the sampler and close its CSV.
+
+        Args:
+            monitor (Monitor): monitor to remove.
+        """
+        with self.lock:
+            if monitor in self.monitors:
+                self.monitors.remove(monitor)
+        monitor.close()
+
+    def _sample_monitors(self):
+        """Private function that scans all the monitors every interval."""
+        next_scan = monotonic()
+        next_flush = next_scan + self.flush_step
+        try:
+            while not self.event.is_set():
+                with self.lock:
+                    monitors = list(self.monitors)
+
+                for monitor in monitors:
+                    if not monitor.event.is_set():
+                        monitor.sample()
+                    if monitor.event.is_set():
+                        # The process is lost, keep its monitor out of the sampler
+                        self.remove_monitor(monitor)
+
+                if monotonic() >= next_flush:
+                    for monitor in monitors:
+                        monitor.flush()
+                    next_flush += self.flush_step
+
+                # Scans are scheduled from the start time, so the time spent scanning does not delay them
+                next_scan += self.time_step
+                self.event.wait(max(0.0, next_scan - monotonic()))
+        finally:
+            with self.lock:
+                monitors = list(self.monitors)
+            for monitor in monitors:
+                monitor.close()
+
+    def start(self):
+        """Start the sampler thread."""
+        self.event = Event()
+        self.thread = Thread(target=self._sample_monitors)
+        self.thread.start()
+
+    def shutdown(self):
+        """Stop the sampler thread and close all the CSVs."""
+        self.event.set()
+        if self.thread is not None:
+            self.thread.join()
 
 
 class LogParser(ABC):
     """Class to parse a log file and extract specified data based on a regular expression.
 
+    The log file is read line by line, so its size does not matter, and it can be a gzip-rotated log. The rows are
+    written to the CSVs as soon as they are found. In incremental mode, the read offset is saved in the destination
+    directory, so each call to `write_csv` only parses the lines appended since the previous one.
+
     Args:
         log_file (str): log file path.
-        regex (regex): regular expression to be applied to the log file content.
+        regex (regex): regular expression to be applied to each line of the log file.
         columns (list, str): csv headers.
         dst_dir (str, optional): directory to store the CSVs. Defaults to temp directory.
+        literal (str, optional): text every matching line contains. Used to skip lines without applying the regex.
+        incremental (bool, optional): resume from the offset saved by the previous call. Defaults to False.
 
     Attributes:
         log_file (str): log file path.
-        regex (regex): regular expression to be applied to the log file content.
+        regex (regex): regular expression to be applied to each line of the log file.
         columns (list, str): csv headers.
         dst_dir (str): directory to store the CSVs. Defaults to temp directory.
-        data (dict): processed log file.
+        literal (bytes): text every matching line contains.
+        incremental (bool): resume from the offset saved by the previous call.
+        offset (int): position of the log file up to which the lines were parsed.
+        data (dict): number of rows written to each CSV in the last call to `write_csv`.
     """
 
-    def __init__(self, log_file, regex, columns, dst_dir=gettempdir()):
+    def __init__(self, log_file, regex, columns, dst_dir=gettempdir(), literal=None, incremental=False):
         self.log_file = log_file
         self.dst_dir = dst_dir
         self.regex = compile(regex)
         self.columns = columns
+        self.literal = literal.encode() if literal else None
+        self.incremental = incremental
+        self.offset = 0
         self.data = None
         super().__init__()
 
     @abstractmethod
-    def _log_parser(self):
-        """Function to be overloaded by specifying in each child function the necessary logic to parse the log file."""
+    def _get_label(self, match):
+        """Function to be overloaded by specifying in each child function the label (CSV) a match belongs to.
+
+        Args:
+            match (re.Match): match of the regex in a line of the log file.
+
+        Returns:
+            str: label of the match.
+        """
         pass
 
+    @property
+    def offset_file(self):
+        return join(self.dst_dir, f'.{basename(self.log_file)}.offset')
+
+    def _is_compressed(self):
+        with open(self.log_file, 'rb') as log:
+            return log.read(2) == b'\x1f\x8b'
+
+    def _open_log(self):
+        """Open the log file in binary mode, decompressing it if it is a gzip file."""
+        return gzip.open(self.log_file, 'rb') if self._is_compressed() else open(self.log_file, 'rb')
+
+    def _load_offset(self):
+        """Get the offset saved by the previous call, if the log file was not rotated or truncated since then.
+
+        Returns:
+            int: offset to resume the parsing from.
+        """
+        try:
+            with open(self.offset_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        log_stat = stat(self.log_file)
+        truncated = not state.get('compressed') and log_stat.st_size < state['offset']
+        if state.get('inode') != log_stat.st_ino or truncated:
+            logger.info(f'{self.log_file} was rotated or truncated. Parsing it from the beginning')
+            return 0
+
+        return state['offset']
+
+    def _save_offset(self):
+        with open(self.offset_file, 'w') as f:
+            json.dump({'inode': stat(self.log_file).st_ino, 'offset': self.offset,
+                       'compressed': self._is_compressed()}, f)
+
+    def iter_matches(self):
+        """Parse the log file from the current offset.
+
+        In incremental mode, a last line without newline is not parsed, as it may still be being written.
+
+        Yields:
+            tuple: label and groups of each matching line.
+        """
+        with self._open_log() as log:
+            if self.offset:
+                log.seek(self.offset)
+            position = self.offset
+
+            for line in log:
+                if self.incremental and not line.endswith(b'\n'):
+                    break
+                position += len(line)
+                self.offset = position
+
+                if self.literal is not None and self.literal not in line:
+                    continue
+                match = self.regex.search(line.decode(errors='replace'))
+                if match:
+                    yield self._get_label(match), match.groups()
+
+    def _log_parser(self):
+        """Function in charge of parsing the information of the log file.
+
+        Returns:
+            dict: matching rows grouped by label.
+        """
+        performance_information = dict()
+        for label, row in self.iter_matches():
+            performance_information.setdefault(label, []).append(row)
+
+        return performance_information
+
     def write_csv(self):
         """Function in charge of saving the CSV files according to their label."""
         try:
@@ -262,12 +499,32 @@ class LogParser(ABC):
         except OSError:
             pass
 
-        for key, value in self.data.items():
-            file_name = key.replace(' ', '_').replace('/', '_').lower()
-            with open(join(self.dst_dir, f"{file_name}.csv"), 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(self.columns)
-                writer.writerows(value)
+        self.offset = self._load_offset() if self.incremental else 0
+        self.data = dict()
+        csv_files = dict()
+        writers = dict()
+        try:
+            for label, row in self.iter_matches():
+                try:
+                    writer = writers[label]
+                except KeyError:
+                    file_name = label.replace(' ', '_').replace('/', '_').lower()
+                    csv_path = join(self.dst_dir, f"{file_name}.csv")
+                    header = not self.incremental or not isfile(csv_path)
+                    # Line buffered, so the rows can be read while the log is being parsed
+                    csv_files[label] = open(csv_path, 'w' if header else 'a', newline='', buffering=1)
+                    writer = writers[label] = csv.writer(csv_files[label])
+                    if header:
+                        writer.writerow(self.columns)
+                    self.data[label] = 0
+
+                writer.writerow(row)
+                self.data[label] += 1
+        finally:
+            for csv_file in csv_files.values():
+                csv_file.close()
+            if self.incremental:
+                self._save_offset()
 
 
 class ClusterLogParser(LogParser):
@@ -276,35 +533,22 @@ class ClusterLogParser(LogParser):
     Args:
         log_file (str): log file path.
         dst_dir (str, optional): directory to store the CSVs. Defaults to temp directory.
+        incremental (bool, optional): resume from the offset saved by the previous call. Defaults to False.
 
     Attributes:
         log_file (str): log file path.
         dst_dir (str): directory to store the CSVs. Defaults to temp directory.
-        data (dict): processed log file.
+        data (dict): number of rows written to each CSV in the last call to `write_csv`.
     """
-    def __init__(self, log_file, dst_dir=gettempdir()):
+    def __init__(self, log_file, dst_dir=gettempdir(), incremental=False):
         # group1 Timestamp - group2 node_name - group3 activity - group4 time_spent(s)
         regex = r'(\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}) .* ' \
-                r'\[Worker .*_(manager_\d+)] \[(.*)] Finished in (\d+.\d+)s.*'
+                r'\[Worker .*_(manager_\d+)] \[(.*)] Finished in (\d+.\d+)s'
         columns = ['Timestamp', 'node_name', 'activity', 'time_spent(s)']
-        super().__init__(log_file, regex, columns, dst_dir)
-
-    def _log_parser(self):
-        """Function in charge of parsing the information of the cluster.log file."""
-        performance_information = dict()
-        with open(self.log_file) as log:
-            for match in self.regex.finditer(log.read()):
-                try:
-                    performance_information[match.group(3)].append(match.groups())
-                except KeyError:
-                    performance_information[match.group(3)] = list()
-                    performance_information[match.group(3)].append(match.groups())
-
-        return performance_information
+        super().__init__(log_file, regex, columns, dst_dir, literal='Finished in', incremental=incremental)
 
-    def write_csv(self):
-        self.data = self._log_parser()
-        super().write_csv()
+    def _get_label(self, match):
+        return match.group(3)
 
 
 class APILogParser(LogParser):
@@ -313,31 +557,18 @@ class APILogParser(LogParser):
     Args:
         log_file (str): log file path.
         dst_dir (str, optional): directory to store the CSVs. Defaults to temp directory.
+        incremental (bool, optional): resume from the offset saved by the previous call. Defaults to False.
 
     Attributes:
         log_file (str): log file path.
         dst_dir (str): directory to store the CSVs. Defaults to temp directory.
-        data (dict): processed log file.
+        data (dict): number of rows written to each CSV in the last call to `write_csv`.
     """
-    def __init__(self, log_file, dst_dir=gettempdir()):
+    def __init__(self, log_file, dst_dir=gettempdir(), incremental=False):
         # group1 Timestamp - group2 query - group3 time_spent(s)
-        regex = r'(\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}) .* \"(GET .+)\" with parameters .* done in (\d+\.\d+)s: .*'
+        regex = r'(\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}) .* \"(GET .+)\" with parameters .* done in (\d+\.\d+)s: '
         columns = ['Timestamp', 'endpoint', 'time_spent(s)']
-        super().__init__(log_file, regex, columns, dst_dir)
-
-    def _log_parser(self):
-        """Function in charge of parsing the information of the cluster.log file."""
-        performance_information = dict()
-        with open(self.log_file) as log:
-            for match in self.regex.finditer(log.read()):
-                try:
-                    performance_information[match.group(2)].append(match.groups())
-                except KeyError:
-                    performance_information[match.group(2)] = list()
-                    performance_information[match.group(2)].append(match.groups())
+        super().__init__(log_file, regex, columns, dst_dir, literal='done in', incremental=incremental)
 
-        return performance_information
-
-    def write_csv(self):
-        self.data = self._log_parser()
-        super().write_csv()
+    def _get_label(self, match):
+        return match.group(2)
@@ -51,6 +51,29 @@ class Cipher:
         cipher = Blowfish.new(self.key_blowfish, Blowfish.MODE_CBC, iv)
         return cipher.decrypt(self.data)
 
+    @staticmethod
+    def encryptor(key, crypto_method):
+        """Get a function that encrypts data with the given key, to encrypt many messages without a Cipher for each one.
+
+        Every message is encrypted from the fixed IV, so a new CBC context is still created per call.
+
+        Args:
+            key (bytes): Encryption key.
+            crypto_method (str): aes or blowfish.
+
+        Returns:
+            callable: Function that receives the data to encrypt and returns it encrypted.
+        """
+        if crypto_method == 'aes':
+            key_aes = key[:32]
+            iv = b'FEDCBA0987654321'
+            return lambda data: AES.new(key_aes, AES.MODE_CBC, iv).encrypt(pad(data, 16))
+        elif crypto_method == 'blowfish':
+            iv = b'\xfe\xdc\xba\x98\x76\x54\x32\x10'
+            return lambda data: Blowfish.new(key, Blowfish.MODE_CBC, iv).encrypt(data)
+        else:
+            raise ValueError(f'Invalid crypto method: {crypto_method}')
+
 
 class RemotedSimulator:
     """Create an AF_INET server socket for simulating remoted connection.
@@ -75,6 +98,8 @@ class RemotedSimulator:
         self.request_answer = None
         self.keys = ({}, {})
         self.encryption_key = ""
+        self._client_keys_signature = None
+        self._encryption_keys = {}
         self.mode = mode
         self.server_address = server_address
         self.remoted_port = remoted_port
@@ -149,15 +174,20 @@ class RemotedSimulator:
     def create_encryption_key(self, agent_id, name, key):
         """Generate encryption key (using agent metadata and key).
 
+        The derived keys are memoized, so they are only generated once per agent.
+
         Args:
             agent_id (str): Agent id.
             name (str): Agent name.
             key (str): Encryption key.
         """
-        sum1 = (hashlib.md5((hashlib.md5(name.encode()).hexdigest().encode() + hashlib.md5(
-            agent_id.encode()).hexdigest().encode())).hexdigest().encode())[:15]
-        sum2 = hashlib.md5(key.encode()).hexdigest().encode()
-        self.encryption_key = sum2 + sum1
+        agent_key = (agent_id, name, key)
+        if agent_key not in self._encryption_keys:
+            sum1 = (hashlib.md5((hashlib.md5(name.encode()).hexdigest().encode() + hashlib.md5(
+                agent_id.encode()).hexdigest().encode())).hexdigest().encode())[:15]
+            sum2 = hashlib.md5(key.encode()).hexdigest().encode()
+            self._encryption_keys[agent_key] = sum2 + sum1
+        self.encryption_key = self._encryption_keys[agent_key]
 
     def compose_sec_message(self, message, binary_data=None):
         """Compose event from raw message.
@@ -585,8 +615,10 @@ class RemotedSimulator:
 
         # Update keys to encrypt/decrypt
         self.update_keys()
-        # TODO: Ask for specific keys depending on Agent Identifier
-        keys = self.get_key()
+        keys = self.get_key(agent_identifier, agent_identifier_type)
+        if keys is None:
+            # Agents registered with 'any' IP can not be found by the source address
+            keys = self.get_key()
         if keys is None:
             # No valid keys
             logger.error("Not valid keys used.")
@@ -636,19 +668,30 @@ class RemotedSimulator:
         return msg
 
     def update_keys(self):
-        """Update keys table with keys read from client.keys."""
+        """Update keys table with keys read from client.keys.
+
+        The file is only parsed again if its inode, modification time or size have changed since the last update.
+        """
         if not os.path.exists(self.client_keys_path):
             with open(self.client_keys_path, 'w+') as f:
                 f.write("100 ubuntu-agent any TopSecret")
 
+        file_stat = os.stat(self.client_keys_path)
+        signature = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+        if signature == self._client_keys_signature:
+            return
+
         with open(self.client_keys_path) as client_file:
             client_lines = client_file.read().splitlines()
 
-            self.keys = ({}, {})
+            keys = ({}, {})
             for line in client_lines:
                 (id, name, ip, key) = line.split(" ")
-                self.keys[0][id] = (id, name, ip, key)
-                self.keys[1][ip] = (id, name, ip, key)
+                keys[0][id] = (id, name, ip, key)
+                keys[1][ip] = (id, name, ip, key)
+
+        self.keys = keys
+        self._client_keys_signature = signature
 
     def get_key(self, key=None, dictionary="by_id"):
         """Get an specific key.
@@ -656,18 +699,21 @@ class RemotedSimulator:
         Keys can be found in two dictionaries: by_id and by_ip. If no key is provided, the first item will be returned.
 
         Args:
-            key (pair): Pair with by_id and by_ip key dictionaries.
+            key (str): Agent ID or IP to look for.
             dictionary (str): Dictionary to used (by_id or by_ip)
+
+        Returns:
+            tuple: ID, name, IP and key of the agent or `None` if it is not found.
         """
         try:
             if key is None:
                 return next(iter(self.keys[0].values()))
 
             if dictionary == "by_ip":
-                return self.keys[0][key]
-            else:
                 return self.keys[1][key]
-        except:
+            else:
+                return self.keys[0][key]
+        except (KeyError, StopIteration):
             return None
 
     def set_mode(self, mode):
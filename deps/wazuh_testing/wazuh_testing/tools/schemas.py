@@ -0,0 +1,70 @@
+# Copyright (C) 2015-2021, Wazuh Inc.
+# Created by Wazuh, Inc. <info@wazuh.com>.
+# This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+import json
+import threading
+
+from jsonschema import validators
+from jsonschema.exceptions import best_match
+
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+def get_validator(schema):
+    """Get the validator of a JSON schema, compiling it only the first time.
+
+    Args:
+        schema (dict, str): JSON schema or path of the JSON file with it.
+
+    Returns:
+        jsonschema.protocols.Validator: Validator of the schema.
+
+    Raises:
+        jsonschema.exceptions.SchemaError: If the schema is not valid.
+    """
+    # Schemas loaded in memory are kept referenced by their validator, so their id can not be reused
+    key = schema if isinstance(schema, str) else id(schema)
+    with _validators_lock:
+        validator = _validators.get(key)
+        if validator is None:
+            if isinstance(schema, str):
+                with open(schema, 'r') as f:
+                    schema = json.load(f)
+            validator_class = validators.validator_for(schema)
+            validator_class.check_schema(schema)
+            validator = _validators[key] = validator_class(schema)
+
+    return validator
+
+
+def validate(instance, schema):
+    """Validate an instance against a JSON schema with its cached validator.
+
+    Args:
+        instance (dict): Instance to validate.
+        schema (dict, str): JSON schema or path of the JSON file with it.
+
+    Raises:
+        jsonschema.exceptions.ValidationError: The most relevant error if the instance is not valid, like
+            `jsonschema.validate` does.
+    """
+    validator = get_validator(schema)
+    if not validator.is_valid(instance):
+        raise best_match(validator.iter_errors(instance))
+
+
+def validate_many(instances, schema):
+    """Validate many instances against the same JSON schema.
+
+    Args:
+        instances (iterable): Instances to validate.
+        schema (dict, str): JSON schema or path of the JSON file with it.
+
+    Raises:
+        jsonschema.exceptions.ValidationError: The most relevant error of the first instance that is not valid.
+    """
+    validator = get_validator(schema)
+    for instance in instances:
+        if not validator.is_valid(instance):
+            raise best_match(validator.iter_errors(instance))
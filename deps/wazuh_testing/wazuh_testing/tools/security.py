@@ -1,23 +1,253 @@
+import atexit
+import hashlib
+import multiprocessing
 import os
 import platform
 import random
 import stat
+import threading
+from concurrent import futures
+from tempfile import gettempdir
 
 from OpenSSL import crypto
 
 if platform.system() == 'Windows':  # Windows
     import win32api, win32con
 
+DEFAULT_KEY_SIZE = 4096
+DEFAULT_KEY_POOL_PATH = os.path.join(gettempdir(), 'wazuh_testing_key_pool')
+DEFAULT_KEY_POOL_MIN_SIZE = 8
+DEFAULT_KEY_POOL_MAX_SIZE = 32
+
+_key_pools = {}
+_key_pools_lock = threading.Lock()
+_key_executor = None
+
+
+def _generate_key_pem(key_size):
+    """Generate a RSA key. Run in the worker processes of the key pools.
+
+    Args:
+        key_size (int): Number of bits of the key.
+
+    Returns:
+        bytes: Private key in PEM format.
+    """
+    key = crypto.PKey()
+    key.generate_key(crypto.TYPE_RSA, key_size)
+    return crypto.dump_privatekey(crypto.FILETYPE_PEM, key)
+
+
+def _get_key_executor():
+    global _key_executor
+    with _key_pools_lock:
+        if _key_executor is None:
+            # The test process can have running threads, so the workers are spawned instead of forked
+            _key_executor = futures.ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+        return _key_executor
+
+
+@atexit.register
+def _shutdown_key_executor():
+    if _key_executor is not None:
+        try:
+            _key_executor.shutdown(wait=False, cancel_futures=True)
+        except TypeError:
+            _key_executor.shutdown(wait=False)
+
+
+def _get_key_pool_dir(path):
+    """Get the directory of a key pool, if it and its parent are only writable by the current user."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        dir_stats = [os.stat(os.path.dirname(path)), os.stat(path)]
+    except OSError:
+        return None
+
+    # The keys are used as private keys, so they must not be planted or read by other users
+    if hasattr(os, 'getuid') and any(dir_stat.st_uid != os.getuid() or dir_stat.st_mode & 0o022
+                                     for dir_stat in dir_stats):
+        return None
+
+    return path
+
+
+class KeyPool:
+    """Pool of pre-generated RSA keys stored on disk.
+
+    Keys are stored as PEM files named after their SHA256 hash in a directory per key size, and each key is removed
+    from the pool when it is taken, so it is never handed out twice, not even across sessions. The pool is refilled in
+    the background by a process pool so that it keeps at least `min_size` and at most `max_size` unused keys.
+
+    If the directory of the pool can be written by other users, the keys are generated when they are taken instead.
+
+    Args:
+        key_size (int): Number of bits of the keys.
+        path (str): Directory of the pool.
+        min_size (int): Unused keys to keep generated in advance.
+        max_size (int): Max keys kept in the directory of the pool.
+
+    Example:
+        >>> pool = get_key_pool(2048)
+        >>> key = pool.get_key()
+    """
+
+    def __init__(self, key_size=DEFAULT_KEY_SIZE, path=DEFAULT_KEY_POOL_PATH, min_size=DEFAULT_KEY_POOL_MIN_SIZE,
+                 max_size=DEFAULT_KEY_POOL_MAX_SIZE):
+        self.key_size = key_size
+        self.path = _get_key_pool_dir(os.path.join(path, str(key_size)))
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.pending = []
+        self.lock = threading.Lock()
+        if self.path is not None:
+            self._prune()
+
+    def _available(self):
+        return sorted(name for name in os.listdir(self.path) if name.endswith('.pem'))
+
+    def _prune(self):
+        """Remove the keys over the max size of the pool."""
+        for name in self._available()[self.max_size:]:
+            try:
+                os.unlink(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    def _store(self, pem):
+        """Store a key in the pool, unless it is full.
+
+        Args:
+            pem (bytes): Private key in PEM format.
+        """
+        if len(self._available()) >= self.max_size:
+            return
+
+        key_path = os.path.join(self.path, f"{hashlib.sha256(pem).hexdigest()}.pem")
+        temp_path = f"{key_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+            f.write(pem)
+        os.replace(temp_path, key_path)
+
+    def _store_generated(self, future):
+        # Called both by the future callback and by the waiting get_key, but each key must be stored only once
+        with self.lock:
+            if future not in self.pending:
+                return
+            self.pending.remove(future)
+        if not future.cancelled() and future.exception() is None:
+            self._store(future.result())
+
+    def _take(self, name):
+        """Read a key and remove it from the pool.
+
+        Returns:
+            bytes: Private key in PEM format, None if another process took it first.
+        """
+        key_path = os.path.join(self.path, name)
+        try:
+            with open(key_path, 'rb') as f:
+                pem = f.read()
+            os.unlink(key_path)
+        except FileNotFoundError:
+            return None
+
+        return pem
+
+    def fill(self, count):
+        """Generate keys for the pool in background processes, up to its max size.
+
+        Args:
+            count (int): Number of keys to generate.
+        """
+        executor = _get_key_executor()
+        with self.lock:
+            count = min(count, self.max_size - len(self._available()) - len(self.pending))
+            submitted = [executor.submit(_generate_key_pem, self.key_size) for _ in range(count)]
+            self.pending.extend(submitted)
+        # A callback runs right away if its future is already done, so they are added without holding the lock
+        for future in submitted:
+            future.add_done_callback(self._store_generated)
+
+    def get_key(self):
+        """Take an unused key from the pool, waiting for the background generation if the pool is empty.
+
+        Returns:
+            PKey: RSA key.
+        """
+        if self.path is None:
+            return crypto.load_privatekey(crypto.FILETYPE_PEM, _generate_key_pem(self.key_size))
+
+        pem = None
+        while pem is None:
+            with self.lock:
+                available = self._available()
+                missing = self.min_size - (len(available) - 1 + len(self.pending))
+            if missing > 0:
+                self.fill(missing)
+            with self.lock:
+                pending = list(self.pending)
+
+            for name in available:
+                pem = self._take(name)
+                if pem is not None:
+                    break
+            else:
+                if not pending:
+                    pem = _generate_key_pem(self.key_size)
+                else:
+                    done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                    for future in done:
+                        self._store_generated(future)
+
+        return crypto.load_privatekey(crypto.FILETYPE_PEM, pem)
+
+
+def get_key_pool(key_size=DEFAULT_KEY_SIZE):
+    """Get the shared key pool for a key size.
+
+    Args:
+        key_size (int): Number of bits of the keys.
+
+    Returns:
+        KeyPool: Key pool stored in the default path.
+    """
+    with _key_pools_lock:
+        if key_size not in _key_pools:
+            _key_pools[key_size] = KeyPool(key_size)
+        return _key_pools[key_size]
+
 
 class CertificateController(object):
+    """Generate the CA and agent certificates used in the enrollment tests.
+
+    Args:
+        key_size (int): Number of bits of the RSA keys. Load tests can use smaller, cheaper keys.
+        key_pool (KeyPool, bool): Pool to take the keys from. True to use the shared pool of `key_size` keys, which
+            generates keys in background processes. Default False, to generate the keys when they are needed.
+    """
 
-    def __init__(self):
+    def __init__(self, key_size=DEFAULT_KEY_SIZE, key_pool=False):
+        self.key_size = key_size
+        self.key_pool = get_key_pool(key_size) if key_pool is True else key_pool or None
         # Generates key pair .
-        self.ca_key = crypto.PKey()
-        self.ca_key.generate_key(crypto.TYPE_RSA, 4096)
+        self.ca_key = self._generate_key()
         self.ca_cert = self._create_ca_cert(self.ca_key)
         self.digest = 'sha256WithRSAEncryption'
 
+    def _generate_key(self):
+        """Get a new RSA key, from the key pool if there is one.
+
+        Returns:
+            PKey: RSA key.
+        """
+        if self.key_pool is not None:
+            return self.key_pool.get_key()
+
+        key = crypto.PKey()
+        key.generate_key(crypto.TYPE_RSA, self.key_size)
+        return key
+
     def get_root_ca_cert(self):
         return self.ca_cert
 
@@ -35,8 +265,7 @@ class CertificateController(object):
             agent_cert_path (string): Path to store agent certificate
         """
         # Generate agent keys
-        key = crypto.PKey()
-        key.generate_key(crypto.TYPE_RSA, 4096)
+        key = self._generate_key()
         self._add_key_to_certificate(key)
         # Generate and sign agent cert with root key
         cert = self._create_ca_cert(key, subject=agentname)
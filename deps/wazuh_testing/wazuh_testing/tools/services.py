@@ -1,14 +1,21 @@
 # Copyright (C) 2015-2021, Wazuh Inc.
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+import glob
 import os
 import subprocess
 import sys
 import time
 
 import psutil
-from wazuh_testing.tools import WAZUH_PATH, get_service, WAZUH_SOCKETS, QUEUE_DB_PATH, WAZUH_OPTIONAL_SOCKETS
+from wazuh_testing.tools import WAZUH_PATH, get_service, WAZUH_SOCKETS, QUEUE_DB_PATH, WAZUH_OPTIONAL_SOCKETS, \
+    WAZUH_RUN_PATH, _get_installation_info
 from wazuh_testing.tools.configuration import write_wazuh_conf
+from wazuh_testing.tools.monitoring import _InotifyWatcher
+
+# Maximum time between checks of the daemons status when no change is notified, since a killed daemon leaves its
+# pid file behind
+DAEMON_STATUS_CHECK_TIME = 0.5
 
 
 def restart_wazuh_daemon(daemon):
@@ -108,17 +115,7 @@ def control_service(action, daemon=None, debug_mode=False):
                 control_service('stop', daemon=daemon)
                 control_service('start', daemon=daemon)
             elif action == 'stop':
-                processes = []
-
-                for proc in psutil.process_iter():
-                    try:
-                        if daemon in ['wazuh-clusterd', 'wazuh-apid']:
-                            if any(filter(lambda x: f"{daemon}.py" in x, proc.cmdline())):
-                                processes.append(proc)
-                        elif daemon in proc.name() or daemon in ' '.join(proc.cmdline()):
-                            processes.append(proc)
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
+                processes = get_daemon_processes(daemon)
                 try:
                     for proc in processes:
                         proc.terminate()
@@ -130,7 +127,7 @@ def control_service(action, daemon=None, debug_mode=False):
                 except psutil.NoSuchProcess:
                     pass
 
-                delete_sockets(WAZUH_SOCKETS[daemon])
+                delete_sockets(WAZUH_SOCKETS.get(daemon, []))
             else:
                 daemon_path = os.path.join(WAZUH_PATH, 'bin')
                 subprocess.check_call([f'{daemon_path}/{daemon}', '' if not debug_mode else '-dd'])
@@ -140,6 +137,95 @@ def control_service(action, daemon=None, debug_mode=False):
         raise ValueError(f"Error when executing {action} in daemon {daemon}. Exit status: {result}")
 
 
+def get_wazuh_daemons():
+    """Get the daemons of the installation, in the order listed by `wazuh-control status`.
+
+    The list is only read again if the installation changes.
+
+    Returns:
+        list: Names of the daemons.
+    """
+    def read_daemons():
+        control_status_output = subprocess.run([f'{WAZUH_PATH}/bin/wazuh-control', 'status'],
+                                               stdout=subprocess.PIPE).stdout.decode()
+        return [line.split()[0] for line in control_status_output.splitlines() if line.strip()]
+
+    return _get_installation_info('daemons', read_daemons)
+
+
+def get_daemon_pids(daemon):
+    """Get the PIDs of a running daemon from its pid files in WAZUH_PATH/var/run, like `wazuh-control status` does.
+
+    Args:
+        daemon (str): Name of the daemon.
+
+    Returns:
+        list: PIDs of the alive processes of the daemon.
+    """
+    pids = []
+    for pid_file in glob.glob(os.path.join(WAZUH_RUN_PATH, f'{daemon}-*.pid')):
+        pid = os.path.basename(pid_file)[len(daemon) + 1:-len('.pid')]
+        if not pid.isdigit():
+            continue
+        try:
+            if psutil.Process(int(pid)).status() != psutil.STATUS_ZOMBIE:
+                pids.append(int(pid))
+        except psutil.NoSuchProcess:
+            pass
+
+    return pids
+
+
+def is_daemon_running(daemon):
+    """Check if a daemon is running according to its pid files.
+
+    Args:
+        daemon (str): Name of the daemon.
+
+    Returns:
+        bool: True if the daemon is running, False otherwise.
+    """
+    return len(get_daemon_pids(daemon)) > 0
+
+
+def get_daemon_processes(daemon):
+    """Get the processes of a daemon.
+
+    They are taken from the pid files of the daemon, including the children of the Python daemons. All the processes
+    are only scanned when there are no pid files, e.g. for a daemon not started by Wazuh.
+
+    Args:
+        daemon (str): Name of the daemon.
+
+    Returns:
+        list: `psutil.Process` of the daemon.
+    """
+    processes = []
+    for pid in get_daemon_pids(daemon):
+        try:
+            proc = psutil.Process(pid)
+            processes.append(proc)
+            if daemon in ['wazuh-clusterd', 'wazuh-apid']:
+                processes.extend(proc.children(recursive=True))
+        except psutil.NoSuchProcess:
+            pass
+
+    if processes:
+        return processes
+
+    for proc in psutil.process_iter():
+        try:
+            if daemon in ['wazuh-clusterd', 'wazuh-apid']:
+                if any(filter(lambda x: f"{daemon}.py" in x, proc.cmdline())):
+                    processes.append(proc)
+            elif daemon in proc.name() or daemon in ' '.join(proc.cmdline()):
+                processes.append(proc)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+
+    return processes
+
+
 def get_process(search_name):
     """Search process by its name.
 
@@ -208,36 +294,41 @@ def check_daemon_status(target_daemon=None, running_condition=True, timeout=10,
     if sys.platform == 'win32':
         condition_met = check_if_process_is_running('wazuh-agent.exe') == running_condition
     else:
-        start_time = time.time()
-        elapsed_time = 0
-
-        while elapsed_time < timeout and not condition_met:
-
-            control_status_output = subprocess.run([f'{WAZUH_PATH}/bin/wazuh-control', 'status'],
-                                                   stdout=subprocess.PIPE).stdout.decode()
-            condition_met = True
-            for lines in control_status_output.splitlines():
-                daemon_status_tokens = lines.split()
-                current_daemon = daemon_status_tokens[0]
-                daemon_status = ' '.join(daemon_status_tokens[1:])
-                daemon_running = daemon_status == 'is running...'
-                if current_daemon == target_daemon or target_daemon is None:
-                    if current_daemon in WAZUH_SOCKETS.keys():
-                        socket_set = {path for path in WAZUH_SOCKETS[current_daemon]}
-                    else:
-                        socket_set = set()
-                    # We remove optional sockets and add extra sockets to the set to check
-                    socket_set.difference_update(WAZUH_OPTIONAL_SOCKETS)
-                    socket_set.update(extra_sockets)
-                    # Check specified socket/s status
-                    for socket in socket_set:
-                        if os.path.exists(socket) != running_condition:
-                            condition_met = False
-                    if daemon_running != running_condition:
-                        condition_met = False
-            if not condition_met:
-                time.sleep(1)
-            elapsed_time = time.time() - start_time
+        daemons = [daemon for daemon in get_wazuh_daemons() if target_daemon in (None, daemon)]
+        socket_set = set()
+        for daemon in daemons:
+            socket_set.update(WAZUH_SOCKETS.get(daemon, []))
+        # We remove optional sockets and add extra sockets to the set to check
+        socket_set.difference_update(WAZUH_OPTIONAL_SOCKETS)
+        if daemons:
+            socket_set.update(extra_sockets)
+
+        def daemons_status_met():
+            # Check specified socket/s status
+            return all(os.path.exists(socket) == running_condition for socket in socket_set) and \
+                all(is_daemon_running(daemon) == running_condition for daemon in daemons)
+
+        # Wake up as soon as a pid file or socket is created or removed instead of checking it every second
+        watched_paths = [os.path.join(WAZUH_RUN_PATH, 'wazuh.pid'), *socket_set]
+        try:
+            watcher = _InotifyWatcher(*[path for path in watched_paths if os.path.isdir(os.path.dirname(path))])
+        except OSError:
+            watcher = None
+
+        deadline = time.time() + timeout
+        try:
+            while True:
+                condition_met = daemons_status_met()
+                remaining_time = deadline - time.time()
+                if condition_met or remaining_time <= 0:
+                    break
+                if watcher is not None:
+                    watcher.wait(min(remaining_time, DAEMON_STATUS_CHECK_TIME))
+                else:
+                    time.sleep(min(remaining_time, DAEMON_STATUS_CHECK_TIME))
+        finally:
+            if watcher is not None:
+                watcher.close()
     if not condition_met:
         raise TimeoutError(f"{target_daemon} does not meet condition: running = {running_condition}")
     return condition_met
@@ -2,27 +2,53 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 import json
+import os
+import shlex
 import tempfile
+import threading
 import xml.dom.minidom as minidom
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
 
 import testinfra
 import yaml
 from wazuh_testing.tools import WAZUH_CONF, WAZUH_API_CONF, API_LOG_FILE_PATH
 from wazuh_testing.tools.configuration import set_section_wazuh_conf
 
+HostResult = namedtuple('HostResult', ['host', 'result', 'error', 'duration'])
+
 
 class HostManager:
     """This class is an extensible remote host management interface. Within this we have multiple functions to modify
     the remote hosts depending on what our tests need.
+
+    The host backends are created once per host and reused, and the SSH connections opened by Ansible are kept alive
+    between operations (ControlMaster/ControlPersist), so each operation does not pay a new SSH handshake. Operations
+    over many hosts can be run at the same time with `run_on_hosts`.
     """
 
-    def __init__(self, inventory_path: str):
+    def __init__(self, inventory_path: str, max_workers: int = 16, persistent_connections: bool = True,
+                 control_persist: int = 300):
         """Constructor of host manager class.
 
         Args:
             inventory_path (str): Ansible inventory path
+            max_workers (int, optional): Maximum number of hosts handled at the same time by `run_on_hosts`.
+                Default `16`
+            persistent_connections (bool, optional): Keep the SSH connections to the hosts open between operations.
+                It has no effect if `ANSIBLE_SSH_COMMON_ARGS` is already defined. Default `True`
+            control_persist (int, optional): Seconds that an idle SSH connection is kept open. Default `300`
         """
         self.inventory_path = inventory_path
+        self.max_workers = max_workers
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+        if persistent_connections:
+            # Added to the ssh_args of the ansible.cfg in use instead of replacing them
+            os.environ.setdefault('ANSIBLE_SSH_COMMON_ARGS',
+                                  f"-o ControlMaster=auto -o ControlPersist={control_persist}s")
 
     def get_host(self, host: str):
         """Get the Ansible object for communicating with the specified host.
@@ -33,7 +59,99 @@ class HostManager:
         Returns:
             testinfra.modules.base.Ansible: Host instance from hostspec
         """
-        return testinfra.get_host(f"ansible://{host}?ansible_inventory={self.inventory_path}")
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = testinfra.get_host(f"ansible://{host}?ansible_inventory={self.inventory_path}")
+
+            return self._hosts[host]
+
+    def get_command_line(self, host: str, cmd: str):
+        """Get the local command line that runs a command on the host without going through Ansible.
+
+        Ansible only returns the output of a command when it ends, so this allows reading the output of long-running
+        commands, like `tail -F`, while they run.
+
+        Args:
+            host (str): Hostname
+            cmd (str): Shell command to execute in the host
+
+        Returns:
+            list: Arguments of the local command, to be run with `subprocess`.
+
+        Raises:
+            ValueError: If the Ansible connection of the host is not supported.
+        """
+        variables = self.get_host(host).backend.get_variables()
+        connection = variables.get('ansible_connection', 'ssh')
+        address = variables.get('ansible_host', host)
+
+        if connection == 'docker':
+            return ['docker', 'exec', address, '/bin/sh', '-c', cmd]
+        if connection == 'local':
+            return ['/bin/sh', '-c', cmd]
+        if connection in ('ssh', 'smart', 'paramiko'):
+            command_line = ['ssh', '-o', 'BatchMode=yes']
+            for args in ('ansible_ssh_common_args', 'ansible_ssh_extra_args'):
+                command_line.extend(shlex.split(variables.get(args, '')))
+            if 'ansible_port' in variables:
+                command_line.extend(['-p', str(variables['ansible_port'])])
+            if 'ansible_ssh_private_key_file' in variables:
+                command_line.extend(['-i', variables['ansible_ssh_private_key_file']])
+            user = variables.get('ansible_user')
+            command_line.extend([f"{user}@{address}" if user else address, cmd])
+            return command_line
+
+        raise ValueError(f"Ansible connection '{connection}' of {host} is not supported")
+
+    def run_on_hosts(self, hosts: list, operation, *args, raise_on_error: bool = True, **kwargs):
+        """Run an operation on several hosts at the same time.
+
+        Args:
+            hosts (list): Hostnames.
+            operation (callable, str): Function called with each hostname as first argument, or name of a HostManager
+                method, that is called with `host=<hostname>`.
+            *args: Extra positional arguments of the operation.
+            raise_on_error (bool, optional): Raise the error of the first failed host, in `hosts` order, once all the
+                hosts finished. Default `True`
+            **kwargs: Extra keyword arguments of the operation.
+
+        Returns:
+            dict: HostResult (host, result, error, duration in seconds) of each host.
+
+        Raises:
+            Exception: The error of the first failed host if `raise_on_error` is enabled.
+
+        Example:
+            >>> results = host_manager.run_on_hosts(['wazuh-master', 'wazuh-worker1'], 'control_service',
+            ...                                     service='wazuh-manager', state='restarted')
+            >>> results['wazuh-master'].duration
+        """
+        if isinstance(operation, str):
+            method = getattr(self, operation)
+
+            def operation(host, *op_args, **op_kwargs):
+                return method(*op_args, host=host, **op_kwargs)
+
+        def run_operation(host):
+            start = perf_counter()
+            try:
+                return HostResult(host, operation(host, *args, **kwargs), None, perf_counter() - start)
+            except Exception as error:
+                return HostResult(host, None, error, perf_counter() - start)
+
+        hosts = list(dict.fromkeys(hosts))
+        if not hosts:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(hosts))) as executor:
+            results = {result.host: result for result in executor.map(run_operation, hosts)}
+
+        if raise_on_error:
+            for result in results.values():
+                if result.error is not None:
+                    raise result.error
+
+        return results
 
     def move_file(self, host: str, src_path: str, dest_path: str = '/var/ossec/etc/ossec.conf', check: bool = False):
         """Move from src_path to the desired location dest_path for the specified host.
@@ -109,30 +227,36 @@ class HostManager:
         return self.get_host(host).file(file_path).content_string
 
     def apply_config(self, config_yml_path: str, dest_path: str = WAZUH_CONF, clear_files: list = None,
-                     restart_services: list = None):
+                     restart_services: list = None, parallel_restart: bool = False):
         """Apply the configuration described in the config_yml_path to the environment.
 
+        The configuration files are read and written on all the hosts at the same time, but the services are
+        restarted one host after another, in the order of the file, unless `parallel_restart` is enabled.
+
         Args:
             config_yml_path (str): Path to the yml file that contains the configuration to be applied
             dest_path (str): Destination file
             clear_files (list): List of files to be truncated
             restart_services (list): List of services to be restarted
+            parallel_restart (bool): Restart the services of all the hosts at the same time. Default `False`
         """
         with open(config_yml_path, mode='r') as config_yml:
             config = yaml.safe_load(config_yml)
 
+        templates = self.run_on_hosts(list(config), 'get_file_content', file_path=dest_path)
         parse_configurations = dict()
         for host, payload in config.items():
-            template_ossec_conf = self.get_file_content(host, dest_path).split('\n')
+            template_ossec_conf = templates[host].result.split('\n')
             parse_configurations[host] = set_section_wazuh_conf(sections=payload['sections'],
                                                                 template=template_ossec_conf)
 
-        for host, configuration in parse_configurations.items():
-            configuration = ''.join(configuration)
+        def write_host_config(host):
+            configuration = ''.join(parse_configurations[host])
             dom = minidom.parseString(configuration)
             configuration = dom.toprettyxml().split('\n', 1)[1]
             self.modify_file_content(host, dest_path, configuration)
 
+        def restart_host(host):
             if restart_services:
                 for service in restart_services:
                     self.control_service(host=host, service=service, state='restarted')
@@ -140,8 +264,16 @@ class HostManager:
                 for log in clear_files:
                     self.clear_file(host=host, file_path=log)
 
+        self.run_on_hosts(list(parse_configurations), write_host_config)
+        if parallel_restart:
+            self.run_on_hosts(list(parse_configurations), restart_host)
+        else:
+            # Restarting the cluster nodes at the same time can race the master and workers startup
+            for host in parse_configurations:
+                restart_host(host)
+
     def apply_api_config(self, api_config: str or dict = None, host_list: list = None, dest_path: str = WAZUH_API_CONF,
-                         clear_log: bool = False):
+                         clear_log: bool = False, parallel_restart: bool = False):
         """Apply the API configuration described in the yaml file or in the dictionary.
 
         Args:
@@ -149,6 +281,8 @@ class HostManager:
             host_list (list, optional): List of hosts to apply the configuration in. Default `None`
             dest_path (str, optional): Path where the API configuration is. Default `/var/ossec/api/configuration/api.yaml`
             clear_log (bool, optional): Boolean to decide if it must truncate the 'api.log' after restarting the API or not.
+            parallel_restart (bool, optional): Restart the managers of all the hosts at the same time instead of one
+                after another. Default `False`
         """
         if isinstance(api_config, str):
             with open(api_config, 'r') as config_yml:
@@ -157,14 +291,20 @@ class HostManager:
             assert host_list is not None, f'"host_list" cannot be None if "api_config" is a dict.'
             configuration = {host: api_config for host in host_list}
 
-        for host, config in configuration.items():
-            self.modify_file_content(host, path=dest_path, content=yaml.dump("" if config is None else config))
+        self.run_on_hosts(list(configuration), lambda host: self.modify_file_content(
+            host, path=dest_path, content=yaml.dump("" if configuration[host] is None else configuration[host])))
 
-        for host in host_list:
+        def restart_api(host):
             self.control_service(host=host, service='wazuh-manager', state='restarted')
             if clear_log:
                 self.clear_file(host=host, file_path=API_LOG_FILE_PATH)
 
+        if parallel_restart:
+            self.run_on_hosts(host_list, restart_api)
+        else:
+            for host in host_list:
+                restart_api(host)
+
     def get_api_token(self, host, user='wazuh', password='wazuh', auth_context=None, port=55000, check=False):
         """Return an API token for the specified user.
 
@@ -259,6 +399,13 @@ def clean_environment(host_manager, target_files):
         host_manager (object): a host manager object with not None inventory_path
         target_files (dict): a dictionary of tuples, each with the host and the path of the file to clear.
     """
-    for target in target_files:
-        host_manager.clear_file(host=target[0], file_path=target[1])
+    files_per_host = {}
+    for host, file_path in target_files:
+        files_per_host.setdefault(host, []).append(file_path)
+
+    def clear_host_files(host):
+        for file_path in files_per_host[host]:
+            host_manager.clear_file(host=host, file_path=file_path)
+
+    host_manager.run_on_hosts(list(files_per_host), clear_host_files)
     
\ No newline at end of file
@@ -2,13 +2,11 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 import functools
-import json
 import logging
-import socket
 import sqlite3
 
-from wazuh_testing.tools import GLOBAL_DB_PATH, WAZUH_DB_SOCKET_PATH
-from wazuh_testing.tools.monitoring import wazuh_pack, wazuh_unpack
+from wazuh_testing import db_interface
+from wazuh_testing.tools import GLOBAL_DB_PATH
 from wazuh_testing.tools.services import control_service
 
 def callback_wazuhdb_response(item):
@@ -131,29 +129,7 @@ def query_wdb(command):
     Returns:
         list: Query response data
     """
-    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    sock.connect(WAZUH_DB_SOCKET_PATH)
-
-    data = []
-
-    try:
-        sock.send(wazuh_pack(len(command)) + command.encode())
-
-        rcv = sock.recv(4)
-
-        if len(rcv) == 4:
-            data_len = wazuh_unpack(rcv)
-
-            data = sock.recv(data_len).decode()
-
-            # Remove response header and cast str to list of dictionaries
-            # From --> 'ok [ {data1}, {data2}...]' To--> [ {data1}, data2}...]
-            if len(data.split()) > 1 and data.split()[0] == 'ok':
-                data = json.loads(' '.join(data.split(' ')[1:]))
-    finally:
-        sock.close()
-
-    return data
+    return db_interface.query_wdb(command)
 
 
 def clean_agents_from_db():
@@ -176,7 +152,6 @@ def insert_agent_in_db(id=1, name='TestAgent', ip='any', registration_time=0, co
     update_command = f'global sql UPDATE agent SET connection_status = "{connection_status}",\
                        disconnection_time = "{disconnection_time}" WHERE id = {id};'
     try:
-        query_wdb(insert_command)
-        query_wdb(update_command)
+        db_interface.query_wdb_many([insert_command, update_command])
     except Exception:
         raise Exception(f"Unable to add agent {id}")
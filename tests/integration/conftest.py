@@ -10,6 +10,7 @@ import subprocess
 import sys
 import uuid
 from datetime import datetime
+from functools import lru_cache
 
 import pytest
 from numpydoc.docscrape import FunctionDoc
@@ -76,16 +77,28 @@ def pytest_runtest_setup(item):
 
 @pytest.fixture(scope='module')
 def restart_wazuh(get_configuration, request):
+    def reset_ossec_log():
+        # Reset ossec.log and start a new monitor
+        truncate_file(LOG_FILE_PATH)
+        file_monitor = FileMonitor(LOG_FILE_PATH)
+        setattr(request.module, 'wazuh_log_monitor', file_monitor)
+
+    # Modules that do not wait for the startup logs of every daemon can restart only the daemons that read the
+    # changed sections of the configuration, or nothing if it did not change. The names of the restarted daemons
+    # (None if the whole service was restarted) are stored in the module so its tests know which logs to wait for
+    if getattr(request.module, 'restart_only_affected_daemons', False):
+        restarted_daemons = conf.get_configuration_manager().apply(before_start=reset_ossec_log)
+        setattr(request.module, 'restarted_daemons', restarted_daemons)
+        return
+
     # Stop Wazuh
     control_service('stop')
 
-    # Reset ossec.log and start a new monitor
-    truncate_file(LOG_FILE_PATH)
-    file_monitor = FileMonitor(LOG_FILE_PATH)
-    setattr(request.module, 'wazuh_log_monitor', file_monitor)
+    reset_ossec_log()
 
     # Start Wazuh
     control_service('start')
+    conf.get_configuration_manager().set_applied()
 
 
 @pytest.fixture(scope='module')
@@ -214,6 +227,14 @@ def pytest_addoption(parser):
         type=str,
         help="add file to the HTML report"
     )
+    parser.addoption(
+        "--report-files-size",
+        action="store",
+        metavar="kilobytes",
+        default=1024,
+        type=int,
+        help="maximum size of each file added to the HTML report of a failed test. Only its last kilobytes are added"
+    )
     parser.addoption(
         "--wpk_package_path",
         action="append",
@@ -330,15 +351,81 @@ def create_asset(
     return relative_path
 
 
+@lru_cache(maxsize=None)
+def get_function_doc(function):
+    """Get the parsed docstring of a test function, parsing it only once.
+
+    Args:
+        function (callable): Test function.
+
+    Returns:
+        FunctionDoc: Parsed docstring.
+    """
+    return FunctionDoc(function)
+
+
+def get_report_file_position(filepath):
+    """Get the inode and size of a report file.
+
+    Args:
+        filepath (str): Path of the file.
+
+    Returns:
+        tuple: Inode and size of the file. None if it does not exist.
+    """
+    try:
+        file_stat = os.stat(filepath)
+    except OSError:
+        return None
+
+    return file_stat.st_ino, file_stat.st_size
+
+
+def read_report_file(filepath, start_position=None, max_size=1024 * 1024):
+    """Read the content of a report file written since a position, limited to its last bytes.
+
+    If the file was rotated or truncated since that position, or nothing was written since then, the end of the
+    file is read instead.
+
+    Args:
+        filepath (str): Path of the file.
+        start_position (tuple, optional): Inode and size of the file when the test started. Default `None`
+        max_size (int, optional): Maximum bytes to read. Default `1 MiB`
+
+    Returns:
+        str: Content read.
+    """
+    with open(filepath, mode='rb') as f:
+        file_stat = os.fstat(f.fileno())
+        start = 0
+        if start_position is not None and start_position[0] == file_stat.st_ino and \
+                start_position[1] < file_stat.st_size:
+            start = start_position[1]
+        start = max(start, file_stat.st_size - max_size)
+        f.seek(start)
+        content = f.read(file_stat.st_size - start).decode(errors='replace')
+
+    if start > 0:
+        content = f"[Content of {filepath} from byte {start}]\n{content}"
+
+    return content
+
+
+def pytest_runtest_call(item):
+    # Remember where the report files end, so only what the test writes is added to the report if it fails
+    item.report_file_positions = {filepath: get_report_file_position(filepath) for filepath in get_report_files()}
+
+
 @pytest.hookimpl(hookwrapper=True)
 def pytest_runtest_makereport(item, call):
     pytest_html = item.config.pluginmanager.getplugin('html')
     outcome = yield
     report = outcome.get_result()
-    documentation = FunctionDoc(item.function)
 
-    # Add description, markers and tier to the report
-    report.description = '. '.join(documentation["Summary"])
+    # Add description, markers and tier to the report. The passed setup and teardown reports are not shown, so the
+    # docstring is only parsed for the reports that have a row in the results table
+    if report.when == 'call' or not report.passed:
+        report.description = '. '.join(get_function_doc(item.function)["Summary"])
     report.tier = ', '.join(str(mark.kwargs['level']) for mark in item.iter_markers(name="tier"))
     report.markers = ', '.join(mark.name for mark in item.iter_markers() if
                                mark.name != 'tier' and mark.name != 'parametrize')
@@ -346,39 +433,42 @@ def pytest_runtest_makereport(item, call):
     if report.location[0] not in results:
         results[report.location[0]] = {'passed': 0, 'failed': 0, 'skipped': 0, 'xfailed': 0, 'error': 0}
 
-    extra = getattr(report, 'extra', [])
     if report.when == 'call':
-        # Apply hack to fix length filename problem
-        pytest_html.HTMLReport.TestResult.create_asset = create_asset
-
-        # Add extended information from docstring inside 'Result' section
-        extra.append(pytest_html.extras.html('<div><h2>Test function details</h2></div>'))
-        for section in ('Extended Summary', 'Parameters'):
-            extra.append(pytest_html.extras.html(f'<div><h3>{section}</h3></div>'))
-            for line in documentation[section]:
-                extra.append(pytest_html.extras.html(f'<div>{line}</div>'))
-        arguments = dict()
-
-        # Add arguments of each text as a json file
-        for key, value in item.funcargs.items():
-            if isinstance(value, set):
-                arguments[key] = list(value)
-            try:
-                json.dumps(value)
-                arguments[key] = value
-            except (TypeError, OverflowError):
-                arguments[key] = str(value)
-        extra.append(pytest_html.extras.json(arguments, name="Test arguments"))
-
-        # Extra files to be added in 'Links' section
-        files = get_report_files()
-        for filepath in files:
-            if os.path.isfile(filepath):
-                with open(filepath, mode='r', errors='replace') as f:
-                    content = f.read()
+        # The extras are only shown for failed tests, so they are not gathered for the rest
+        if not report.passed and not report.skipped:
+            extra = getattr(report, 'extra', [])
+
+            # Apply hack to fix length filename problem
+            pytest_html.HTMLReport.TestResult.create_asset = create_asset
+
+            # Add extended information from docstring inside 'Result' section
+            extra.append(pytest_html.extras.html('<div><h2>Test function details</h2></div>'))
+            for section in ('Extended Summary', 'Parameters'):
+                extra.append(pytest_html.extras.html(f'<div><h3>{section}</h3></div>'))
+                for line in get_function_doc(item.function)[section]:
+                    extra.append(pytest_html.extras.html(f'<div>{line}</div>'))
+            arguments = dict()
+
+            # Add arguments of each text as a json file
+            for key, value in item.funcargs.items():
+                if isinstance(value, set):
+                    arguments[key] = list(value)
+                try:
+                    json.dumps(value)
+                    arguments[key] = value
+                except (TypeError, OverflowError):
+                    arguments[key] = str(value)
+            extra.append(pytest_html.extras.json(arguments, name="Test arguments"))
+
+            # Extra files to be added in 'Links' section
+            files = get_report_files()
+            start_positions = getattr(item, 'report_file_positions', {})
+            max_size = item.config.getoption('--report-files-size') * 1024
+            for filepath in files:
+                if os.path.isfile(filepath):
+                    content = read_report_file(filepath, start_positions.get(filepath), max_size)
                     extra.append(pytest_html.extras.text(content, name=os.path.split(filepath)[-1]))
 
-        if not report.passed and not report.skipped:
             report.extra = extra
 
         if report.longrepr is not None and report.longreprtext.split()[-1] == 'XFailed':
@@ -581,6 +671,7 @@ def configure_environment(get_configuration, request):
     if hasattr(request.module, 'force_restart_after_restoring'):
         if getattr(request.module, 'force_restart_after_restoring'):
             control_service('restart')
+            conf.get_configuration_manager().set_applied()
 
 
 @pytest.fixture(scope='module')
@@ -80,7 +80,7 @@ import sys
 import pytest
 from wazuh_testing import global_parameters
 from wazuh_testing.fim import LOG_FILE_PATH, callback_file_limit_capacity, generate_params, create_file, REGULAR, \
-    callback_file_limit_full_database, callback_entries_path_count
+    create_file_tree, FileTreeSpec, callback_file_limit_full_database, callback_entries_path_count
 from wazuh_testing.tools import PREFIX
 from wazuh_testing.tools.configuration import load_wazuh_configurations, check_apply_test
 from wazuh_testing.tools.monitoring import FileMonitor
@@ -124,8 +124,7 @@ def get_configuration(request):
 
 def extra_configuration_before_yield():
     """Generate files to fill database"""
-    for i in range(0, NUM_FILES):
-        create_file(REGULAR, testdir1, f'test{i}', content='content')
+    create_file_tree(testdir1, FileTreeSpec(NUM_FILES, sizes=len('content'), file_prefix='test'))
 
 
 # Tests
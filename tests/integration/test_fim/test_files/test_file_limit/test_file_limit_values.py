@@ -79,8 +79,8 @@ import sys
 
 import pytest
 from wazuh_testing import global_parameters
-from wazuh_testing.fim import LOG_FILE_PATH, callback_value_file_limit, generate_params, create_file, REGULAR, \
-    callback_entries_path_count
+from wazuh_testing.fim import LOG_FILE_PATH, callback_value_file_limit, generate_params, \
+    create_file_tree, FileTreeSpec, callback_entries_path_count
 from wazuh_testing.tools import PREFIX
 from wazuh_testing.tools.configuration import load_wazuh_configurations, check_apply_test
 from wazuh_testing.tools.monitoring import FileMonitor
@@ -124,8 +124,7 @@ def get_configuration(request):
 
 def extra_configuration_before_yield():
     """Generate files to fill database"""
-    for i in range(0, int(file_limit_list[-1]) + 10):
-        create_file(REGULAR, testdir1, f'test{i}')
+    create_file_tree(testdir1, FileTreeSpec(int(file_limit_list[-1]) + 10, file_prefix='test'))
 
 
 # Tests
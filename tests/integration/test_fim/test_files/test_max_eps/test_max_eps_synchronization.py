@@ -80,7 +80,8 @@ import pytest
 from wazuh_testing.fim import LOG_FILE_PATH, REGULAR, create_file, generate_params, callback_integrity_message, \
     callback_connection_message
 from wazuh_testing.tools import PREFIX
-from wazuh_testing.tools.configuration import load_wazuh_configurations, check_apply_test
+from wazuh_testing.tools.configuration import load_wazuh_configurations, check_apply_test, \
+    get_configuration_manager
 from wazuh_testing.tools.monitoring import FileMonitor
 
 # Marks
@@ -93,6 +94,9 @@ test_directories_no_delete = [os.path.join(PREFIX, 'testdir1')]
 directory_str = ','.join(test_directories_no_delete)
 
 wazuh_log_monitor = FileMonitor(LOG_FILE_PATH)
+# The configurations only differ in the syscheck section, so restart_wazuh can restart wazuh-syscheckd alone
+restart_only_affected_daemons = True
+restarted_daemons = None
 test_data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
 configurations_path = os.path.join(test_data_path, 'wazuh_conf_synchro.yaml')
 testdir1 = os.path.join(PREFIX, 'testdir1')
@@ -156,12 +160,14 @@ def test_max_eps_on_start(get_configuration, create_files, configure_environment
             brief: Configure a custom environment for testing.
         - restart_wazuh:
             type: fixture
-            brief: Clear the 'ossec.log' file and start a new monitor.
+            brief: Clear the 'ossec.log' file, start a new monitor and restart the daemons affected by the
+                   configuration.
         - delete_files:
             type: fixture
             brief: Delete the testing files when the test ends.
 
     assertions:
+        - Verify that only the daemons affected by the configuration have been restarted.
         - Verify that FIM 'integrity' events are generated for each testing file created.
         - Verify that the eps limit set in the 'max_eps' tag has not been exceeded at generating FIM events.
 
@@ -181,10 +187,18 @@ def test_max_eps_on_start(get_configuration, create_files, configure_environment
     check_apply_test({'max_eps_synchronization'}, get_configuration['tags'])
     max_eps = int(get_configuration['metadata']['max_eps'])
 
-    # Wait until the agent connects to the manager.
-    wazuh_log_monitor.start(timeout=90,
-                            callback=callback_connection_message,
-                            error_message="Agent couldn't connect to server.").result()
+    # The applied configuration is the active one, so applying it again would not restart anything
+    changed_sections, _ = get_configuration_manager().get_changes()
+    assert changed_sections in (None, set()), f'Changes not applied: {changed_sections}'
+
+    if restarted_daemons is not None:
+        assert 'wazuh-syscheckd' in restarted_daemons, f'wazuh-syscheckd was not restarted: {restarted_daemons}'
+
+    # Wait until the agent connects to the manager, unless it kept the connection
+    if restarted_daemons is None or 'wazuh-agentd' in restarted_daemons:
+        wazuh_log_monitor.start(timeout=90,
+                                callback=callback_connection_message,
+                                error_message="Agent couldn't connect to server.").result()
 
     #  Find integrity start before attempting to read max_eps
     wazuh_log_monitor.start(timeout=30,